@@ -1,12 +1,22 @@
 import os
+import asyncio
 import logging
-from typing import Dict, List, Optional
+import threading
+import functools
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
 from rich import print
 from dotenv import find_dotenv, load_dotenv
 
 # 導入我們的模組
 from test_topic_module import choose_topic, topic_metadata
 from rag.index_rag import LawRAGPipeline
+from rag.corpus_registry import CorpusRegistry
+from rag.answer_cache import SemanticAnswerCache
+from rag.article_index import parse_article_references
+from rag.corpora import TOPIC_TO_FILE_MAPPING, DATA_BASE_PATH
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO)
@@ -15,140 +25,193 @@ logger = logging.getLogger(__name__)
 # 載入環境變數
 load_dotenv(find_dotenv())
 
+# 推測式檢索的執行緒數，也是所有請求同時進行中的推測工作（嵌入與各語料的檢索）總數上限
+SPECULATION_WORKERS = 8
+
 class LawBotAgent:
     """
     法律機器人代理，整合主題選擇和 RAG 檢索功能 (使用 Gemini)
     """
     
-    def __init__(self, google_api_key: str = None):
+    def __init__(
+        self,
+        google_api_key: str = None,
+        index_mode: str = "per_file",
+        vector_backend: str = "chroma",
+        max_open_corpora: int = 8,
+        max_open_disk_bytes: Optional[int] = 1 << 30,
+        retrieval_k: int = 5,
+        answer_cache_size: int = 512,
+        answer_cache_threshold: float = 0.95,
+        answer_cache_ttl: Optional[float] = 3600,
+        speculative_retrieval: bool = False,
+        max_concurrency: int = 8,
+    ):
         """
         初始化法律機器人代理
         
         Args:
             google_api_key: Google API 金鑰
+            index_mode: "per_file"（每個資料檔案一個資料庫）或 "unified"（所有語料共用一個資料庫，依主題篩選）
+            vector_backend: 向量資料庫後端，"chroma" 或 "numpy"（行程內矩陣搜尋）
+            max_open_corpora: 同時保持開啟的語料數上限（per_file 模式）
+            max_open_disk_bytes: 已開啟語料的資料庫目錄磁碟大小總和上限（位元組，None 表示不限制；常駐記憶體的粗略代理）
+            retrieval_k: 每個問題檢索的片段數（同時交給模型並顯示為來源）
+            answer_cache_size: 語意答案快取的項目上限（0 表示停用）
+            answer_cache_threshold: 語意答案快取命中所需的問題 embedding 餘弦相似度
+            answer_cache_ttl: 快取回答的存活秒數（None 表示不過期）
+            speculative_retrieval: 主題分類進行中時，先在所有候選語料上並行檢索，分類完成後直接使用對應語料的結果；
+                推測用的執行緒不足以同時處理此請求的所有工作，或問題寫出法條時不推測
+            max_concurrency: 非同步 API（aprocess_query）的執行緒數與同時產生回答的數量上限
         """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency 必須大於 0")
+        
         # 取得 API 金鑰
         self.google_api_key = google_api_key or os.getenv("GOOGLE_API_KEY")
         if not self.google_api_key:
             raise ValueError("未提供 GOOGLE_API_KEY")
         
         # 初始化 RAG Pipeline (使用 Gemini)
-        self.rag_pipeline = LawRAGPipeline(self.google_api_key)
+        self.rag_pipeline = LawRAGPipeline(
+            self.google_api_key,
+            index_mode=index_mode,
+            vector_backend=vector_backend,
+            retrieval_k=retrieval_k
+        )
+        
+        # 已開啟的語料（per_file 模式），每個資料檔案只載入一次索引與問答鏈
+        self.corpus_registry = CorpusRegistry(
+            self.rag_pipeline,
+            max_entries=max_open_corpora,
+            max_disk_bytes=max_open_disk_bytes
+        )
+        
+        # 語意答案快取：改寫過的相同問題直接返回先前的回答與來源
+        self.answer_cache = None
+        if answer_cache_size:
+            self.answer_cache = SemanticAnswerCache(
+                threshold=answer_cache_threshold,
+                ttl_seconds=answer_cache_ttl,
+                max_entries=answer_cache_size
+            )
+        # 每個資料庫目錄最後一次看到的索引版本，版本改變時清除舊版本的快取回答
+        self._index_versions = {}
+        
+        # 推測式檢索的執行緒（嵌入查詢與各語料的檢索）
+        self.speculative_retrieval = speculative_retrieval
+        self._speculation_pool = None
+        if speculative_retrieval:
+            self._speculation_pool = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="speculative-retrieval")
+        # 每個推測工作占用一個名額直到完成，名額與執行緒數相同，送出的工作不會排隊
+        self._speculation_slots = threading.BoundedSemaphore(SPECULATION_WORKERS)
+        
+        # 非同步 API：分類、嵌入與檢索在此執行緒池中執行，回答產生的數量以各事件迴圈的 Semaphore 限制
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="lawbot")
+        self._generation_semaphores = weakref.WeakKeyDictionary()
+        self._semaphore_lock = threading.Lock()
+        
+        # 共用資料庫模式下已確認寫入的資料檔案（寫入共用資料庫時需持有 _index_lock）
+        self._indexed_sources = set()
+        self._index_lock = threading.Lock()
         
         # 主題到資料檔案的映射
-        self.topic_to_file_mapping = {
-            '侵害生命法益之犯罪': 'specific_offences_ch1.txt',
-            '侵害健康法益之犯罪': 'qa.txt',
-            '侵害自由法益犯罪': 'qa.txt',
-            '侵害名譽及信用犯罪': 'qa.txt',
-            '侵害秘密犯罪': 'qa.txt',
-            '侵害個別財產法益之犯罪': 'specific_offences_ch6.txt',
-            'rag': 'qa.txt',
-            'others': None
-        }
+        self.topic_to_file_mapping = dict(TOPIC_TO_FILE_MAPPING)
         
         # 資料檔案的基礎路徑
-        self.data_base_path = "/Users/zoungming/Desktop/Codes/TsungMin_Pai_Tutor/Law_Bot/rag/data"
+        self.data_base_path = DATA_BASE_PATH
         
         logger.info("法律機器人代理初始化完成 (使用 Gemini)")
     
-    def process_query(self, user_query: str, verbose: bool = True) -> Dict:
+    def process_query(self, user_query: str, verbose: bool = True, use_cache: bool = True) -> Dict:
         """
         處理使用者查詢的主要方法
         
         Args:
             user_query: 使用者的法律問題
             verbose: 是否顯示詳細過程
+            use_cache: 是否查詢語意答案快取（False 時一定重新檢索與產生回答，新的回答仍會寫入快取）
             
         Returns:
             包含處理結果的字典
         """
-        result = {
-            'user_query': user_query,
-            'chosen_topic': None,
-            'data_file': None,
-            'retrieved_docs': [],
-            'answer': None,
-            'source_documents': [],
-            'error': None
-        }
-        
+        result = self._new_result(user_query)
+        speculations = {}
         try:
-            # 步驟 1: 主題選擇
-            if verbose:
-                print(f"🔍 步驟 1: 分析使用者問題...")
-                print(f"問題: {user_query}")
-            
-            chosen_topic, chosen_topic_reasoning = choose_topic(user_query)
-            result['chosen_topic'] = chosen_topic
-            result['chosen_topic_reasoning'] = chosen_topic_reasoning
-            
-            if verbose:
-                print(f"✅ 選擇的主題: {chosen_topic}")
+            # 主題分類需要呼叫 LLM，期間先在各候選語料上檢索
+            if self.speculative_retrieval:
+                speculations = self._start_speculative_retrieval(user_query)
             
-            # 檢查是否為非法律問題
-            if chosen_topic == 'others':
-                result['answer'] = "抱歉，我是法律專業助手，只能回答法律相關問題。請提出刑法相關的問題。"
+            data_file_path = self._route_query(user_query, result, verbose)
+            if data_file_path is None:
                 return result
             
-            # 步驟 2: 取得對應的資料檔案
-            data_file_name = self.topic_to_file_mapping.get(chosen_topic)
-            if not data_file_name:
-                result['error'] = f"未找到主題 '{chosen_topic}' 對應的資料檔案"
+            context = self._retrieve_for_query(user_query, result, data_file_path, speculations, verbose, use_cache)
+            if context is None:
                 return result
             
-            data_file_path = os.path.join(self.data_base_path, data_file_name)
-            result['data_file'] = data_file_path
-            
-            if verbose:
-                print(f"📁 步驟 2: 載入對應資料庫...")
-                print(f"資料檔案: {data_file_name}")
-            
-            # 檢查檔案是否存在
-            if not os.path.exists(data_file_path):
-                result['error'] = f"資料檔案不存在: {data_file_path}"
-                return result
-            
-            # 步驟 3: 載入或建立向量索引
+            # 步驟 5: 產生回答
             if verbose:
-                print(f"🔄 步驟 3: 載入向量索引...")
+                print(f"🤖 步驟 5: 產生 AI 回答...")
             
-            # 嘗試載入現有索引
-            self.rag_pipeline.load_existing_index(data_file_path)
+            # 以同一批片段產生回答，顯示的來源即為模型實際看到的資料
+            qa_result = context['pipeline'].answer_with_documents(user_query, result['retrieved_docs'])
+            self._finish_answer(result, context, qa_result, verbose)
+            return result
             
-            # 如果沒有現有索引，建立新的
-            if not self.rag_pipeline.vectorstore:
-                if verbose:
-                    print(f"⚠️ 未找到現有索引，建立新索引...")
-                self.rag_pipeline.index_documents(data_file_path)
+        except Exception as e:
+            error_msg = f"處理查詢時發生錯誤: {str(e)}"
+            logger.error(error_msg)
+            result['error'] = error_msg
+            return result
+        finally:
+            # 其他語料的推測結果直接丟棄（已開始的工作仍會執行到完成）
+            for future in speculations.values():
+                future.cancel()
+    
+    async def aprocess_query(self, user_query: str, verbose: bool = False, use_cache: bool = True) -> Dict:
+        """
+        process_query 的非同步版本，可在同一個程序中同時處理多位使用者的問題
+        
+        主題分類、嵌入與檢索在有上限的執行緒池中執行，回答以模型的非同步介面產生（同時產生的數量受 max_concurrency 限制）。
+        每個請求使用各自語料的 pipeline，不會切換共用的主 pipeline，不同主題的問題可以同時查詢。
+        
+        Args:
+            user_query: 使用者的法律問題
+            verbose: 是否顯示詳細過程（多個請求同時進行時輸出會交錯）
+            use_cache: 是否查詢語意答案快取
             
-            if verbose:
-                print(f"✅ 向量索引載入完成")
+        Returns:
+            與 process_query 相同的結果字典
+        """
+        loop = asyncio.get_running_loop()
+        
+        def offload(function, *args):
+            return loop.run_in_executor(self._executor, functools.partial(function, *args))
+        
+        result = self._new_result(user_query)
+        speculations = {}
+        try:
+            if self.speculative_retrieval:
+                speculations = self._start_speculative_retrieval(user_query)
             
-            # 步驟 4: 檢索相關文件
-            if verbose:
-                print(f"🔍 步驟 4: 檢索相關文件...")
+            data_file_path = await offload(self._route_query, user_query, result, verbose)
+            if data_file_path is None:
+                return result
             
-            retrieved_docs = self.rag_pipeline.vectorstore.similarity_search(
-                user_query, 
-                k=3  # 檢索前3個最相關的片段
+            context = await offload(
+                self._retrieve_for_query, user_query, result, data_file_path, speculations, verbose, use_cache
             )
-            result['retrieved_docs'] = retrieved_docs
-            
-            if verbose:
-                print(f"✅ 檢索到 {len(retrieved_docs)} 個相關文件片段")
+            if context is None:
+                return result
             
-            # 步驟 5: 產生回答
             if verbose:
                 print(f"🤖 步驟 5: 產生 AI 回答...")
             
-            qa_result = self.rag_pipeline.query(user_query)
-            result['answer'] = qa_result['answer']
-            result['source_documents'] = qa_result['source_documents']
-            
-            if verbose:
-                print(f"✅ 回答產生完成")
-            
+            async with self._generation_semaphore():
+                qa_result = await context['pipeline'].aanswer_with_documents(user_query, result['retrieved_docs'])
+            self._finish_answer(result, context, qa_result, verbose)
             return result
             
         except Exception as e:
@@ -156,6 +219,382 @@ class LawBotAgent:
             logger.error(error_msg)
             result['error'] = error_msg
             return result
+        finally:
+            for future in speculations.values():
+                future.cancel()
+    
+    def search(self, user_query: str, topic: Optional[str] = None, k: Optional[int] = None) -> Dict:
+        """
+        只檢索相關片段，不產生回答
+        
+        Args:
+            user_query: 使用者的法律問題
+            topic: 指定主題（None 表示先以 choose_topic 分類）
+            k: 片段數量（None 表示使用 retrieval_k）
+            
+        Returns:
+            與 process_query 相同格式的結果字典（answer 為 None）
+        """
+        result = self._new_result(user_query)
+        try:
+            data_file_path = self._route_query(user_query, result, False, topic=topic)
+            if data_file_path is not None:
+                pipeline = self._open_corpus(data_file_path, False)
+                retrieved_docs, retrieval_method = pipeline.retrieve(user_query, k=k, topic=result['chosen_topic'])
+                result['retrieved_docs'] = retrieved_docs
+                result['retrieval_method'] = retrieval_method
+        except Exception as e:
+            error_msg = f"檢索時發生錯誤: {str(e)}"
+            logger.error(error_msg)
+            result['error'] = error_msg
+        return result
+    
+    def stream_query(self, user_query: str, verbose: bool = False, use_cache: bool = True) -> Iterator[Dict]:
+        """
+        process_query 的串流版本：每個階段完成時立即產生事件，回答則在模型產生時逐段返回
+        
+        事件（dict 的 'type'）：
+        - 'topic'：主題選擇完成（topic、reasoning、data_file）
+        - 'documents'：檢索完成（documents、retrieval_method、cache_hit）
+        - 'token'：回答的文字片段（text）；快取命中時整個回答為一個片段
+        - 'done'：處理結束（result 與 process_query 的結果字典相同，包含錯誤訊息）
+        
+        Args:
+            user_query: 使用者的法律問題
+            verbose: 是否顯示詳細過程
+            use_cache: 是否查詢語意答案快取
+            
+        Returns:
+            事件的迭代器，最後一個事件一定是 'done'
+        """
+        result = self._new_result(user_query)
+        speculations = {}
+        try:
+            try:
+                if self.speculative_retrieval:
+                    speculations = self._start_speculative_retrieval(user_query)
+                
+                data_file_path = self._route_query(user_query, result, verbose)
+                yield {
+                    'type': 'topic',
+                    'topic': result['chosen_topic'],
+                    'reasoning': result.get('chosen_topic_reasoning'),
+                    'data_file': result['data_file']
+                }
+                
+                if data_file_path is not None:
+                    context = self._retrieve_for_query(user_query, result, data_file_path, speculations, verbose, use_cache)
+                    yield {
+                        'type': 'documents',
+                        'documents': result['retrieved_docs'],
+                        'retrieval_method': result['retrieval_method'],
+                        'cache_hit': result['cache_hit']
+                    }
+                    
+                    if context is None:
+                        yield {'type': 'token', 'text': result['answer']}
+                    else:
+                        if verbose:
+                            print(f"🤖 步驟 5: 產生 AI 回答...")
+                        
+                        tokens = []
+                        for token in context['pipeline'].stream_answer_with_documents(user_query, result['retrieved_docs']):
+                            tokens.append(token)
+                            yield {'type': 'token', 'text': token}
+                        qa_result = {'answer': "".join(tokens), 'source_documents': result['retrieved_docs']}
+                        self._finish_answer(result, context, qa_result, verbose)
+                
+            except Exception as e:
+                error_msg = f"處理查詢時發生錯誤: {str(e)}"
+                logger.error(error_msg)
+                result['error'] = error_msg
+            
+            yield {'type': 'done', 'result': result}
+        finally:
+            for future in speculations.values():
+                future.cancel()
+    
+    def _generation_semaphore(self) -> asyncio.Semaphore:
+        """
+        目前事件迴圈上限制同時產生回答數量的 Semaphore
+        """
+        loop = asyncio.get_running_loop()
+        with self._semaphore_lock:
+            semaphore = self._generation_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._generation_semaphores[loop] = semaphore
+            return semaphore
+    
+    def _new_result(self, user_query: str) -> Dict:
+        return {
+            'user_query': user_query,
+            'chosen_topic': None,
+            'data_file': None,
+            'retrieved_docs': [],
+            'answer': None,
+            'source_documents': [],
+            'retrieval_method': None,
+            'cache_hit': False,
+            'error': None
+        }
+    
+    def _route_query(self, user_query: str, result: Dict, verbose: bool, topic: Optional[str] = None) -> Optional[str]:
+        """
+        步驟 1、2：選擇主題並找出對應的資料檔案
+        
+        Args:
+            topic: 呼叫端指定的主題（None 表示以 choose_topic 分類）
+        
+        Returns:
+            資料檔案路徑；不需要繼續處理時（非法律問題或找不到資料檔案）為 None，並已寫入 result
+        """
+        # 步驟 1: 主題選擇
+        if verbose:
+            print(f"🔍 步驟 1: 分析使用者問題...")
+            print(f"問題: {user_query}")
+        
+        if topic is None:
+            chosen_topic, chosen_topic_reasoning = choose_topic(user_query)
+        else:
+            chosen_topic, chosen_topic_reasoning = topic, "由呼叫端指定主題"
+        result['chosen_topic'] = chosen_topic
+        result['chosen_topic_reasoning'] = chosen_topic_reasoning
+        
+        if verbose:
+            print(f"✅ 選擇的主題: {chosen_topic}")
+        
+        # 檢查是否為非法律問題
+        if chosen_topic == 'others':
+            result['answer'] = "抱歉，我是法律專業助手，只能回答法律相關問題。請提出刑法相關的問題。"
+            return None
+        
+        # 步驟 2: 取得對應的資料檔案
+        data_file_name = self.topic_to_file_mapping.get(chosen_topic)
+        if not data_file_name:
+            result['error'] = f"未找到主題 '{chosen_topic}' 對應的資料檔案"
+            return None
+        
+        data_file_path = os.path.join(self.data_base_path, data_file_name)
+        result['data_file'] = data_file_path
+        
+        if verbose:
+            print(f"📁 步驟 2: 載入對應資料庫...")
+            print(f"資料檔案: {data_file_name}")
+        
+        # 檢查檔案是否存在
+        if not os.path.exists(data_file_path):
+            result['error'] = f"資料檔案不存在: {data_file_path}"
+            return None
+        
+        return data_file_path
+    
+    def _open_corpus(self, data_file_path: str, verbose: bool) -> LawRAGPipeline:
+        """
+        步驟 3：載入或建立向量索引
+        
+        Returns:
+            這次查詢使用的 pipeline：per_file 模式為該語料專屬的複本（不切換共用的主 pipeline），
+            共用資料庫模式為主 pipeline（以主題篩選）
+        """
+        if verbose:
+            print(f"🔄 步驟 3: 載入向量索引...")
+        
+        if self.rag_pipeline.index_mode == "unified":
+            # 共用資料庫只需開啟一次，之後以主題 metadata 篩選
+            with self._index_lock:
+                if not self.rag_pipeline.vectorstore:
+                    self.rag_pipeline.load_existing_index(data_file_path)
+                
+                if data_file_path not in self._indexed_sources:
+                    if not self.rag_pipeline.is_source_indexed(data_file_path):
+                        if verbose:
+                            print(f"⚠️ 共用資料庫中沒有此資料檔案，寫入索引...")
+                        self.rag_pipeline.index_documents(data_file_path)
+                    self._indexed_sources.add(data_file_path)
+            pipeline = self.rag_pipeline
+        else:
+            # 已開啟過的語料直接使用，否則從磁碟載入現有索引；沒有現有索引時建立新的（並行請求只建立一次）
+            reused = data_file_path in self.corpus_registry
+            handle = self.corpus_registry.get(data_file_path, build=True)
+            if verbose and reused:
+                print(f"♻️ 使用已開啟的索引")
+            pipeline = handle.pipeline
+        
+        if verbose:
+            print(f"✅ 向量索引載入完成")
+        return pipeline
+    
+    def _retrieve_for_query(
+        self,
+        user_query: str,
+        result: Dict,
+        data_file_path: str,
+        speculations: Dict[str, Future],
+        verbose: bool,
+        use_cache: bool,
+    ) -> Optional[Dict]:
+        """
+        步驟 3、4：開啟語料、查詢語意答案快取並檢索相關文件
+        
+        Returns:
+            產生回答所需的 context（pipeline、query_vector、index_version）；快取命中時為 None，並已寫入 result
+        """
+        chosen_topic = result['chosen_topic']
+        pipeline = self._open_corpus(data_file_path, verbose)
+        
+        # 問題寫出法條時直接查詢法條引用索引，不需 embedding，也不經過語意答案快取
+        article_docs = pipeline.lookup_articles(user_query, k=pipeline.retrieval_k, topic=chosen_topic)
+        
+        # 語意答案快取：主題與索引版本相同、問題夠相似時直接返回先前的回答
+        index_version = pipeline.index_version
+        query_vector = None
+        if self.answer_cache:
+            self._track_index_version(pipeline.persist_directory, index_version)
+        if self.answer_cache and not article_docs:
+            # 查詢 embedding 有快取，之後檢索時不會再呼叫 API
+            query_vector = pipeline.embeddings.embed_query(user_query)
+            cached = self.answer_cache.lookup(query_vector, chosen_topic, index_version) if use_cache else None
+            if cached:
+                result['retrieved_docs'] = cached['source_documents']
+                result['answer'] = cached['answer']
+                result['source_documents'] = cached['source_documents']
+                result['retrieval_method'] = 'cache'
+                result['cache_hit'] = True
+                if verbose:
+                    print(f"⚡ 使用快取回答（相似問題：{cached['query']}，相似度 {cached['similarity']:.3f}）")
+                return None
+        
+        # 步驟 4: 檢索相關文件
+        if verbose:
+            print(f"🔍 步驟 4: 檢索相關文件...")
+        
+        # 只檢索一次：已查到法條引用的片段時直接使用，否則以向量與詞彙索引混合檢索
+        speculation_key = chosen_topic if pipeline.index_mode == "unified" else data_file_path
+        speculated = self._take_speculation(speculations, speculation_key)
+        if article_docs:
+            retrieved_docs, retrieval_method = article_docs, 'article'
+        elif speculated is not None:
+            retrieved_docs, retrieval_method = speculated
+            if verbose:
+                print(f"🏁 使用推測式檢索的結果")
+        else:
+            retrieved_docs = pipeline.hybrid_search(user_query, k=pipeline.retrieval_k, topic=chosen_topic)
+            retrieval_method = 'hybrid'
+        result['retrieved_docs'] = retrieved_docs
+        result['retrieval_method'] = retrieval_method
+        
+        if verbose:
+            method = "法條直接查詢" if result['retrieval_method'] == 'article' else "混合檢索"
+            print(f"✅ 檢索到 {len(retrieved_docs)} 個相關文件片段（{method}）")
+        
+        return {'pipeline': pipeline, 'query_vector': query_vector, 'index_version': index_version}
+    
+    def _finish_answer(self, result: Dict, context: Dict, qa_result: Dict, verbose: bool):
+        """
+        寫入回答與來源，並加入語意答案快取
+        """
+        result['answer'] = qa_result['answer']
+        result['source_documents'] = qa_result['source_documents']
+        
+        if context['query_vector'] is not None:
+            self.answer_cache.put(
+                context['query_vector'],
+                result['chosen_topic'],
+                context['index_version'],
+                result['user_query'],
+                result['answer'],
+                result['source_documents']
+            )
+        
+        if verbose:
+            print(f"✅ 回答產生完成")
+    
+    def _start_speculative_retrieval(self, user_query: str) -> Dict[str, Future]:
+        """
+        在所有候選語料上並行檢索（只使用已建立的索引，不會在推測階段建立新索引）
+        
+        查詢只嵌入一次，各語料的檢索等嵌入完成後由查詢 embedding 快取命中。
+        落選語料的檢索一旦開始就會執行到完成，仍會占用推測執行緒與 embedding / 檢索的資源，
+        因此只在執行緒有足夠閒置名額容納此請求的所有工作時才推測（否則分類完成後直接檢索），
+        避免落選的工作排在之後請求的推測前面；問題寫出法條時以法條引用索引查詢，不需推測。
+        
+        Returns:
+            {資料檔案路徑（共用資料庫模式為主題）: Future[(片段, 檢索方式) 或 None]}；不推測時為空字典
+        """
+        if parse_article_references(user_query):
+            return {}
+        
+        if self.rag_pipeline.index_mode == "unified":
+            # 共用資料庫尚未開啟時沒有可推測的索引
+            if not self.rag_pipeline.vectorstore:
+                return {}
+            targets = {
+                topic: (self.rag_pipeline, topic)
+                for topic, data_file_name in self.topic_to_file_mapping.items() if data_file_name
+            }
+        else:
+            targets = {}
+            for data_file_name in dict.fromkeys(name for name in self.topic_to_file_mapping.values() if name):
+                data_file_path = os.path.join(self.data_base_path, data_file_name)
+                if os.path.exists(data_file_path):
+                    targets[data_file_path] = (data_file_path, None)
+        if not targets:
+            return {}
+        
+        # 嵌入加上每個語料的檢索各需一個名額，不足時整個請求都不推測
+        acquired = 0
+        while acquired < len(targets) + 1 and self._speculation_slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < len(targets) + 1:
+            for _ in range(acquired):
+                self._speculation_slots.release()
+            return {}
+        
+        def submit(function, *args) -> Future:
+            future = self._speculation_pool.submit(function, *args)
+            future.add_done_callback(lambda _: self._speculation_slots.release())
+            return future
+        
+        embedded = submit(self.rag_pipeline.embeddings.embed_query, user_query)
+        return {
+            key: submit(self._speculate, embedded, corpus, user_query, topic)
+            for key, (corpus, topic) in targets.items()
+        }
+    
+    def _speculate(self, embedded: Future, corpus, user_query: str, topic: Optional[str]) -> Optional[Tuple[List, str]]:
+        """
+        推測式檢索的單一工作：corpus 為資料檔案路徑（per_file 模式）或共用資料庫的 pipeline
+        """
+        embedded.result()
+        if isinstance(corpus, str):
+            handle = self.corpus_registry.get(corpus)
+            if handle is None:
+                return None
+            corpus = handle.pipeline
+        return corpus.retrieve(user_query, topic=topic)
+    
+    def _take_speculation(self, speculations: Dict[str, Future], key: str) -> Optional[Tuple[List, str]]:
+        """
+        取得選中語料的推測式檢索結果；沒有推測或推測失敗時為 None
+        """
+        future = speculations.pop(key, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning(f"推測式檢索失敗，改為一般檢索: {e}")
+            return None
+    
+    def _track_index_version(self, persist_directory: str, index_version: Optional[str]):
+        """
+        索引版本改變（同一個資料庫目錄重新建立或增量更新）時，清除舊版本的快取回答
+        """
+        previous = self._index_versions.get(persist_directory)
+        if previous is not None and previous != index_version:
+            self.answer_cache.invalidate(previous)
+        self._index_versions[persist_directory] = index_version
     
     def display_result(self, result: Dict):
         """
@@ -181,6 +620,9 @@ class LawBotAgent:
         if result['retrieved_docs']:
             print(f"🔍 檢索片段數: {len(result['retrieved_docs'])}")
         
+        if result.get('cache_hit'):
+            print(f"⚡ 使用快取回答")
+        
         if result['answer']:
             print(f"\n💡 AI 回答:")
             print("-" * 50)
@@ -194,6 +636,52 @@ class LawBotAgent:
                 section = doc.metadata.get('section', '未知')
                 print(f"{i}. {title} - {section}")
     
+    def display_stream(self, events: Iterator[Dict]) -> Dict:
+        """
+        逐步顯示 stream_query 的事件：選定主題與檢索到參考資料時立即顯示，回答邊產生邊輸出
+        
+        Args:
+            events: stream_query 的事件迭代器
+            
+        Returns:
+            處理結果字典（與 process_query 相同）
+        """
+        result = None
+        answering = False
+        for event in events:
+            if event['type'] == 'topic':
+                print(f"🎯 選擇主題: {event['topic']}")
+                if event['data_file']:
+                    print(f"📁 使用資料庫: {os.path.basename(event['data_file'])}")
+            elif event['type'] == 'documents':
+                if event['cache_hit']:
+                    print(f"⚡ 使用快取回答")
+                print(f"📚 參考資料來源:")
+                for i, doc in enumerate(event['documents'], 1):
+                    title = doc.metadata.get('title', '未知')
+                    section = doc.metadata.get('section', '未知')
+                    print(f"{i}. {title} - {section}")
+            elif event['type'] == 'token':
+                if not answering:
+                    print(f"\n💡 AI 回答:")
+                    print("-" * 50)
+                    answering = True
+                # 回答直接寫到標準輸出，避免 rich 把方括號當成標記
+                sys.stdout.write(event['text'])
+                sys.stdout.flush()
+            elif event['type'] == 'done':
+                result = event['result']
+        
+        if answering:
+            print()
+            print("-" * 50)
+        elif result['answer']:
+            print(f"\n💡 AI 回答:")
+            print(result['answer'])
+        if result['error']:
+            print(f"❌ 錯誤: {result['error']}")
+        return result
+    
     def display_detailed_retrieval(self, result: Dict):
         """
         顯示詳細的檢索結果
@@ -253,6 +741,8 @@ def main():
 📖 可用指令:
 - 直接輸入法律問題進行查詢
 - 'detailed' + 問題: 顯示詳細檢索過程
+- 'fresh' + 問題: 略過答案快取，重新檢索並產生回答
+- 'stats': 顯示已開啟語料與查詢 embedding 的快取統計
 - 'help': 顯示此幫助資訊
 - 'quit' 或 'exit': 離開程式
 
@@ -264,17 +754,32 @@ def main():
                     """)
                     continue
                 
+                if user_input.lower() == 'stats':
+                    stats = agent.corpus_registry.stats()
+                    print(f"📦 已開啟語料 {stats['entries']} 個（磁碟約 {stats['disk_bytes'] / 2**20:.1f} MB）")
+                    print(f"♻️ 命中 {stats['hits']}、開啟 {stats['opens']}、淘汰 {stats['evictions']}（命中率 {stats['hit_rate']:.1%}）")
+                    if agent.answer_cache:
+                        answer_stats = agent.answer_cache.stats()
+                        print(f"⚡ 語意答案快取：命中 {answer_stats['hits']}、未命中 {answer_stats['misses']}（命中率 {answer_stats['hit_rate']:.1%}）")
+                    if agent.rag_pipeline.query_cache:
+                        query_stats = agent.rag_pipeline.query_cache.stats()
+                        print(f"🔎 查詢 embedding 快取：命中 {query_stats['hits'] + query_stats['disk_hits']}、未命中 {query_stats['misses']}（命中率 {query_stats['hit_rate']:.1%}）")
+                    continue
+                
                 # 檢查是否要顯示詳細過程
                 verbose = False
                 if user_input.lower().startswith('detailed '):
                     verbose = True
                     user_input = user_input[9:]  # 移除 'detailed ' 前綴
                 
-                # 處理查詢
-                result = agent.process_query(user_input, verbose=verbose)
+                # 檢查是否要略過答案快取
+                use_cache = True
+                if user_input.lower().startswith('fresh '):
+                    use_cache = False
+                    user_input = user_input[6:]  # 移除 'fresh ' 前綴
                 
-                # 顯示結果
-                agent.display_result(result)
+                # 處理查詢：主題、參考資料與回答逐步顯示
+                result = agent.display_stream(agent.stream_query(user_input, verbose=verbose, use_cache=use_cache))
                 
                 # 如果是詳細模式，也顯示檢索細節
                 if verbose:
@@ -282,6 +282,37 @@ def display_process_flow(result: Dict):
             st.error("❌ 5. 產生回答")
             st.write("✗ 回答失敗")
 
+def stream_query_progressively(agent: LawBotAgent, user_query: str, verbose: bool) -> Dict:
+    """逐步顯示查詢進度：選定主題與檢索到參考資料時立即顯示，回答邊產生邊顯示"""
+    status = st.empty()
+    references = st.empty()
+    answer_placeholder = st.empty()
+    status.info("🔄 正在分析問題...")
+    
+    answer = ""
+    result = None
+    for event in agent.stream_query(user_query, verbose=verbose):
+        if event['type'] == 'topic':
+            status.info(f"🎯 主題：{event['topic']}，正在檢索參考資料...")
+        elif event['type'] == 'documents':
+            status.info(f"📚 已檢索到 {len(event['documents'])} 個參考資料片段，正在產生回答...")
+            with references.container():
+                for i, doc in enumerate(event['documents'], 1):
+                    title = doc.metadata.get('title', '未知')
+                    section = doc.metadata.get('section', '未知')
+                    st.write(f"{i}. **{title}** - {section}")
+        elif event['type'] == 'token':
+            answer += event['text']
+            answer_placeholder.markdown(answer + "▌")
+        elif event['type'] == 'done':
+            result = event['result']
+    
+    # 完成後改以下方的標籤頁顯示完整結果
+    status.empty()
+    references.empty()
+    answer_placeholder.empty()
+    return result
+
 def main():
     # 標題和說明
     st.title("⚖️ 法律機器人代理")
@@ -352,9 +383,8 @@ def main():
     
     # 處理查詢
     if query_button and user_query.strip():
-        with st.spinner('🔄 正在處理您的問題...'):
-            result = agent.process_query(user_query.strip(), verbose=verbose_mode)
-            st.session_state.last_result = result
+        result = stream_query_progressively(agent, user_query.strip(), verbose_mode)
+        st.session_state.last_result = result
     
     # 顯示結果
     if st.session_state.last_result:
@@ -74,6 +74,9 @@ def configure_dspy():
 
 configure_dspy()            
 
+# 批改使用的模型（與其他模組共用同一程序時，以 dspy.context(lm=CORRECTOR_LM) 指定）
+CORRECTOR_LM = dspy.settings.lm
+
 import dspy
 
 class Corrector(dspy.Signature):
@@ -156,11 +159,12 @@ def correct_question(student_answer, example):
     return result, reasoning
 
 
-student_answer = input("請輸入學生的法律考試回答：\n")
-example = example  # 從 data/questions.py 匯入的示範內容
-correction, reasoning = correct_question(student_answer, example)
-print("\n=== 批改建議 ===")
-print(correction)
-print("\n=== 推理過程 ===")
-print(reasoning)
+if __name__ == "__main__":
+    student_answer = input("請輸入學生的法律考試回答：\n")
+    example = example  # 從 data/questions.py 匯入的示範內容
+    correction, reasoning = correct_question(student_answer, example)
+    print("\n=== 批改建議 ===")
+    print(correction)
+    print("\n=== 推理過程 ===")
+    print(reasoning)
 
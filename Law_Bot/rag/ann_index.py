@@ -0,0 +1,294 @@
+import json
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+ANN_FILE = "ann_ivfpq.npz"
+
+# 每個子空間的 PQ 碼本大小（8 位元編碼）
+PQ_CENTROIDS = 256
+
+# 自動選擇分群數的上限（分群越多，訓練越慢）
+MAX_AUTO_NLIST = 1024
+
+
+def _kmeans(data: np.ndarray, k: int, iterations: int, rng: np.random.Generator, spherical: bool) -> np.ndarray:
+    """
+    Lloyd k-means
+
+    Args:
+        data: 訓練資料 (n, d)
+        k: 群數
+        iterations: 迭代次數
+        rng: 亂數產生器
+        spherical: 以內積分群並將中心正規化（用於正規化向量的粗分群）
+
+    Returns:
+        群中心 (k, d)
+    """
+    centroids = data[rng.choice(data.shape[0], size=k, replace=data.shape[0] < k)].copy()
+    for _ in range(iterations):
+        assignments = _assign(data, centroids, spherical)
+        counts = np.bincount(assignments, minlength=k)
+        # 依群排序後以 reduceat 加總，比 np.add.at 快得多
+        order = np.argsort(assignments, kind="stable")
+        present = np.flatnonzero(counts)
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(data[order], np.concatenate([[0], np.cumsum(counts[present])[:-1]]))
+
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        # 空群重新以隨機資料點初始化
+        if empty.any():
+            centroids[empty] = data[rng.choice(data.shape[0], size=int(empty.sum()))]
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+    return centroids
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray, spherical: bool, block_size: int = 16384) -> np.ndarray:
+    """
+    將資料分配到最近的中心（分段計算，避免一次產生 n x k 的大矩陣）
+    """
+    assignments = np.empty(data.shape[0], dtype=np.int32)
+    half_norms = None if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, data.shape[0], block_size):
+        scores = np.asarray(data[start:start + block_size], dtype=np.float32) @ centroids.T
+        if half_norms is not None:
+            scores -= half_norms  # argmin ||x-c||² = argmax (x·c - ||c||²/2)
+        assignments[start:start + block_size] = scores.argmax(axis=1)
+    return assignments
+
+
+class IVFPQIndex:
+    """
+    IVF（倒排分群）+ PQ（乘積量化）近似最近鄰索引，純 NumPy 實作
+
+    建立時先以球面 k-means 將向量分成 nlist 群，查詢時只掃描與查詢最相近的 nprobe 群。
+    啟用 PQ 時，每個向量與其群中心的殘差被切成 m 個子向量，各以 8 位元碼表示；
+    查詢只需建一張 (m, 256) 的內積查表，候選分數 = 查詢·群中心 + 查表總和。
+    最後以原始向量重新計算前 rerank 個候選的精確分數。
+
+    索引的每一列與向量資料庫的列一一對應（assignments / codes），
+    新增的向量直接分配到既有的群與碼本，刪除時只保留剩下的列。
+    """
+
+    def __init__(
+        self,
+        nlist: Optional[int] = None,
+        m: int = 32,
+        nprobe: int = 8,
+        rerank: int = 256,
+        train_size: int = 32768,
+        iterations: int = 8,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            nlist: 分群數（None 表示依資料量自動選擇，約 4·√n，最多 MAX_AUTO_NLIST）
+            m: PQ 子空間數（需整除向量維度；0 表示不使用 PQ，候選以原始向量計分）
+            nprobe: 查詢時掃描的群數（召回率 / 速度的調整旋鈕）
+            rerank: 以原始向量重新計分的候選數（0 表示直接使用 PQ 近似分數；
+                同一群內的向量 PQ 分數差距很小，召回率主要由此參數決定）
+            train_size: 訓練 k-means 時取樣的向量數
+            iterations: k-means 迭代次數
+            seed: 亂數種子
+        """
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (m, 256, d/m)
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.codes = np.zeros((0, max(m, 0)), dtype=np.uint8)
+        self.trained_size = 0
+        self._lists = None
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.assignments.shape[0])
+
+    def params(self) -> Dict:
+        return {
+            "nlist": self.nlist,
+            "m": self.m,
+            "nprobe": self.nprobe,
+            "rerank": self.rerank,
+            "train_size": self.train_size,
+            "iterations": self.iterations,
+            "seed": self.seed,
+        }
+
+    def train(self, vectors: np.ndarray):
+        """
+        以向量資料訓練粗分群中心與 PQ 碼本，並編碼所有向量
+
+        Args:
+            vectors: 正規化的 float32 向量 (n, d)，可為 mmap
+        """
+        count, dimension = vectors.shape
+        if self.m and dimension % self.m:
+            raise ValueError(f"PQ 子空間數 m={self.m} 必須整除向量維度 {dimension}")
+
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or min(MAX_AUTO_NLIST, max(1, int(4 * np.sqrt(count))))
+        nlist = min(nlist, count)
+        sample_rows = np.sort(rng.choice(count, size=min(count, max(self.train_size, nlist)), replace=False))
+        sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+
+        self.centroids = _kmeans(sample, nlist, self.iterations, rng, spherical=True)
+        self.codebooks = None
+        if self.m:
+            residuals = sample - self.centroids[_assign(sample, self.centroids, spherical=True)]
+            sub_dimension = dimension // self.m
+            self.codebooks = np.stack([
+                _kmeans(
+                    np.ascontiguousarray(residuals[:, j * sub_dimension:(j + 1) * sub_dimension]),
+                    min(PQ_CENTROIDS, sample.shape[0]),
+                    self.iterations,
+                    rng,
+                    spherical=False,
+                )
+                for j in range(self.m)
+            ])
+
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.codes = np.zeros((0, self.m), dtype=np.uint8)
+        self.add(vectors)
+        self.trained_size = count
+
+    def _encode(self, vectors: np.ndarray, assignments: np.ndarray) -> np.ndarray:
+        residuals = vectors - self.centroids[assignments]
+        sub_dimension = residuals.shape[1] // self.m
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(residuals[:, j * sub_dimension:(j + 1) * sub_dimension])
+            codes[:, j] = _assign(sub, self.codebooks[j], spherical=False)
+        return codes
+
+    def add(self, vectors: np.ndarray, block_size: int = 65536):
+        """
+        將新的向量分配到既有的群並編碼（附加在索引最後面）
+        """
+        if not self.is_trained:
+            raise ValueError("索引尚未訓練")
+        assignments, codes = [self.assignments], [self.codes]
+        for start in range(0, vectors.shape[0], block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            block_assignments = _assign(block, self.centroids, spherical=True)
+            assignments.append(block_assignments)
+            if self.m:
+                codes.append(self._encode(block, block_assignments))
+        self.assignments = np.concatenate(assignments)
+        if self.m:
+            self.codes = np.concatenate(codes)
+        self._lists = None
+
+    def keep_rows(self, rows: np.ndarray):
+        """
+        只保留指定的列（向量資料庫刪除片段後呼叫，列順序需與資料庫相同）
+        """
+        self.assignments = self.assignments[rows]
+        if self.m:
+            self.codes = self.codes[rows]
+        self._lists = None
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        # 依群排序的列索引，以及每一群在其中的起點
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+            offsets = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: Optional[int] = None,
+        rerank: Optional[int] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        近似搜尋最相似的 k 個向量
+
+        Args:
+            vectors: 原始向量矩陣（未使用 PQ 或需要重新計分時讀取）
+            query: 正規化的查詢向量 (d,)
+            k: 返回數量
+            nprobe: 掃描的群數（None 表示使用建立時的設定）
+            rerank: 重新計分的候選數（None 表示使用建立時的設定）
+            mask: 只保留遮罩為 True 的列
+
+        Returns:
+            (列索引, 內積分數)，依分數由高到低排序
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        rerank = self.rerank if rerank is None else rerank
+
+        coarse = self.centroids @ query
+        probes = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < len(coarse) else np.arange(len(coarse))
+        order, offsets = self._inverted_lists()
+        candidates = np.concatenate([order[offsets[probe]:offsets[probe + 1]] for probe in probes])
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if candidates.size == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+
+        if self.m:
+            sub_dimension = query.shape[0] // self.m
+            table = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.m, sub_dimension))
+            scores = coarse[self.assignments[candidates]] + table[np.arange(self.m), self.codes[candidates]].sum(axis=1)
+            if rerank:
+                keep = min(max(rerank, k), candidates.size)
+                top = np.argpartition(-scores, keep - 1)[:keep] if keep < candidates.size else np.arange(candidates.size)
+                # mmap 以遞增順序讀取較快
+                candidates = np.sort(candidates[top])
+                scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+        else:
+            # mmap 以遞增順序讀取較快
+            candidates = np.sort(candidates)
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+
+        k = min(k, candidates.size)
+        top = np.argpartition(-scores, k - 1)[:k] if k < candidates.size else np.arange(candidates.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return candidates[top], scores[top]
+
+    def save(self, path: str):
+        arrays = {
+            "centroids": self.centroids,
+            "assignments": self.assignments,
+            "params": np.array(json.dumps({**self.params(), "trained_size": self.trained_size})),
+        }
+        if self.m:
+            arrays["codebooks"] = self.codebooks
+            arrays["codes"] = self.codes
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        with np.load(path) as data:
+            params = json.loads(str(data["params"]))
+            trained_size = params.pop("trained_size")
+            index = cls(**params)
+            index.centroids = data["centroids"]
+            index.assignments = data["assignments"]
+            if index.m:
+                index.codebooks = data["codebooks"]
+                index.codes = data["codes"]
+            index.trained_size = trained_size
+        return index
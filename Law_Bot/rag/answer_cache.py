@@ -0,0 +1,126 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    語意答案快取：新問題的 embedding 與快取中某個問題的餘弦相似度達到門檻，
+    且主題與索引版本相同時，直接返回快取的回答與來源片段
+
+    超過存活時間（TTL）的項目視為失效；超過容量上限時淘汰最久未使用的項目（LRU）。
+    索引版本改變（重新建立或增量更新索引）後，舊版本的項目不會再命中，並可呼叫 invalidate() 釋放。
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: Optional[float] = 3600, max_entries: int = 512):
+        """
+        Args:
+            threshold: 命中所需的最低餘弦相似度
+            ttl_seconds: 項目的存活秒數（None 表示不過期）
+            max_entries: 快取項目數量上限
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold 必須介於 0 與 1 之間")
+        if max_entries < 1:
+            raise ValueError("max_entries 必須大於 0")
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expired(self, entry: Dict, now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    def lookup(self, vector, topic: str, index_version: str) -> Optional[Dict]:
+        """
+        查詢最相似且符合條件的快取項目
+
+        Args:
+            vector: 問題的 embedding
+            topic: 問題的主題
+            index_version: 目前索引的版本
+
+        Returns:
+            快取項目（含 query / answer / source_documents / similarity）；未命中時為 None
+        """
+        vector = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            expired = [entry_id for entry_id, entry in self._entries.items() if self._expired(entry, now)]
+            for entry_id in expired:
+                del self._entries[entry_id]
+            self.evictions += len(expired)
+
+            candidates = [
+                (entry_id, entry) for entry_id, entry in self._entries.items()
+                if entry["topic"] == topic and entry["index_version"] == index_version
+                and entry["vector"].shape == vector.shape
+            ]
+            if candidates:
+                similarities = np.stack([entry["vector"] for _, entry in candidates]) @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return {**entry, "similarity": float(similarities[best])}
+            self.misses += 1
+            return None
+
+    def put(self, vector, topic: str, index_version: str, query: str, answer: str, source_documents: List):
+        """
+        寫入快取，必要時淘汰最久未使用的項目
+        """
+        entry = {
+            "vector": self._normalize(vector),
+            "topic": topic,
+            "index_version": index_version,
+            "query": query,
+            "answer": answer,
+            "source_documents": list(source_documents),
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, index_version: Optional[str] = None):
+        """
+        移除指定索引版本的項目（None 表示清空快取）
+        """
+        with self._lock:
+            if index_version is None:
+                self._entries.clear()
+                return
+            for entry_id in [entry_id for entry_id, entry in self._entries.items() if entry["index_version"] == index_version]:
+                del self._entries[entry_id]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
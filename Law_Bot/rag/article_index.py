@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+ARTICLE_FILE = "article_index.json"
+
+# 法規名稱的別名：統一成簡稱
+_CODE_ALIASES = {
+    "中華民國刑法": "刑法",
+    "刑法": "刑法",
+    "刑事訴訟法": "刑事訴訟法",
+    "刑訴法": "刑事訴訟法",
+    "民法": "民法",
+    "憲法": "憲法",
+}
+
+_NUMBER = r"[0-9一二三四五六七八九十百千零〇兩]+"
+
+# 例：刑法第358條、第225條1項、第321條第1項第2款、第185條之3、第三百二十條
+ARTICLE_PATTERN = re.compile(
+    r"(?P<code>" + "|".join(sorted(_CODE_ALIASES, key=len, reverse=True)) + r")?\s*"
+    r"第\s*(?P<article>" + _NUMBER + r")\s*條"
+    r"(?:\s*之\s*(?P<sub>" + _NUMBER + r"))?"
+    r"(?:\s*第?\s*(?P<paragraph>" + _NUMBER + r")\s*項)?"
+    r"(?:\s*第?\s*(?P<item>" + _NUMBER + r")\s*款)?"
+)
+
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+
+def _to_int(text: str) -> Optional[int]:
+    """
+    將阿拉伯數字或中文數字（例如「三百二十一」）轉成整數；混用兩者（例如「1十」）時返回 None
+    """
+    if text.isdigit():
+        return int(text)
+    total, digit = 0, 0
+    for char in text:
+        if char in _DIGITS:
+            digit = _DIGITS[char]
+        elif char in _UNITS:
+            total += (digit or 1) * _UNITS[char]
+            digit = 0
+        else:
+            return None
+    return total + digit
+
+
+class ArticleRef(NamedTuple):
+    """
+    正規化的法條引用：法規（未寫明時為空字串）、條（含「之」，例如 "185-3"）、項、款（未寫明時為 0）
+    """
+    code: str
+    article: str
+    paragraph: int = 0
+    item: int = 0
+
+    def __str__(self) -> str:
+        article = self.article.replace("-", "條之")
+        text = f"{self.code}第{article}" + ("" if "-" in self.article else "條")
+        if self.paragraph:
+            text += f"第{self.paragraph}項"
+        if self.item:
+            text += f"第{self.item}款"
+        return text
+
+
+def parse_article_references(text: str) -> List[ArticleRef]:
+    """
+    找出文本中所有的法條引用
+
+    Args:
+        text: 查詢或片段文本（全形數字會先轉成半形）
+
+    Returns:
+        依出現順序排列、不重複的 ArticleRef 列表（數字無法解析的引用會略過）
+    """
+    text = unicodedata.normalize("NFKC", text)
+    refs = []
+    for match in ARTICLE_PATTERN.finditer(text):
+        numbers = [
+            _to_int(match.group(name)) if match.group(name) else 0
+            for name in ("article", "sub", "paragraph", "item")
+        ]
+        if None in numbers:
+            continue
+        article, sub, paragraph, item = numbers
+        ref = ArticleRef(
+            code=_CODE_ALIASES.get(match.group("code") or "", ""),
+            article=f"{article}-{sub}" if sub else str(article),
+            paragraph=paragraph,
+            item=item,
+        )
+        if ref not in refs:
+            refs.append(ref)
+    return refs
+
+
+class ArticleIndex:
+    """
+    法條引用索引：正規化的法條引用 -> 引用該法條的片段
+
+    建立索引時解析每個片段引用的法條；查詢直接寫出法條時，不需 embedding 也不需向量搜尋。
+    以 JSON 保存每個片段的引用列表，載入時重建反向對照。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 索引檔路徑（None 表示只保存在記憶體中）
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._refs_by_chunk: Dict[str, List[ArticleRef]] = {}
+        # 條 -> 片段 id -> 該片段中引用此條的所有 ArticleRef
+        self._chunks_by_article: Dict[str, Dict[str, List[ArticleRef]]] = {}
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for chunk_id, refs in json.load(f).items():
+                    self._index(chunk_id, [ArticleRef(*ref) for ref in refs])
+
+    @classmethod
+    def for_directory(cls, persist_directory: str) -> "ArticleIndex":
+        """
+        開啟向量資料庫目錄中的法條引用索引
+        """
+        return cls(os.path.join(persist_directory, ARTICLE_FILE))
+
+    def __len__(self) -> int:
+        return len(self._refs_by_chunk)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._refs_by_chunk
+
+    def _index(self, chunk_id: str, refs: List[ArticleRef]):
+        self._refs_by_chunk[chunk_id] = refs
+        for ref in refs:
+            self._chunks_by_article.setdefault(ref.article, {}).setdefault(chunk_id, []).append(ref)
+
+    def add(self, chunk_id: str, text: str):
+        """
+        加入或更新片段（不引用任何法條的片段也會記錄，避免重複解析）
+        """
+        refs = parse_article_references(text)
+        with self._lock:
+            if chunk_id in self._refs_by_chunk:
+                self.remove([chunk_id])
+            self._index(chunk_id, refs)
+
+    def add_references(self, chunk_id: str, refs: Iterable[ArticleRef]):
+        """
+        將額外的法條引用併入已加入的片段（例如去重時合併掉的別名所引用的法條）
+        """
+        with self._lock:
+            if chunk_id not in self._refs_by_chunk:
+                return
+            new_refs = [ref for ref in dict.fromkeys(refs) if ref not in self._refs_by_chunk[chunk_id]]
+            self._refs_by_chunk[chunk_id] = self._refs_by_chunk[chunk_id] + new_refs
+            for ref in new_refs:
+                self._chunks_by_article.setdefault(ref.article, {}).setdefault(chunk_id, []).append(ref)
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """
+        批次加入 (片段 id, 文本)
+        """
+        for chunk_id, text in items:
+            self.add(chunk_id, text)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """
+        刪除片段
+        """
+        with self._lock:
+            for chunk_id in chunk_ids:
+                for ref in self._refs_by_chunk.pop(chunk_id, []):
+                    chunks = self._chunks_by_article.get(ref.article, {})
+                    chunks.pop(chunk_id, None)
+                    if not chunks:
+                        self._chunks_by_article.pop(ref.article, None)
+
+    def lookup(self, refs: Iterable[ArticleRef], k: Optional[int] = None) -> List[str]:
+        """
+        查詢引用指定法條的片段
+
+        片段引用的項、款與查詢完全相符（或更細）時排在前面，只引用到「條」的片段排在後面；
+        同一層級中引用次數多者優先。查詢寫明法規時，只比對同一法規或未寫明法規的引用。
+
+        Args:
+            refs: 查詢中的法條引用
+            k: 最多返回的片段數（None 表示全部）
+
+        Returns:
+            片段 id 列表
+        """
+        scores: Dict[str, Tuple[int, int]] = {}
+        with self._lock:
+            for query_ref in refs:
+                for chunk_id, chunk_refs in self._chunks_by_article.get(query_ref.article, {}).items():
+                    best = None
+                    for ref in chunk_refs:
+                        if query_ref.code and ref.code and ref.code != query_ref.code:
+                            continue
+                        if query_ref.paragraph and ref.paragraph and ref.paragraph != query_ref.paragraph:
+                            continue
+                        if query_ref.item and ref.item and ref.item != query_ref.item:
+                            continue
+                        # 引用的層級涵蓋查詢要求的項、款時為精確相符
+                        exact = (not query_ref.paragraph or ref.paragraph) and (not query_ref.item or ref.item)
+                        best = max(best or 0, 2 if exact else 1)
+                    if best is None:
+                        continue
+                    level, count = scores.get(chunk_id, (0, 0))
+                    scores[chunk_id] = (max(level, best), count + len(chunk_refs))
+
+        ranked = sorted(scores, key=lambda chunk_id: scores[chunk_id], reverse=True)
+        return ranked[:k] if k is not None else ranked
+
+    def save(self, path: Optional[str] = None):
+        """
+        寫入磁碟（先寫入暫存檔再替換）
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(
+                    {chunk_id: [list(ref) for ref in refs] for chunk_id, refs in self._refs_by_chunk.items()},
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(f"{path}.tmp", path)
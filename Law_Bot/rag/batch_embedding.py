@@ -0,0 +1,123 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    批次、並行的 Embedding 包裝器
+
+    將大量文本切成固定大小的批次，以執行緒池並行呼叫底層 embedding 模型，
+    並以共享的信號量限制同時進行中的請求數量；每個批次失敗時會自動重試。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        max_workers: int = 4,
+        max_in_flight: int = None,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+    ):
+        """
+        Args:
+            embeddings: 底層 embedding 模型（例如 GoogleGenerativeAIEmbeddings）
+            batch_size: 每個批次的文本數量
+            max_workers: 並行處理批次的執行緒數量
+            max_in_flight: 同時進行中的請求上限（預設與 max_workers 相同，跨呼叫共享）
+            max_retries: 每個批次失敗後的最大重試次數
+            retry_backoff: 重試等待的基礎秒數（指數退避）
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size 必須大於 0")
+        if max_workers < 1:
+            raise ValueError("max_workers 必須大於 0")
+
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight or max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        # 所有呼叫共用同一個信號量，多個語料同時建索引時也不會超過上限
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self._stats_lock = threading.Lock()
+        self.stats = {"texts": 0, "batches": 0, "retries": 0, "failures": 0}
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """
+        嵌入單一批次，失敗時以指數退避重試
+        """
+        attempt = 0
+        while True:
+            try:
+                with self._in_flight:
+                    vectors = self.embeddings.embed_documents(batch)
+                if len(vectors) != len(batch):
+                    raise RuntimeError(f"Embedding 數量不符：預期 {len(batch)}，實際 {len(vectors)}")
+                with self._stats_lock:
+                    self.stats["batches"] += 1
+                    self.stats["texts"] += len(batch)
+                return vectors
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    with self._stats_lock:
+                        self.stats["failures"] += 1
+                    raise
+                attempt += 1
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                wait_seconds = self.retry_backoff * (2 ** (attempt - 1))
+                print(f"⚠️ Embedding 批次失敗（{e}），{wait_seconds:.1f} 秒後進行第 {attempt} 次重試")
+                time.sleep(wait_seconds)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        批次並行嵌入文本，回傳順序與輸入相同
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+
+        batches = [
+            texts[start:start + self.batch_size]
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        if len(batches) == 1 or self.max_workers == 1:
+            return [vector for batch in batches for vector in self._embed_batch(batch)]
+
+        results = [None] * len(batches)
+        # 只預先提交有限數量的批次，避免一次排入全部工作
+        window = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {}
+            next_index = 0
+            while next_index < len(batches) or pending:
+                while next_index < len(batches) and len(pending) < window:
+                    future = executor.submit(self._embed_batch, batches[next_index])
+                    pending[future] = next_index
+                    next_index += 1
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        results[index] = future.result()
+                    except Exception:
+                        for other in pending:
+                            other.cancel()
+                        raise
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        嵌入查詢文本（單筆請求，同樣受並行上限控制）
+        """
+        with self._in_flight:
+            return self.embeddings.embed_query(text)
@@ -0,0 +1,92 @@
+"""
+法條直接查詢效能測試：法條引用索引 vs 混合檢索
+
+在合成考古題（或資料目錄中的語料）上測量：
+- 建立法條引用索引的時間與涵蓋的片段數
+- 寫出法條的查詢（例如「刑法第271條」）：法條查詢與混合檢索（向量 + 詞彙）的延遲
+- 前 k 個結果中確實引用該法條的比例
+
+向量部分使用本地字元 n-gram 雜湊 embedding，不需 API 金鑰；
+實際使用 Gemini 時混合檢索還需要一次 embedding API 呼叫，法條查詢則完全不需要。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_article_lookup.py --questions 1500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_rag import LawDocumentParser
+from article_index import ArticleIndex, parse_article_references
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from numpy_store import NumpyVectorStore
+from corpus import DEFAULT_DATA_DIR, load_corpus_texts, _OFFENCES
+from fake_embeddings import HashingEmbeddings
+
+
+def percentiles(samples):
+    return np.percentile(samples, 50) * 1000, np.percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="法條直接查詢效能測試")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="資料目錄")
+    parser.add_argument("--questions", type=int, default=1500, help="找不到資料時的合成題目數")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--fetch-k", type=int, default=20, help="混合檢索每種檢索各自取得的候選數")
+    args = parser.parse_args()
+
+    law_parser = LawDocumentParser()
+    chunks = []
+    for _, text in load_corpus_texts(args.data_dir, args.questions):
+        chunks.extend(law_parser.text_splitter.split_documents(law_parser.parse_law_document(text)))
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    texts = [chunk.page_content for chunk in chunks]
+    refs_by_id = {chunk_id: set(parse_article_references(text)) for chunk_id, text in zip(ids, texts)}
+    print(f"\n📄 {len(chunks)} 個片段")
+
+    articles = ArticleIndex()
+    start = time.perf_counter()
+    articles.add_many(zip(ids, texts))
+    print(f"建立法條引用索引：{time.perf_counter() - start:.2f}s（{sum(bool(refs) for refs in refs_by_id.values())} 個片段引用法條）")
+
+    lexical = LexicalIndex()
+    lexical.add_many(zip(ids, texts))
+    store = NumpyVectorStore(embedding_function=HashingEmbeddings())
+    store.add_texts(texts, metadatas=[{"content_hash": chunk_id} for chunk_id in ids], ids=ids)
+
+    queries = []
+    for offence, article in _OFFENCES:
+        queries.append(f"{article}{offence}如何論處？")
+        queries.append(f"請說明{article}的構成要件")
+
+    def lookup(query):
+        return articles.lookup(parse_article_references(query), k=args.k)
+
+    def hybrid(query):
+        vector_ids = [doc.metadata["content_hash"] for doc in store.similarity_search(query, k=args.fetch_k)]
+        lexical_ids = [chunk_id for chunk_id, _ in lexical.search(query, k=args.fetch_k)]
+        return [chunk_id for chunk_id, _ in reciprocal_rank_fusion([vector_ids, lexical_ids])[:args.k]]
+
+    print(f"\n寫出法條的查詢（{len(queries)} 個）")
+    print(f"{'方法':<10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'引用該法條':>12}")
+    for name, search in (("法條查詢", lookup), ("混合檢索", hybrid)):
+        samples, precision = [], []
+        for query in queries:
+            start = time.perf_counter()
+            top = search(query)
+            samples.append(time.perf_counter() - start)
+            wanted = {ref.article for ref in parse_article_references(query)}
+            precision.append(sum(bool(wanted & {ref.article for ref in refs_by_id[chunk_id]}) for chunk_id in top) / args.k)
+        p50, p99 = percentiles(samples)
+        print(f"{name:<8}{p50:>10.3f}{p99:>10.3f}{np.mean(precision):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
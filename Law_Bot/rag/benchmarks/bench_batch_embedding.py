@@ -0,0 +1,62 @@
+"""
+批次並行 embedding 效能測試
+
+使用本地假 embedding 模型（模擬 API 延遲與偶發失敗），比較不同批次大小與並行數的吞吐量（chunks/sec）。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_batch_embedding.py --chunks 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_embedding import BatchedEmbeddings
+from fake_embeddings import FakeEmbeddings, make_synthetic_chunks
+
+
+def run_case(chunks, batch_size, workers, failure_rate, latency):
+    fake = FakeEmbeddings(request_latency=latency, failure_rate=failure_rate)
+    embedder = BatchedEmbeddings(
+        fake,
+        batch_size=batch_size,
+        max_workers=workers,
+        max_retries=5,
+        retry_backoff=0.01,
+    )
+    start = time.perf_counter()
+    vectors = embedder.embed_documents(chunks)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(chunks)
+    return elapsed, embedder.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批次並行 embedding 效能測試")
+    parser.add_argument("--chunks", type=int, default=2000, help="測試片段數量")
+    parser.add_argument("--latency", type=float, default=0.05, help="模擬每次請求延遲（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="模擬請求失敗機率")
+    args = parser.parse_args()
+
+    chunks = make_synthetic_chunks(args.chunks)
+    print(f"📊 測試片段數：{len(chunks)}，模擬延遲：{args.latency}s，失敗率：{args.failure_rate}")
+    print(f"{'批次大小':>8} {'並行數':>6} {'耗時(s)':>9} {'chunks/sec':>11} {'重試':>5}")
+
+    cases = [
+        (len(chunks), 1),  # 一次送出全部（相當於原本的 Chroma.from_documents）
+        (16, 1),
+        (16, 4),
+        (64, 4),
+        (64, 8),
+        (128, 8),
+    ]
+    for batch_size, workers in cases:
+        elapsed, stats = run_case(chunks, batch_size, workers, args.failure_rate, args.latency)
+        print(f"{batch_size:>8} {workers:>6} {elapsed:>9.3f} {len(chunks) / elapsed:>11.1f} {stats['retries']:>5}")
+
+
+if __name__ == "__main__":
+    main()
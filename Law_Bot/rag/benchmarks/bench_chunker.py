@@ -0,0 +1,94 @@
+"""
+文本分割方式比較：結構化分割 vs 遞迴字元分割
+
+在資料目錄中的語料（找不到時改用合成考古題）上比較兩種分割方式的片段數、索引大小與 recall@k。
+召回率以本地字元 n-gram 雜湊 embedding 計算：每個章節取一段原文作為查詢，
+只要前 k 個結果中有來自同一題同一章節的片段就算命中。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_chunker.py --data-dir ./data
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_rag import LawDocumentParser
+from corpus import DEFAULT_DATA_DIR, load_corpus_texts
+from fake_embeddings import HashingEmbeddings
+
+
+def make_queries(documents, rng, per_section=1, length=30):
+    """從每個章節擷取一段原文作為查詢，回傳 (查詢, (題目標題, 章節))"""
+    queries = []
+    for doc in documents:
+        text = doc.page_content.strip()
+        if len(text) < length * 2:
+            continue
+        for _ in range(per_section):
+            start = rng.randint(0, len(text) - length)
+            key = (doc.metadata.get("title"), doc.metadata.get("section"))
+            queries.append((text[start:start + length], key))
+    return queries
+
+
+def evaluate(parser, documents, queries, embedder, ks):
+    chunks = parser.text_splitter.split_documents(documents)
+    matrix = np.asarray(embedder.embed_documents([chunk.page_content for chunk in chunks]), dtype=np.float32)
+    keys = [(chunk.metadata.get("title"), chunk.metadata.get("section")) for chunk in chunks]
+
+    query_matrix = np.asarray(embedder.embed_documents([query for query, _ in queries]), dtype=np.float32)
+    scores = query_matrix @ matrix.T
+    ranking = np.argsort(-scores, axis=1)[:, :max(ks)]
+
+    recall = {}
+    for k in ks:
+        hits = sum(
+            any(keys[index] == target for index in ranking[row, :k])
+            for row, (_, target) in enumerate(queries)
+        )
+        recall[k] = hits / len(queries)
+
+    return {
+        "chunks": len(chunks),
+        "chars": sum(len(chunk.page_content) for chunk in chunks),
+        "vector_bytes": matrix.shape[0] * 768 * 4,  # 以 Gemini embedding-001 的 768 維 float32 估算
+        "recall": recall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文本分割方式比較")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="資料目錄")
+    parser.add_argument("--questions", type=int, default=300, help="找不到資料時的合成題目數")
+    parser.add_argument("--max-tokens", type=int, default=1000, help="結構化分割的 token 預算")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    embedder = HashingEmbeddings()
+    ks = (1, 3, 5)
+    parsers = {
+        "遞迴字元分割": LawDocumentParser(chunker="recursive"),
+        "結構化分割": LawDocumentParser(chunker="structure", chunk_max_tokens=args.max_tokens),
+    }
+
+    for name, text in load_corpus_texts(args.data_dir, args.questions):
+        documents = parsers["結構化分割"].parse_law_document(text)
+        queries = make_queries(documents, rng)
+        print(f"\n📊 {name}：{len(documents)} 個章節，{len(queries)} 個查詢")
+        print(f"{'分割方式':<10}{'片段數':>8}{'字元數':>10}{'向量(MB)':>10}" + "".join(f"{'R@' + str(k):>8}" for k in ks))
+        for parser_name, law_parser in parsers.items():
+            result = evaluate(law_parser, documents, queries, embedder, ks)
+            print(
+                f"{parser_name:<10}{result['chunks']:>8}{result['chars']:>10}{result['vector_bytes'] / 1e6:>10.2f}"
+                + "".join(f"{result['recall'][k]:>8.3f}" for k in ks)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+混合檢索效能測試：詞彙索引（字元 n-gram + BM25）與向量搜尋
+
+在合成考古題（或資料目錄中的語料）上測量：
+- 詞彙索引的查詢延遲 p50 / p99 與增量新增 / 刪除的延遲
+- 含專有名詞的查詢（罪名、法條）前 k 個結果中確實包含該詞的比例：向量、詞彙、融合三種檢索
+
+向量部分使用本地字元 n-gram 雜湊 embedding，不需 API 金鑰。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_hybrid.py --questions 1500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_rag import LawDocumentParser
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from numpy_store import NumpyVectorStore
+from corpus import DEFAULT_DATA_DIR, load_corpus_texts, _OFFENCES
+from fake_embeddings import HashingEmbeddings
+
+
+def percentiles(samples):
+    return np.percentile(samples, 50) * 1000, np.percentile(samples, 99) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="混合檢索效能測試")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="資料目錄")
+    parser.add_argument("--questions", type=int, default=1500, help="找不到資料時的合成題目數")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=20, help="每種檢索各自取得的候選數")
+    args = parser.parse_args()
+
+    law_parser = LawDocumentParser()
+    chunks = []
+    for _, text in load_corpus_texts(args.data_dir, args.questions):
+        chunks.extend(law_parser.text_splitter.split_documents(law_parser.parse_law_document(text)))
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    texts = [chunk.page_content for chunk in chunks]
+    text_by_id = dict(zip(ids, texts))
+    print(f"\n📄 {len(chunks)} 個片段")
+
+    lexical = LexicalIndex()
+    start = time.perf_counter()
+    lexical.add_many(zip(ids, texts))
+    lexical.save(os.path.join(tempfile.mkdtemp(prefix="bench_lexical_"), "lexical_index.npz"))
+    print(f"建立詞彙索引：{time.perf_counter() - start:.2f}s")
+
+    store = NumpyVectorStore(embedding_function=HashingEmbeddings())
+    store.add_texts(texts, metadatas=[{"content_hash": chunk_id} for chunk_id in ids], ids=ids)
+
+    queries = []
+    for offence, article in _OFFENCES:
+        queries.append((f"{article}{offence}", offence))
+        queries.append((f"請說明{offence}的構成要件", offence))
+        queries.append((f"{article}的適用", article))
+
+    samples = []
+    for _ in range(20):
+        for query, _ in queries:
+            start = time.perf_counter()
+            lexical.search(query, k=args.fetch_k)
+            samples.append(time.perf_counter() - start)
+    p50, p99 = percentiles(samples)
+    print(f"詞彙索引查詢：p50 {p50:.3f}ms、p99 {p99:.3f}ms")
+
+    rng = random.Random(0)
+    add_samples, remove_samples = [], []
+    for chunk_id in rng.sample(ids, 200):
+        start = time.perf_counter()
+        lexical.remove([chunk_id])
+        remove_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        lexical.add(chunk_id, text_by_id[chunk_id])
+        add_samples.append(time.perf_counter() - start)
+    print(f"增量刪除：p50 {percentiles(remove_samples)[0]:.3f}ms；增量新增：p50 {percentiles(add_samples)[0]:.3f}ms")
+    samples = []
+    for query, _ in queries:
+        start = time.perf_counter()
+        lexical.search(query, k=args.fetch_k)
+        samples.append(time.perf_counter() - start)
+    p50, p99 = percentiles(samples)
+    print(f"增量更新後查詢（尚未 save）：p50 {p50:.3f}ms、p99 {p99:.3f}ms")
+
+    precision = {"向量": [], "詞彙": [], "融合": []}
+    for query, term in queries:
+        vector_ids = [doc.metadata["content_hash"] for doc in store.similarity_search(query, k=args.fetch_k)]
+        lexical_ids = [chunk_id for chunk_id, _ in lexical.search(query, k=args.fetch_k)]
+        fused_ids = [chunk_id for chunk_id, _ in reciprocal_rank_fusion([vector_ids, lexical_ids])]
+        for name, ranking in (("向量", vector_ids), ("詞彙", lexical_ids), ("融合", fused_ids)):
+            top = ranking[:args.k]
+            precision[name].append(sum(term in text_by_id[chunk_id] for chunk_id in top) / args.k)
+
+    print(f"\n含專有名詞的查詢：前 {args.k} 個結果包含該詞的比例（{len(queries)} 個查詢）")
+    for name, values in precision.items():
+        print(f"{name:<6}{np.mean(values):>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+題目解析器效能測試
+
+比較單次線性掃描（law_scanner）與原本逐一嘗試正規表示式的解析方式，
+並確認兩者在合成考古題上的輸出完全相同。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_parser.py --questions 10000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from law_scanner import QUESTION_PATTERNS, find_question_starts, extract_sections
+
+
+def legacy_find_question_starts(text):
+    """原本的做法：依序對每個模式掃描整份文本"""
+    for pattern in QUESTION_PATTERNS:
+        matches = list(re.finditer(pattern, text))
+        if matches:
+            return pattern, [match.start() for match in matches]
+    return None, []
+
+
+def legacy_extract_sections(question_text):
+    """原本的 _extract_sections 實作"""
+    sections = {}
+    fact_patterns = [
+        r'(甲.*?請問.*?罪責？)',
+        r'(甲.*?試問.*?如何\?)',
+        r'(甲.*?請.*?分析)',
+        r'(甲.*?)',
+    ]
+    for pattern in fact_patterns:
+        fact_match = re.search(pattern, question_text, re.DOTALL)
+        if fact_match:
+            sections["案例事實"] = fact_match.group(1)
+            break
+    structure_match = re.search(r'【答題架構】(.*?)(?:【爭點記憶】|$)', question_text, re.DOTALL)
+    if structure_match:
+        sections["答題架構"] = structure_match.group(1)
+    points_match = re.search(r'【爭點記憶】(.*?)(?=\d+\.|$)', question_text, re.DOTALL)
+    if points_match:
+        sections["爭點記憶"] = points_match.group(1)
+    if not sections:
+        sections["完整內容"] = question_text
+    return sections
+
+
+def parse(text, find_starts, extract):
+    """與 LawRAGPipeline.parse_law_document 相同的流程，回傳 (題號, 標題, 章節, 內容)"""
+    _, starts = find_starts(text)
+    results = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        question_text = text[start:end].strip()
+        if not question_text:
+            continue
+        title = question_text.split('\n', 1)[0]
+        for section_name, content in extract(question_text).items():
+            if content.strip():
+                results.append((i + 1, title, section_name, content))
+    return results
+
+
+def make_question(number, rng, hard=False):
+    """產生一題合成考古題；hard=True 時案例事實缺少「罪責？」，觸發原本正規表示式的回溯"""
+    year = rng.randint(90, 113)
+    facts = "甲於夜間侵入乙宅竊取財物，" * rng.randint(1, 4)
+    if hard:
+        facts += "請問甲之行為如何評價，" * 30 + "並說明理由。"
+    else:
+        facts += "請問甲之罪責？"
+    return (
+        f"{number}. {year}年台大法研所 刑法分則\n"
+        f"{facts}\n"
+        f"【答題架構】\n(一)甲成立刑法第321條加重竊盜罪\n(二)刑法第329條準強盜罪之適用\n"
+        f"【爭點記憶】\n準強盜罪之「當場」應如何解釋，實務採時空密接說。\n"
+    )
+
+
+def make_corpus(questions, hard_ratio, seed=0):
+    rng = random.Random(seed)
+    return "\n".join(
+        make_question(i + 1, rng, hard=rng.random() < hard_ratio)
+        for i in range(questions)
+    )
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="題目解析器效能測試")
+    parser.add_argument("--questions", type=int, default=10000, help="合成題目數量")
+    parser.add_argument("--hard-ratio", type=float, default=0.1, help="缺少「罪責？」的題目比例")
+    args = parser.parse_args()
+
+    for hard_ratio in (0.0, args.hard_ratio):
+        text = make_corpus(args.questions, hard_ratio)
+        print(f"📊 {args.questions} 題（{len(text) / 1e6:.1f}M 字元，回溯題目比例 {hard_ratio:.0%}）")
+
+        legacy, legacy_seconds = timed(parse, text, legacy_find_question_starts, legacy_extract_sections)
+        scanner, scanner_seconds = timed(parse, text, find_question_starts, extract_sections)
+
+        assert legacy == scanner, "單次掃描與原本的解析結果不一致"
+        print(f"  原本解析器：{legacy_seconds:.3f}s")
+        print(f"  單次掃描：  {scanner_seconds:.3f}s（{legacy_seconds / scanner_seconds:.1f}x）")
+        print(f"  ✅ 輸出一致，共 {len(scanner)} 個文件片段")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+向量降維效能測試：PCA / 隨機投影
+
+對不同的召回率目標擬合投影（以語料片段當作查詢自動選擇維度），再以另外的查詢向量測量：
+- 選出的維度與磁碟上的向量大小
+- 與原始維度暴力搜尋相比的 recall@k
+- 查詢延遲 p50
+
+向量來源：
+- 語料（合成考古題或資料目錄）以本地字元 n-gram 雜湊 embedding 嵌入
+- 合成的 768 維向量，特徵值依冪律遞減（接近實際文字 embedding 的頻譜）
+
+執行方式：
+    cd rag
+    python benchmarks/bench_projection.py --size 20000 --targets 0.9 0.95 0.99
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_rag import LawDocumentParser
+from numpy_store import VECTORS_FILE, NumpyVectorStore
+from corpus import DEFAULT_DATA_DIR, load_corpus_texts
+from fake_embeddings import HashingEmbeddings
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_power_law_vectors(count, dimension=768, decay=1.0, clusters=256, seed=0):
+    """
+    第 i 個主方向的標準差為 i^(-decay/2)，再隨機旋轉；另加上分群結構
+    """
+    rng = np.random.default_rng(seed)
+    scales = np.arange(1, dimension + 1, dtype=np.float32) ** (-decay / 2)
+    rotation, _ = np.linalg.qr(rng.standard_normal((dimension, dimension)))
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32) * scales
+    points = centers[rng.integers(0, clusters, size=count)] + 0.5 * rng.standard_normal((count, dimension)).astype(np.float32) * scales
+    return normalize((points @ rotation.T).astype(np.float32))
+
+
+def run_case(name, vectors, queries, targets, methods, k):
+    ids = [f"id-{i}" for i in range(vectors.shape[0])]
+    texts = ids
+    metadatas = [{} for _ in ids]
+    print(f"\n📐 {name}：{vectors.shape[0]} 個 {vectors.shape[1]} 維向量，{queries.shape[0]} 個查詢，k={k}")
+    print(f"{'設定':<22}{'維度':>6}{'向量檔 (MB)':>12}{f'recall@{k}':>10}{'p50 (ms)':>10}{'擬合 (s)':>10}")
+
+    truth = None
+    settings = [("原始維度", None)] + [
+        (f"{method} 目標 {target}", {"method": method, "recall_target": target, "k": k})
+        for method in methods for target in targets
+    ]
+    for label, params in settings:
+        directory = tempfile.mkdtemp(prefix="bench_projection_")
+        try:
+            store = NumpyVectorStore(persist_directory=directory, projection_params=params)
+            store.add_vectors(ids, vectors, texts, metadatas)
+            start = time.perf_counter()
+            store.persist()
+            fit_seconds = time.perf_counter() - start
+            store = NumpyVectorStore(persist_directory=directory)
+
+            results, samples = [], []
+            for query in queries:
+                start = time.perf_counter()
+                rows = store.similarity_search_by_vector_with_score(query, k=k)
+                samples.append(time.perf_counter() - start)
+                results.append({doc.page_content for doc, _ in rows})
+            if truth is None:
+                truth = results
+            recall = np.mean([len(found & expected) / k for found, expected in zip(results, truth)])
+            size = os.path.getsize(os.path.join(directory, VECTORS_FILE)) / 2**20
+            print(
+                f"{label:<18}{store._vectors.shape[1]:>6}{size:>12.2f}{recall:>10.3f}"
+                f"{np.percentile(samples, 50) * 1000:>10.2f}{fit_seconds:>10.2f}"
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量降維效能測試")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="資料目錄")
+    parser.add_argument("--questions", type=int, default=1500, help="找不到資料時的合成題目數")
+    parser.add_argument("--size", type=int, default=20000, help="合成向量數量")
+    parser.add_argument("--targets", type=float, nargs="+", default=[0.9, 0.95, 0.99], help="召回率目標")
+    parser.add_argument("--methods", nargs="+", default=["pca", "random"], help="降維方式")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--decay", type=float, nargs="+", default=[1.0, 1.5], help="合成向量頻譜的冪律衰減指數")
+    args = parser.parse_args()
+
+    law_parser = LawDocumentParser()
+    chunks = []
+    for _, text in load_corpus_texts(args.data_dir, args.questions):
+        chunks.extend(law_parser.text_splitter.split_documents(law_parser.parse_law_document(text)))
+    embedder = HashingEmbeddings(dimension=768)
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = normalize(np.asarray(embedder.embed_documents(texts), dtype=np.float32))
+    rng = np.random.default_rng(0)
+    query_texts = [texts[i][: len(texts[i]) // 3] for i in rng.choice(len(texts), size=args.queries, replace=False)]
+    queries = normalize(np.asarray(embedder.embed_documents(query_texts), dtype=np.float32))
+    run_case("語料片段（雜湊 embedding）", vectors, queries, args.targets, args.methods, args.k)
+
+    for decay in args.decay:
+        data = make_power_law_vectors(args.size + args.queries, decay=decay)
+        run_case(f"合成冪律頻譜向量（衰減 {decay}）", data[:args.size], data[args.size:], args.targets, args.methods, args.k)
+
+
+if __name__ == "__main__":
+    main()
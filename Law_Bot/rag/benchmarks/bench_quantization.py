@@ -0,0 +1,113 @@
+"""
+向量壓縮效能測試：float32 vs float16 / int8（含或不含原始向量重新計分）
+
+對每種設定建立 NumpyVectorStore 並重新開啟（原始向量以 mmap 載入），測量：
+- 搜尋時常駐記憶體的向量大小與磁碟上的檔案大小
+- 與 float32 暴力搜尋相比的 recall@k
+- 查詢延遲 p50
+
+向量來源：
+- 語料（合成考古題或資料目錄）以本地字元 n-gram 雜湊 embedding 嵌入
+- 合成的 768 維分群向量（與 Gemini embedding-001 相同維度）
+
+執行方式：
+    cd rag
+    python benchmarks/bench_quantization.py --sizes 5000 50000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from index_rag import LawDocumentParser
+from numpy_store import NumpyVectorStore
+from corpus import DEFAULT_DATA_DIR, load_corpus_texts
+from fake_embeddings import HashingEmbeddings, make_clustered_vectors
+
+SETTINGS = [
+    ("float32", None, 0),
+    ("float16", "float16", 0),
+    ("float16 + 重新計分", "float16", 64),
+    ("int8", "int8", 0),
+    ("int8 + 重新計分", "int8", 64),
+]
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+def run_case(name, vectors, queries, k):
+    ids = [f"id-{i}" for i in range(vectors.shape[0])]
+    texts = [""] * vectors.shape[0]
+    metadatas = [{} for _ in ids]
+    print(f"\n📐 {name}：{vectors.shape[0]} 個 {vectors.shape[1]} 維向量，{queries.shape[0]} 個查詢，k={k}")
+    print(f"{'設定':<20}{'常駐 (MB)':>10}{'磁碟 (MB)':>10}{f'recall@{k}':>10}{'p50 (ms)':>10}")
+
+    truth = None
+    for label, quantization, rescore in SETTINGS:
+        directory = tempfile.mkdtemp(prefix="bench_quantization_")
+        try:
+            store = NumpyVectorStore(persist_directory=directory, quantization=quantization, rescore=rescore)
+            store.add_vectors(ids, vectors, texts, metadatas)
+            store.persist()
+            store = NumpyVectorStore(persist_directory=directory, quantization=quantization, rescore=rescore)
+
+            results, samples = [], []
+            for query in queries:
+                start = time.perf_counter()
+                rows = store._top_k(query, k, None)
+                samples.append(time.perf_counter() - start)
+                results.append({row for row, _ in rows})
+            if truth is None:
+                truth = results
+            recall = np.mean([len(found & expected) / k for found, expected in zip(results, truth)])
+
+            usage = store.memory_usage()
+            resident = (usage["quantized"] or vectors.nbytes) / 2**20
+            print(
+                f"{label:<16}{resident:>10.2f}{directory_size(directory) / 2**20:>10.2f}"
+                f"{recall:>10.3f}{np.percentile(samples, 50) * 1000:>10.2f}"
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def normalize(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量壓縮效能測試")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="資料目錄")
+    parser.add_argument("--questions", type=int, default=1500, help="找不到資料時的合成題目數")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000], help="合成向量數量")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    law_parser = LawDocumentParser()
+    chunks = []
+    for _, text in load_corpus_texts(args.data_dir, args.questions):
+        chunks.extend(law_parser.text_splitter.split_documents(law_parser.parse_law_document(text)))
+    embedder = HashingEmbeddings(dimension=768)
+    texts = [chunk.page_content for chunk in chunks]
+    vectors = normalize(np.asarray(embedder.embed_documents(texts), dtype=np.float32))
+    rng = np.random.default_rng(0)
+    query_texts = [texts[i][: len(texts[i]) // 3] for i in rng.choice(len(texts), size=args.queries, replace=False)]
+    queries = normalize(np.asarray(embedder.embed_documents(query_texts), dtype=np.float32))
+    run_case("語料片段（雜湊 embedding）", vectors, queries, args.k)
+
+    for size in args.sizes:
+        data = normalize(make_clustered_vectors(size + args.queries, seed=size))
+        run_case("合成分群向量", data[:size], data[size:], args.k)
+
+
+if __name__ == "__main__":
+    main()
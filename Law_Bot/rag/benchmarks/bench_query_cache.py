@@ -0,0 +1,109 @@
+"""
+查詢 embedding 快取效能測試
+
+模擬 Streamlit 使用者反覆輸入範例問題（夾雜全形 / 半形、多餘空白、台 / 臺、句尾問號等寫法差異），
+以本地假 embedding 模型模擬 API 延遲，比較：
+- 不使用快取
+- 以原始查詢文本為鍵值的快取
+- 以正規化查詢為鍵值的快取（QueryCachedEmbeddings）
+
+執行方式：
+    cd rag
+    python benchmarks/bench_query_cache.py --queries 2000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_cache import QueryEmbeddingCache, QueryCachedEmbeddings
+from fake_embeddings import FakeEmbeddings
+
+EXAMPLE_QUESTIONS = [
+    "竊盜罪的構成要件有哪些",
+    "什麼是準強盜罪",
+    "某人故意殺害他人，應該如何論處",
+    "甲竊取他人財物後被發現，為了脫免逮捕而使用暴力",
+    "臺灣刑法第320條的適用",
+    "詐欺罪與背信罪如何區分",
+    "正當防衛的要件",
+    "過失致死罪的成立",
+]
+
+
+def variant(question, rng):
+    """
+    同一個問題的不同寫法
+    """
+    text = question
+    if rng.random() < 0.3:
+        text = text.replace("臺", "台") if "臺" in text else text.replace("台", "臺")
+    if rng.random() < 0.3:
+        text = text.translate(str.maketrans("0123456789", "０１２３４５６７８９"))
+    if rng.random() < 0.3:
+        text = " ".join(text[i:i + 4] for i in range(0, len(text), 4))
+    if rng.random() < 0.5:
+        text += rng.choice(["？", "?", "。", ""])
+    if rng.random() < 0.2:
+        text = f"  {text} "
+    return text
+
+
+class RawKeyCachedEmbeddings:
+    """
+    以原始文本為鍵值的快取（對照組）
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.cache = {}
+
+    def embed_query(self, text):
+        if text not in self.cache:
+            self.cache[text] = self.embeddings.embed_query(text)
+        return self.cache[text]
+
+
+def run_case(name, embedder, queries, fake):
+    calls = fake.calls
+    start = time.perf_counter()
+    for query in queries:
+        embedder.embed_query(query)
+    elapsed = time.perf_counter() - start
+    api_calls = fake.calls - calls
+    print(f"{name:<16}{api_calls:>10}{1 - api_calls / len(queries):>10.1%}{elapsed / len(queries) * 1000:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查詢 embedding 快取效能測試")
+    parser.add_argument("--queries", type=int, default=2000, help="模擬的查詢數")
+    parser.add_argument("--latency", type=float, default=0.02, help="模擬每次 embedding 請求延遲（秒）")
+    parser.add_argument("--cache-size", type=int, default=1024, help="記憶體快取的查詢數上限")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = [variant(rng.choice(EXAMPLE_QUESTIONS), rng) for _ in range(args.queries)]
+    print(f"📊 {len(queries)} 個查詢（{len(EXAMPLE_QUESTIONS)} 個範例問題、{len(set(queries))} 種寫法），模擬延遲 {args.latency}s")
+    print(f"{'方式':<14}{'API 呼叫':>10}{'命中率':>10}{'平均 (ms)':>12}")
+
+    fake = FakeEmbeddings(request_latency=args.latency, per_text_latency=0)
+    run_case("不使用快取", fake, queries, fake)
+    run_case("原始文本鍵值", RawKeyCachedEmbeddings(fake), queries, fake)
+    run_case("正規化鍵值", QueryCachedEmbeddings(fake, QueryEmbeddingCache(args.cache_size), "fake"), queries, fake)
+
+    # 重新啟動後：新的記憶體快取，由 SQLite 磁碟層命中
+    path = os.path.join(tempfile.mkdtemp(prefix="bench_query_cache_"), "query_cache.sqlite")
+    warm = QueryCachedEmbeddings(fake, QueryEmbeddingCache(args.cache_size, path=path), "fake")
+    for question in EXAMPLE_QUESTIONS:
+        warm.embed_query(question)
+    restarted = QueryCachedEmbeddings(fake, QueryEmbeddingCache(args.cache_size, path=path), "fake")
+    run_case("重新啟動（磁碟）", restarted, queries, fake)
+    print(f"\n重新啟動後的快取統計：{restarted.cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+向量資料庫後端延遲比較：Chroma vs NumpyVectorStore
+
+以合成的 768 維向量（與 Gemini embedding-001 相同維度）建立兩種後端的資料庫，
+查詢 embedding 從預先產生的向量表取得，只測量資料庫本身的開啟時間與查詢延遲。
+
+執行方式：
+    cd rag
+    python benchmarks/bench_vector_store.py --sizes 1000 5000 20000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import Chroma
+from numpy_store import NumpyVectorStore
+from fake_embeddings import LookupEmbeddings, make_clustered_vectors
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def build_store(backend, directory, texts, metadatas, embedder):
+    if backend == "numpy":
+        store = NumpyVectorStore(persist_directory=directory, embedding_function=embedder)
+    else:
+        store = Chroma(persist_directory=directory, embedding_function=embedder)
+    for start in range(0, len(texts), 1000):
+        store.add_texts(texts[start:start + 1000], metadatas=metadatas[start:start + 1000],
+                        ids=[f"id-{i}" for i in range(start, min(start + 1000, len(texts)))])
+    store.persist()
+
+
+def open_store(backend, directory, embedder):
+    if backend == "numpy":
+        return NumpyVectorStore(persist_directory=directory, embedding_function=embedder)
+    return Chroma(persist_directory=directory, embedding_function=embedder)
+
+
+def run_case(backend, size, queries, k):
+    vectors = make_clustered_vectors(size + queries, seed=size)
+    texts = [f"片段 {i}" for i in range(size)]
+    query_texts = [f"查詢 {i}" for i in range(queries)]
+    embedder = LookupEmbeddings(dict(zip(texts + query_texts, vectors)))
+    metadatas = [{"source_file": f"file_{i % 8}.txt", "topic:竊盜罪": i % 8 == 0} for i in range(size)]
+
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+    try:
+        start = time.perf_counter()
+        build_store(backend, directory, texts, metadatas, embedder)
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = open_store(backend, directory, embedder)
+        open_seconds = time.perf_counter() - start
+
+        results = {}
+        for label, search_filter in (("全部", None), ("主題篩選", {"topic:竊盜罪": True})):
+            samples = []
+            for query in query_texts:
+                start = time.perf_counter()
+                store.similarity_search_with_score(query, k=k, filter=search_filter)
+                samples.append(time.perf_counter() - start)
+            results[label] = (percentile_ms(samples, 50), percentile_ms(samples, 99))
+        return build_seconds, open_seconds, results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量資料庫後端延遲比較")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000], help="片段數量")
+    parser.add_argument("--queries", type=int, default=200, help="每種情況的查詢次數")
+    parser.add_argument("--k", type=int, default=5, help="每次查詢返回的片段數")
+    args = parser.parse_args()
+
+    print(f"{'後端':<8}{'片段數':>8}{'建立(s)':>10}{'開啟(ms)':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'篩選p50':>10}{'篩選p99':>10}")
+    for size in args.sizes:
+        for backend in ("chroma", "numpy"):
+            build_seconds, open_seconds, results = run_case(backend, size, args.queries, args.k)
+            print(
+                f"{backend:<8}{size:>8}{build_seconds:>10.2f}{open_seconds * 1000:>10.1f}"
+                f"{results['全部'][0]:>10.3f}{results['全部'][1]:>10.3f}"
+                f"{results['主題篩選'][0]:>10.3f}{results['主題篩選'][1]:>10.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
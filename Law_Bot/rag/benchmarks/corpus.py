@@ -0,0 +1,63 @@
+import glob
+import os
+import random
+from typing import List, Tuple
+
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+_OFFENCES = [
+    ("竊盜罪", "刑法第320條"), ("加重竊盜罪", "刑法第321條"), ("準強盜罪", "刑法第329條"),
+    ("普通強盜罪", "刑法第328條"), ("侵占罪", "刑法第335條"), ("詐欺罪", "刑法第339條"),
+    ("普通殺人罪", "刑法第271條"), ("傷害罪", "刑法第277條"), ("強制罪", "刑法第304條"),
+    ("恐嚇取財罪", "刑法第346條"), ("妨害書信秘密罪", "刑法第315條"), ("侵入電腦罪", "刑法第358條"),
+]
+
+_REASONING = [
+    "客觀上行為人未經同意取得他人之物，已破壞原持有關係並建立新持有關係，客觀構成要件該當。",
+    "主觀上行為人對於上開情狀既知且欲，並具有不法所有意圖，主觀構成要件亦該當。",
+    "行為人無其他阻卻違法事由，亦無阻卻罪責事由，故成立本罪。",
+    "實務見解認為應以行為時之客觀情狀判斷，學說則有認為應考量行為人之主觀認知者。",
+    "關於「當場」之解釋，實務採時空密接說，只要行為人仍在犯罪現場或被追捕中即屬之。",
+    "本題涉及想像競合之問題，依刑法第55條從一重處斷。",
+]
+
+
+def make_exam_corpus(questions: int = 300, seed: int = 0) -> str:
+    """
+    產生合成考古題文本（含多個編號子項目的答題架構與重複出現的爭點記憶）
+    """
+    rng = random.Random(seed)
+    blocks = []
+    for number in range(1, questions + 1):
+        offence, article = rng.choice(_OFFENCES)
+        year = rng.randint(95, 113)
+        subpoints = []
+        for index, label in enumerate(["(一)", "(二)", "(三)", "(四)"][:rng.randint(2, 4)]):
+            sentences = "".join(rng.choice(_REASONING) for _ in range(rng.randint(4, 10)))
+            subpoints.append(f"{label}甲可能成立{article}{offence}（第{index + 1}點）\n{sentences}\n")
+        blocks.append(
+            f"{number}. {year}年律師考試 第{number}題\n"
+            f"甲於{year}年間對乙為{offence}之行為，" + rng.choice(_REASONING) * rng.randint(1, 3) +
+            "請問甲之罪責？\n"
+            "【答題架構】\n" + "".join(subpoints) +
+            "【爭點記憶】\n" + f"{offence}之構成要件：" + "".join(rng.sample(_REASONING, 3)) + "\n"
+        )
+    return "\n".join(blocks)
+
+
+def load_corpus_texts(data_dir: str = DEFAULT_DATA_DIR, synthetic_questions: int = 300) -> List[Tuple[str, str]]:
+    """
+    讀取資料目錄中的語料；目錄不存在或沒有資料時改用合成考古題
+
+    Returns:
+        (名稱, 文本) 列表
+    """
+    paths = sorted(glob.glob(os.path.join(data_dir, "*.txt")))
+    if paths:
+        texts = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append((os.path.basename(path), f.read()))
+        return texts
+    print(f"⚠️ 找不到資料目錄 {data_dir}，改用 {synthetic_questions} 題合成考古題")
+    return [("synthetic", make_exam_corpus(synthetic_questions))]
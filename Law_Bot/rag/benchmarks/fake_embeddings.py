@@ -0,0 +1,127 @@
+import hashlib
+import random
+import threading
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    本地假 embedding 模型，用於效能測試
+
+    以文字雜湊產生固定的向量，並模擬每次 API 請求的延遲與偶發失敗。
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        request_latency: float = 0.05,
+        per_text_latency: float = 0.001,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.dimension = dimension
+        self.request_latency = request_latency
+        self.per_text_latency = per_text_latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        rng = random.Random(digest)
+        return [rng.uniform(-1.0, 1.0) for _ in range(self.dimension)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            should_fail = self._random.random() < self.failure_rate
+        time.sleep(self.request_latency + self.per_text_latency * len(texts))
+        if should_fail:
+            raise RuntimeError("模擬的暫時性 API 錯誤")
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def make_synthetic_chunks(count: int, length: int = 400) -> List[str]:
+    """
+    產生指定數量的合成法律文本片段
+    """
+    base = "甲竊取乙之財物後，為脫免逮捕而當場施以強暴，請問甲之罪責？【答題架構】準強盜罪之構成要件。"
+    chunks = []
+    for i in range(count):
+        text = f"{i}. {base}" * (length // len(base) + 1)
+        chunks.append(text[:length])
+    return chunks
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    以字元 n-gram 特徵雜湊產生向量的本地 embedding 模型
+
+    不呼叫任何 API，但相似的文本會得到相近的向量，可用來離線比較檢索召回率。
+    """
+
+    def __init__(self, dimension: int = 512, ngram: int = 2):
+        self.dimension = dimension
+        self.ngram = ngram
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimension
+        for i in range(max(len(text) - self.ngram + 1, 1)):
+            gram = text[i:i + self.ngram]
+            digest = hashlib.md5(gram.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = sum(value * value for value in vector) ** 0.5 or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+class LookupEmbeddings(Embeddings):
+    """
+    從預先產生的向量表（文本 -> numpy 向量）查詢 embedding，用於只測量向量資料庫本身的效能
+    """
+
+    def __init__(self, vectors_by_text):
+        self.vectors_by_text = vectors_by_text
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors_by_text[text].tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors_by_text[text].tolist()
+
+
+def make_clustered_vectors(count: int, dimension: int = 768, clusters: int = 64, noise: float = 0.6, seed: int = 0, out=None):
+    """
+    產生群聚分佈的正規化向量（比均勻亂數更接近真實 embedding 的分佈）
+
+    Args:
+        out: 寫入的目標矩陣（例如 np.lib.format.open_memmap 開啟的檔案），None 表示配置新的矩陣
+
+    Returns:
+        float32 的 numpy 矩陣 (count, dimension)
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = np.empty((count, dimension), dtype=np.float32) if out is None else out
+    # 分段產生，避免大量向量時佔用兩倍記憶體
+    for start in range(0, count, 65536):
+        end = min(start + 65536, count)
+        assignments = rng.integers(0, clusters, size=end - start)
+        block = centers[assignments] + noise * rng.standard_normal((end - start, dimension)).astype(np.float32)
+        vectors[start:end] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
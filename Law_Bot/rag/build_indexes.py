@@ -0,0 +1,188 @@
+"""
+批次建立所有語料的向量索引
+
+找出 LawBotAgent 主題映射引用的資料檔案（以及資料目錄中的其他 .txt 檔案），
+以多個行程平行解析與分割文本，再以共用並行上限的 embedding 寫入各自的 _db 目錄。
+
+執行方式：
+    cd rag
+    python build_indexes.py --data-dir ./data --processes 4 --embed-workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from index_rag import LawDocumentParser, LawRAGPipeline, VECTOR_BACKENDS
+from numpy_store import QUANTIZATION_MODES
+from projection import PROJECTION_METHODS
+from corpora import DATA_BASE_PATH, discover_data_files
+
+
+def parse_and_split(file_path: str, chunker: str = "recursive"):
+    """
+    在子行程中解析並分割單一檔案
+
+    Returns:
+        (檔案路徑, 分割後的片段, 耗時秒數)
+    """
+    start = time.perf_counter()
+    splits = list(LawDocumentParser(chunker=chunker).iter_splits(file_path))
+    return file_path, splits, time.perf_counter() - start
+
+
+def build_all_indexes(
+    rag: LawRAGPipeline,
+    file_paths,
+    processes: int = 4,
+    parallel_corpora: int = 4,
+):
+    """
+    平行建立多個語料的向量索引
+
+    Args:
+        rag: 共用的 RAG pipeline（所有語料共用同一個 embedding 並行上限與快取）
+        file_paths: 要建立索引的資料檔案
+        processes: 解析與分割文本的行程數
+        parallel_corpora: 同時寫入向量資料庫的語料數
+
+    Returns:
+        每個檔案的統計資訊列表
+    """
+    summary = {}
+
+    with ProcessPoolExecutor(max_workers=processes) as parse_pool, \
+            ThreadPoolExecutor(max_workers=parallel_corpora) as index_pool:
+
+        def index_corpus(file_path, splits):
+            start = time.perf_counter()
+            _, stats = rag.build_index(file_path, splits)
+            return stats, time.perf_counter() - start
+
+        parse_futures = {parse_pool.submit(parse_and_split, path, rag.chunker): path for path in file_paths}
+        index_futures = {}
+
+        # 每個檔案解析完成就立即開始嵌入，不必等待所有檔案解析完畢
+        for future in as_completed(parse_futures):
+            file_path = parse_futures[future]
+            try:
+                _, splits, parse_seconds = future.result()
+            except Exception as e:
+                # 無法讀取或編碼錯誤的檔案只記錄失敗，其他檔案照常建立索引
+                summary[file_path] = {"chunks": 0, "parse_seconds": None, "index_seconds": None, "error": str(e)}
+                print(f"❌ {os.path.basename(file_path)} 解析失敗：{e}")
+                continue
+            print(f"📄 {os.path.basename(file_path)} 解析完成：{len(splits)} 個片段（{parse_seconds:.2f}s）")
+            summary[file_path] = {"chunks": len(splits), "parse_seconds": parse_seconds}
+            index_futures[index_pool.submit(index_corpus, file_path, splits)] = file_path
+
+        for future in as_completed(index_futures):
+            file_path = index_futures[future]
+            try:
+                stats, index_seconds = future.result()
+                summary[file_path].update(stats, index_seconds=index_seconds, error=None)
+                print(f"✅ {os.path.basename(file_path)} 索引完成（{index_seconds:.2f}s）")
+            except Exception as e:
+                summary[file_path].update(index_seconds=None, error=str(e))
+                print(f"❌ {os.path.basename(file_path)} 建立索引失敗：{e}")
+
+    return [dict(file=path, **summary[path]) for path in file_paths]
+
+
+def print_summary(results, total_seconds: float):
+    """
+    顯示每個檔案的耗時摘要
+    """
+    print("\n" + "=" * 80)
+    print("📊 索引建立摘要")
+    print("=" * 80)
+    print(f"{'檔案':<32}{'片段':>8}{'重複':>8}{'新增':>8}{'保留':>8}{'移除':>8}{'解析(s)':>10}{'索引(s)':>10}")
+    for result in results:
+        name = os.path.basename(result["file"])
+        if result.get("error"):
+            print(f"{name:<32}{result['chunks']:>8}  ❌ {result['error']}")
+            continue
+        dedupe = result.get("dedupe", {})
+        duplicates = dedupe.get("near_duplicates", 0) + dedupe.get("exact_duplicates", 0)
+        print(
+            f"{name:<32}{result['chunks']:>8}{duplicates:>8}{result['added']:>8}{result['kept']:>8}{result['removed']:>8}"
+            f"{result['parse_seconds']:>10.2f}{result['index_seconds']:>10.2f}"
+        )
+    print(f"\n⏱️ 總耗時：{total_seconds:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批次建立所有語料的向量索引")
+    parser.add_argument("--data-dir", default=DATA_BASE_PATH, help="資料目錄")
+    parser.add_argument("--mapped-only", action="store_true", help="只建立主題映射引用的檔案")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2, help="解析文本的行程數")
+    parser.add_argument("--parallel-corpora", type=int, default=4, help="同時建立索引的語料數")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="embedding 批次大小")
+    parser.add_argument("--embed-workers", type=int, default=8, help="所有語料共用的 embedding 並行上限")
+    parser.add_argument("--unified", action="store_true", help="所有語料寫入同一個共用資料庫（以主題 metadata 篩選）")
+    parser.add_argument("--backend", choices=VECTOR_BACKENDS, default="chroma", help="向量資料庫後端")
+    parser.add_argument("--ann", action="store_true", help="建立 IVF-PQ 近似最近鄰索引（需搭配 --backend numpy）")
+    parser.add_argument("--ann-nlist", type=int, default=None, help="ANN 分群數（預設依資料量自動選擇）")
+    parser.add_argument("--ann-m", type=int, default=32, help="ANN 的 PQ 子空間數（0 表示不使用 PQ）")
+    parser.add_argument("--ann-nprobe", type=int, default=8, help="ANN 查詢時掃描的群數")
+    parser.add_argument("--ann-min-size", type=int, default=10000, help="片段數達到此值才建立 ANN 索引")
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default=None, help="以壓縮向量搜尋並以原始向量重新計分（需搭配 --backend numpy）")
+    parser.add_argument("--projection", choices=PROJECTION_METHODS, default=None, help="建立索引時擬合降維（需搭配 --backend numpy）")
+    parser.add_argument("--projection-dim", type=int, default=None, help="降維後的維度（預設依 --recall-target 自動選擇）")
+    parser.add_argument("--recall-target", type=float, default=0.95, help="自動選擇維度時要達到的 recall@10")
+    parser.add_argument("--no-lexical", action="store_true", help="不建立詞彙索引（停用混合檢索）")
+    args = parser.parse_args()
+
+    file_paths = discover_data_files(args.data_dir, include_unmapped=not args.mapped_only)
+    if not file_paths:
+        print(f"⚠️ 在 {args.data_dir} 中找不到任何資料檔案")
+        return
+    print(f"📁 共 {len(file_paths)} 個資料檔案：{', '.join(os.path.basename(path) for path in file_paths)}")
+
+    ann_params = None
+    if args.ann:
+        ann_params = {
+            "nlist": args.ann_nlist,
+            "m": args.ann_m,
+            "nprobe": args.ann_nprobe,
+            "min_size": args.ann_min_size,
+        }
+
+    projection_params = None
+    if args.projection:
+        projection_params = {
+            "method": args.projection,
+            "dimension": args.projection_dim,
+            "recall_target": args.recall_target,
+        }
+
+    rag = LawRAGPipeline(
+        embed_batch_size=args.embed_batch_size,
+        embed_workers=args.embed_workers,
+        index_mode="unified" if args.unified else "per_file",
+        vector_backend=args.backend,
+        ann_params=ann_params,
+        quantization=args.quantization,
+        projection_params=projection_params,
+        hybrid=not args.no_lexical,
+    )
+    
+    # 共用資料庫時依序寫入同一個 collection（解析仍平行進行，embedding 仍批次並行）
+    parallel_corpora = 1 if args.unified else args.parallel_corpora
+
+    start = time.perf_counter()
+    results = build_all_indexes(
+        rag,
+        file_paths,
+        processes=args.processes,
+        parallel_corpora=parallel_corpora,
+    )
+    print_summary(results, time.perf_counter() - start)
+
+    if rag.embedding_cache:
+        cache_stats = rag.embedding_cache.stats()
+        print(f"🗃️ Embedding 快取：命中 {cache_stats['hits']}、未命中 {cache_stats['misses']}（命中率 {cache_stats['hit_rate']:.1%}）")
+
+
+if __name__ == "__main__":
+    main()
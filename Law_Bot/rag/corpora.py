@@ -0,0 +1,45 @@
+import os
+from typing import List
+
+# 主題到資料檔案的映射（LawBotAgent 與批次建索引工具共用）
+TOPIC_TO_FILE_MAPPING = {
+    '侵害生命法益之犯罪': 'specific_offences_ch1.txt',
+    '侵害健康法益之犯罪': 'qa.txt',
+    '侵害自由法益犯罪': 'qa.txt',
+    '侵害名譽及信用犯罪': 'qa.txt',
+    '侵害秘密犯罪': 'qa.txt',
+    '侵害個別財產法益之犯罪': 'specific_offences_ch6.txt',
+    'rag': 'qa.txt',
+    'others': None
+}
+
+# 資料檔案的基礎路徑
+DATA_BASE_PATH = "/Users/zoungming/Desktop/Codes/TsungMin_Pai_Tutor/Law_Bot/rag/data"
+
+
+def discover_data_files(data_dir: str = DATA_BASE_PATH, include_unmapped: bool = True) -> List[str]:
+    """
+    找出所有需要建立索引的資料檔案
+    
+    Args:
+        data_dir: 資料目錄
+        include_unmapped: 是否也包含資料目錄中未被主題映射引用的 .txt 檔案
+        
+    Returns:
+        不重複的資料檔案路徑列表（依主題映射順序，其後為目錄中的其他檔案）
+    """
+    file_names = [name for name in TOPIC_TO_FILE_MAPPING.values() if name]
+    if include_unmapped and os.path.isdir(data_dir):
+        file_names += sorted(
+            name for name in os.listdir(data_dir)
+            if name.endswith('.txt') and not name.startswith('.')
+        )
+    
+    file_paths = []
+    for name in dict.fromkeys(file_names):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            file_paths.append(path)
+        else:
+            print(f"⚠️ 資料檔案不存在，略過：{path}")
+    return file_paths
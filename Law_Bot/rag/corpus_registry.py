@@ -0,0 +1,162 @@
+import os
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def _directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+class CorpusHandle:
+    """
+    一個已開啟語料的向量資料庫、輔助索引與問答鏈
+
+    pipeline 是綁定此語料的 LawRAGPipeline 淺層複本（與主 pipeline 共用 embedding 模型與快取），
+    可直接在其上檢索，不會影響主 pipeline 目前使用中的索引。
+    """
+
+    def __init__(self, data_file: str, pipeline, disk_bytes: int):
+        self.data_file = data_file
+        self.pipeline = pipeline
+        self.disk_bytes = disk_bytes
+
+
+class CorpusRegistry:
+    """
+    已開啟語料的登錄表：以資料檔案為鍵，每個語料只開啟一次，之後的查詢直接使用同一個 CorpusHandle 的索引與問答鏈
+
+    載入與建立索引在各語料自己的鎖中進行，同一語料的並行請求只會載入（或建立）一次，
+    其他語料的查詢與已開啟語料的命中不需等待；登錄表的鎖只在查詢、登錄與淘汰時持有。
+    命中時會比對資料庫目錄目前的索引版本，其他程序（例如 build_indexes.py）重建索引後自動重新開啟。
+
+    超過語料數上限或磁碟大小上限時，淘汰最久未使用的語料（LRU）。
+    大小為資料庫目錄在磁碟上的位元組數，只是常駐記憶體的粗略代理：
+    Chroma 與以 mmap 開啟的 NumPy 資料庫只有實際讀取的部分會常駐，壓縮或 ANN 索引則可能遠小於磁碟大小。
+    """
+
+    def __init__(self, pipeline, max_entries: int = 8, max_disk_bytes: Optional[int] = 1 << 30):
+        """
+        Args:
+            pipeline: LawRAGPipeline
+            max_entries: 同時保留的語料數上限
+            max_disk_bytes: 已開啟語料的資料庫目錄磁碟大小總和上限（位元組，None 表示只依語料數淘汰）；
+                單一語料超過上限時仍會保留，只是會淘汰其他所有語料
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必須大於 0")
+        self.pipeline = pipeline
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, CorpusHandle]" = OrderedDict()
+        # 資料檔案 -> 載入或建立該語料時持有的鎖
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, data_file: str) -> bool:
+        return data_file in self._entries
+
+    def _lookup(self, data_file: str) -> Optional[CorpusHandle]:
+        with self._lock:
+            handle = self._entries.get(data_file)
+            if handle is not None:
+                self._entries.move_to_end(data_file)
+        # 索引版本為資料庫目錄中最新的修改時間，只需 stat 目錄中的檔案
+        if handle is None or self._is_stale(handle):
+            return None
+        with self._lock:
+            self.hits += 1
+        return handle
+
+    @staticmethod
+    def _is_stale(handle: CorpusHandle) -> bool:
+        pipeline = handle.pipeline
+        return pipeline._read_index_version(pipeline.persist_directory) != pipeline.index_version
+
+    def get(self, data_file: str, build: bool = False) -> Optional[CorpusHandle]:
+        """
+        取得指定語料的 CorpusHandle；尚未開啟時從磁碟載入（在主 pipeline 的淺層複本上，不影響主 pipeline）
+
+        Args:
+            data_file: 資料檔案路徑
+            build: 磁碟上沒有此語料的索引時是否建立
+
+        Returns:
+            CorpusHandle；build 為 False 且磁碟上沒有此語料的索引時為 None
+        """
+        handle = self._lookup(data_file)
+        if handle is not None:
+            return handle
+
+        with self._lock:
+            file_lock = self._file_locks.setdefault(data_file, threading.Lock())
+        with file_lock:
+            # 等待期間其他請求可能已開啟此語料
+            handle = self._lookup(data_file)
+            if handle is not None:
+                return handle
+
+            # 尚未開啟，或已開啟的索引在磁碟上已被重建
+            view = copy.copy(self.pipeline)
+            view.load_existing_index(data_file)
+            if not view.vectorstore:
+                if not build:
+                    with self._lock:
+                        self._entries.pop(data_file, None)
+                        self._file_locks.pop(data_file, None)
+                    return None
+                view.index_documents(data_file)
+            handle = CorpusHandle(data_file, view, _directory_size(view.persist_directory))
+            with self._lock:
+                self.opens += 1
+                self._add(handle)
+            return handle
+
+    def _add(self, handle: CorpusHandle):
+        self._entries[handle.data_file] = handle
+        self._entries.move_to_end(handle.data_file)
+        self._evict()
+
+    def _evict(self):
+        # 剛登錄的語料在最後面，至少保留它
+        def over_limit():
+            if len(self._entries) > self.max_entries:
+                return True
+            return self.max_disk_bytes is not None and self.total_disk_bytes() > self.max_disk_bytes
+
+        while len(self._entries) > 1 and over_limit():
+            data_file, _ = self._entries.popitem(last=False)
+            self._file_locks.pop(data_file, None)
+            self.evictions += 1
+
+    def total_disk_bytes(self) -> int:
+        return sum(handle.disk_bytes for handle in self._entries.values())
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得登錄表統計資訊
+        """
+        with self._lock:
+            total = self.hits + self.opens
+            return {
+                "entries": len(self._entries),
+                "disk_bytes": self.total_disk_bytes(),
+                "hits": self.hits,
+                "opens": self.opens,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,228 @@
+import os
+import json
+import zlib
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+from langchain.schema import Document
+
+from article_index import parse_article_references
+
+# Mersenne 質數，用於 MinHash 的通用雜湊函數 (a * x + b) mod p
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _normalize_for_shingles(text: str) -> str:
+    """
+    去除空白與標點並統一全形/半形，讓只差在排版的段落得到相同的 shingle
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return "".join(
+        char for char in text
+        if not unicodedata.category(char).startswith(("P", "Z", "C"))
+    )
+
+
+def _choose_bands(num_perm: int, threshold: float):
+    """
+    選擇 LSH 的 band 數與每個 band 的列數，使候選門檻 (1/b)^(1/r) 略低於相似度門檻
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        candidate_threshold = (1 / bands) ** (1 / rows)
+        if candidate_threshold > threshold:
+            continue
+        gap = threshold - candidate_threshold
+        if best is None or gap < best[0]:
+            best = (gap, bands, rows)
+    if best is None:
+        return num_perm, 1
+    return best[1], best[2]
+
+
+class MinHashDeduplicator:
+    """
+    以 MinHash + LSH 偵測近似重複的文本片段
+
+    中文沒有空白斷詞，因此以去除標點後的連續字元（預設 3 字）作為 shingle。
+    每個片段依序加入：若與先前同一群組的代表片段估計 Jaccard 相似度達門檻，視為該片段的別名。
+    """
+
+    def __init__(self, threshold: float = 0.97, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        """
+        Args:
+            threshold: 視為重複的 Jaccard 相似度門檻（0~1）
+            num_perm: MinHash 雜湊函數數量
+            shingle_size: shingle 的字元數
+            seed: 雜湊參數的亂數種子（固定以確保結果可重現）
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold 必須介於 0 與 1 之間")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.bands, self.rows = _choose_bands(num_perm, threshold)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [dict() for _ in range(self.bands)]
+        self._signatures = {}
+        self._groups = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        計算文本的 MinHash 簽章
+        """
+        normalized = _normalize_for_shingles(text)
+        size = self.shingle_size
+        if len(normalized) <= size:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # 32 位元雜湊乘上 61 位元係數可能溢位，uint64 的環繞運算仍能產生足夠均勻的排列
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(_MERSENNE_PRIME)
+        return (permuted & np.uint64(_MAX_HASH)).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def find_duplicate(self, text: str, group=None) -> Optional[str]:
+        """
+        查詢與文本近似重複的代表片段（不加入索引）
+
+        Returns:
+            代表片段的 id，沒有重複時為 None
+        """
+        return self._find(self.signature(text), group)
+
+    def _find(self, signature: np.ndarray, group) -> Optional[str]:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_similarity = None, self.threshold
+        for candidate in candidates:
+            if self._groups[candidate] != group:
+                continue
+            similarity = float(np.mean(self._signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate, similarity
+        return best_id
+
+    def add(self, chunk_id: str, text: str, group=None) -> Optional[str]:
+        """
+        加入片段；若為近似重複則回傳代表片段的 id，否則登記為新的代表片段並回傳 None
+
+        Args:
+            chunk_id: 片段 id
+            text: 片段文本
+            group: 只與 group 相同的代表片段合併（例如片段引用的法條）
+        """
+        signature = self.signature(text)
+        duplicate_of = self._find(signature, group)
+        if duplicate_of is not None:
+            return duplicate_of
+
+        self._signatures[chunk_id] = signature
+        self._groups[chunk_id] = group
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(chunk_id)
+        return None
+
+
+def deduplicate_chunks(
+    chunks: Iterable[Document],
+    deduplicator: MinHashDeduplicator,
+    aliases: Dict[str, List[Dict]],
+    stats: Dict[str, int],
+) -> Iterator[Document]:
+    """
+    串流去除近似重複的片段，只產生代表片段
+
+    片段需已帶有 metadata["content_hash"]；重複片段會記錄為代表片段的別名。
+    引用的法條不同的片段（例如只差在「第328條」與「第330條」）即使文字幾乎相同也不合併；
+    別名的 article_refs 供建立索引時併入代表片段的法條引用（見 ArticleIndex.add_references）。
+
+    Args:
+        chunks: 已標記內容雜湊的片段
+        deduplicator: MinHash 去重器
+        aliases: 輸出參數，代表片段 id -> 別名資訊列表
+        stats: 輸出參數，累計 canonical / near_duplicates / exact_duplicates 數量
+
+    Yields:
+        代表片段
+    """
+    for key in ("canonical", "near_duplicates", "exact_duplicates"):
+        stats.setdefault(key, 0)
+
+    seen = set()
+    for doc in chunks:
+        chunk_id = doc.metadata["content_hash"]
+        if chunk_id in seen:
+            stats["exact_duplicates"] += 1
+            continue
+        seen.add(chunk_id)
+
+        # 結構化分割器會在片段開頭加上標題列，只比對標題列之後的本文
+        body = doc.page_content[doc.metadata.get("content_offset", 0):]
+        canonical_id = deduplicator.add(chunk_id, body, group=frozenset(parse_article_references(body)))
+        if canonical_id is None:
+            stats["canonical"] += 1
+            yield doc
+            continue
+
+        stats["near_duplicates"] += 1
+        aliases.setdefault(canonical_id, []).append({
+            "content_hash": chunk_id,
+            "title": doc.metadata.get("title"),
+            "section": doc.metadata.get("section"),
+            "question_number": doc.metadata.get("question_number"),
+            "source_file": doc.metadata.get("source_file"),
+            "article_refs": [list(ref) for ref in parse_article_references(doc.page_content)],
+        })
+
+
+def aliases_path(persist_directory: str) -> str:
+    return os.path.join(persist_directory, "aliases.json")
+
+
+def load_aliases(persist_directory: str) -> Dict[str, Dict[str, List[Dict]]]:
+    """
+    讀取資料庫的別名記錄：來源檔案 -> 代表片段 id -> 別名資訊列表
+    """
+    path = aliases_path(persist_directory)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_aliases(persist_directory: str, source_file: str, aliases: Dict[str, List[Dict]]):
+    """
+    寫入單一來源檔案的別名記錄（共用資料庫中其他來源檔案的記錄保持不變）
+    """
+    all_aliases = load_aliases(persist_directory)
+    all_aliases[source_file] = aliases
+    os.makedirs(persist_directory, exist_ok=True)
+    path = aliases_path(persist_directory)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(all_aliases, f, ensure_ascii=False)
+    os.replace(temp_path, path)
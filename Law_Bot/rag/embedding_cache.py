@@ -0,0 +1,298 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from text_normalize import normalize_for_embedding, normalize_query
+
+
+class EmbeddingCache:
+    """
+    以 SQLite 儲存於本地的 embedding 快取
+
+    鍵值為（模型名稱, 正規化文本雜湊），向量以 float32 二進位格式儲存；
+    超過容量上限時，依最後存取時間淘汰最久未使用的項目（LRU）。
+    """
+
+    def __init__(self, path: str = "./rag_db/embedding_cache.sqlite", max_entries: int = 200_000):
+        """
+        Args:
+            path: SQLite 檔案路徑（所有語料共用）
+            max_entries: 快取項目數量上限
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必須大於 0")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """
+        產生快取鍵值
+        """
+        normalized = normalize_for_embedding(text)
+        return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        批次查詢快取
+
+        Returns:
+            與 texts 等長的列表，未命中的位置為 None
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # SQLite 的參數數量有限制，分段查詢
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[key] = vector.tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for vector in results if vector is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        """
+        批次寫入快取，必要時淘汰最久未使用的項目
+        """
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), model, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += self._conn.total_changes - before
+
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    在 embedding 模型前加上持久化快取，只對未命中的文本呼叫底層模型
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        """
+        Args:
+            embeddings: 底層 embedding 模型
+            cache: 共用的 EmbeddingCache
+            model_name: 模型名稱（快取鍵值的一部分，不同模型的向量不會混用）
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+        # Gemini 對文件與查詢使用不同的 task_type，向量不同，需分開快取
+        self.query_model_name = f"{model_name}:query"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        vectors = self.cache.get_many(self.model_name, texts)
+
+        # 相同文本只嵌入一次
+        missing = {}
+        for index, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(normalize_for_embedding(texts[index]), []).append(index)
+
+        if missing:
+            missing_texts = [texts[indexes[0]] for indexes in missing.values()]
+            new_vectors = self.embeddings.embed_documents(missing_texts)
+            self.cache.put_many(self.model_name, missing_texts, new_vectors)
+            for indexes, vector in zip(missing.values(), new_vectors):
+                for index in indexes:
+                    vectors[index] = vector
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get_many(self.query_model_name, [text])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many(self.query_model_name, [text], [vector])
+        return vector
+
+
+class QueryEmbeddingCache:
+    """
+    查詢 embedding 的記憶體 LRU 快取，鍵值為（模型名稱, normalize_query 正規化後的查詢）
+
+    Streamlit 每次互動都會重新執行整個腳本，相同的範例問題會一再被嵌入；
+    記憶體命中不需任何 I/O。可選擇以 SQLite（EmbeddingCache）作為磁碟層，重新啟動後仍可命中。
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None, disk_max_entries: int = 50_000):
+        """
+        Args:
+            max_entries: 記憶體中保留的查詢數上限
+            path: 磁碟層的 SQLite 路徑（None 表示只保存在記憶體中）
+            disk_max_entries: 磁碟層的項目上限
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必須大於 0")
+        self.max_entries = max_entries
+        self.disk = EmbeddingCache(path, max_entries=disk_max_entries) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        """
+        查詢快取（query 需已正規化）
+        """
+        key = (model, query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+        if self.disk is not None:
+            vector = self.disk.get_many(model, [query])[0]
+            if vector is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, vector)
+                return vector
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model: str, query: str, vector: List[float]):
+        """
+        寫入快取（query 需已正規化）
+        """
+        self._remember((model, query), vector)
+        if self.disk is not None:
+            self.disk.put_many(model, [query], [vector])
+
+    def _remember(self, key: Tuple[str, str], vector: List[float]):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊（hit_rate 包含磁碟層命中）
+        """
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+        }
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """
+    在 embedding 模型前加上查詢 embedding 快取；查詢先經 normalize_query 正規化再嵌入，
+    讓「竊盜罪 構成要件」與「竊盜罪構成要件？」共用同一個向量。文件嵌入直接交給底層模型。
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: QueryEmbeddingCache, model_name: str):
+        """
+        Args:
+            embeddings: 底層 embedding 模型
+            cache: QueryEmbeddingCache
+            model_name: 模型名稱（快取鍵值的一部分）
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = f"{model_name}:query"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        query = normalize_query(text)
+        vector = self.cache.get(self.model_name, query)
+        if vector is None:
+            vector = self.embeddings.embed_query(query)
+            self.cache.put(self.model_name, query, vector)
+        return vector
@@ -1,5 +1,9 @@
 import os
-from typing import List, Dict
+import sys
+import json
+import codecs
+import hashlib
+from typing import Any, List, Dict, Iterator, Iterable, Optional, Tuple
 import re
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
@@ -9,19 +13,376 @@ from langchain_community.document_loaders import TextLoader
 from langchain.schema import Document
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.prompts import format_document
 
 # 使用 Gemini 相關的匯入
 from langchain_google_genai import GoogleGenerativeAI, GoogleGenerativeAIEmbeddings
 
-class LawRAGPipeline:
-    def __init__(self, google_api_key: str = None, persist_directory: str = None):
+# 讓同目錄的模組在 `rag.index_rag` 與 `index_rag` 兩種匯入方式下都能使用
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from batch_embedding import BatchedEmbeddings
+from embedding_cache import EmbeddingCache, CachedEmbeddings, QueryEmbeddingCache, QueryCachedEmbeddings
+from law_scanner import QUESTION_PATTERNS, find_question_starts, extract_sections
+from corpora import TOPIC_TO_FILE_MAPPING
+from structure_chunker import StructureAwareChunker
+from dedupe import MinHashDeduplicator, deduplicate_chunks, load_aliases, save_aliases
+from numpy_store import NumpyVectorStore
+from lexical_index import LexicalIndex, reciprocal_rank_fusion
+from article_index import ArticleIndex, ArticleRef, parse_article_references
+
+# Gemini 的 embedding 模型
+EMBEDDING_MODEL = "models/embedding-001"
+
+# 文本分割方式：依考題結構分割，或原本的遞迴字元分割
+CHUNKERS = ("structure", "recursive")
+
+# 索引模式：每個資料檔案各自一個資料庫，或所有語料共用一個資料庫並以 metadata 篩選主題
+INDEX_MODES = ("per_file", "unified")
+UNIFIED_DB_PATH = "./rag_db/unified_db"
+
+# 向量資料庫後端：Chroma，或行程內的 NumPy 矩陣（暴力搜尋，適合數千個片段的語料）
+VECTOR_BACKENDS = ("chroma", "numpy")
+
+class LawDocumentParser:
+    """
+    法律考試文件解析器：按題目與章節解析文件，並分割成適合嵌入的片段
+    
+    不需要 API 金鑰，可在多個行程中平行使用。
+    """
+    
+    def __init__(self, chunker: str = "recursive", chunk_max_tokens: int = 1000):
+        """
+        Args:
+            chunker: "recursive"（遞迴字元分割，預設）或 "structure"（依章節與編號子項目分割）
+            chunk_max_tokens: 結構化分割時每個片段的 token 預算
+        """
+        if chunker not in CHUNKERS:
+            raise ValueError(f"不支援的分割方式：{chunker}（可用：{', '.join(CHUNKERS)}）")
+        self.chunker = chunker
+        
+        if chunker == "structure":
+            # 章節在預算內保持完整，只在編號子項目處切開，每個片段都帶有題目標題與章節名稱
+            self.text_splitter = StructureAwareChunker(max_tokens=chunk_max_tokens)
+        else:
+            # 法律專用的文本分割器設定
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1200,
+                chunk_overlap=200,
+                separators=["\n\n", "\n", "。", "；", "，", " ", ""]
+            )
+    
+    def parse_law_document(self, text: str) -> List[Document]:
+        """
+        解析法律考試文件，按題目分割
+        
+        Args:
+            text: 原始文本
+            
+        Returns:
+            Document 列表
+        """
+        documents = []
+        
+        # 單次線性掃描找出題目起點（依模式優先順序，結果與逐一嘗試相同）
+        pattern, starts = find_question_starts(text)
+        if starts:
+            print(f"使用模式找到 {len(starts)} 個匹配：{pattern}")
+        
+        if not starts:
+            # 如果沒有找到特定模式，按段落分割
+            print("未找到特定題目模式，按段落分割")
+            paragraphs = text.split('\n\n')
+            for i, para in enumerate(paragraphs):
+                documents.extend(self._paragraph_to_documents(para, i + 1))
+        else:
+            # 按找到的模式分割
+            for i, start in enumerate(starts):
+                end = starts[i + 1] if i + 1 < len(starts) else len(text)
+                
+                question_text = text[start:end].strip()
+                documents.extend(self._question_to_documents(question_text, i + 1))
+        
+        print(f"解析出 {len(documents)} 個文件片段")
+        return documents
+    
+    def _paragraph_to_documents(self, para: str, paragraph_number: int) -> List[Document]:
+        """
+        將單一段落轉換為 Document（未找到題目模式時使用）
+        
+        Args:
+            para: 段落文本
+            paragraph_number: 段落編號（從 1 開始）
+            
+        Returns:
+            Document 列表（段落太短時為空）
+        """
+        if not (para.strip() and len(para.strip()) > 50):  # 過濾太短的段落
+            return []
+        
+        return [Document(
+            page_content=para.strip(),
+            metadata={
+                "title": f"段落 {paragraph_number}",
+                "section": "文件內容",
+                "question_number": paragraph_number,
+                "type": "法律文件"
+            }
+        )]
+    
+    def _question_to_documents(self, question_text: str, question_number: int) -> List[Document]:
+        """
+        將單一題目依結構拆成多個 Document
+        
+        Args:
+            question_text: 題目文本（已去除首尾空白）
+            question_number: 題目編號（從 1 開始）
+            
+        Returns:
+            Document 列表
+        """
+        documents = []
+        if not question_text:  # 確保內容不為空
+            return documents
+        
+        # 提取題目標題
+        title_match = re.match(r'([^\n]*)', question_text)
+        title = title_match.group(1) if title_match else f"題目 {question_number}"
+        
+        # 分析題目結構
+        sections = self._extract_sections(question_text)
+        
+        # 為每個部分建立文件
+        for section_name, section_content in sections.items():
+            if section_content.strip():
+                doc = Document(
+                    page_content=section_content,
+                    metadata={
+                        "title": title,
+                        "section": section_name,
+                        "question_number": question_number,
+                        "type": "法律考古題"
+                    }
+                )
+                documents.append(doc)
+        return documents
+    
+    def _detect_encoding(self, file_path: str, sample_size: int = 64 * 1024) -> str:
+        """
+        偵測文件編碼（UTF-8、UTF-8-BOM、Big5），只讀取檔案開頭的樣本
+        
+        Args:
+            file_path: 文件檔案路徑
+            sample_size: 取樣位元組數
+            
+        Returns:
+            Python codec 名稱
+        """
+        with open(file_path, 'rb') as f:
+            sample = f.read(sample_size)
+        
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        
+        for encoding in ('utf-8', 'big5'):
+            try:
+                sample.decode(encoding)
+                return encoding
+            except UnicodeDecodeError as e:
+                # 樣本結尾可能切斷多位元組字元，只要錯誤發生在最後幾個位元組就視為成功
+                if len(sample) == sample_size and e.start >= len(sample) - 3:
+                    return encoding
+        
+        raise ValueError(f"無法判斷文件編碼（僅支援 UTF-8、UTF-8-BOM、Big5）：{file_path}")
+    
+    def _detect_question_pattern(self, file_path: str, encoding: str) -> Optional[str]:
+        """
+        逐行掃描文件，找出優先順序最高且有匹配的題目分割模式
+        
+        Args:
+            file_path: 文件檔案路徑
+            encoding: 文件編碼
+            
+        Returns:
+            題目分割模式，找不到時為 None
+        """
+        compiled = [re.compile(pattern) for pattern in QUESTION_PATTERNS]
+        best = None
+        with open(file_path, 'r', encoding=encoding) as f:
+            for line in f:
+                limit = len(compiled) if best is None else best
+                for index in range(limit):
+                    if compiled[index].search(line):
+                        best = index
+                        break
+                if best == 0:  # 已找到最高優先的模式，不必再掃描
+                    break
+        return QUESTION_PATTERNS[best] if best is not None else None
+    
+    def parse_law_document_from_file(self, file_path: str) -> Iterator[Document]:
+        """
+        以串流方式解析法律考試文件，逐題產生 Document
+        
+        檔案以緩衝方式逐行讀取，記憶體用量只與單一題目的長度有關。
+        題目分割模式與 parse_law_document 相同，但匹配範圍限制在單行之內。
+        
+        Args:
+            file_path: 文件檔案路徑
+            
+        Yields:
+            Document
+        """
+        encoding = self._detect_encoding(file_path)
+        pattern = self._detect_question_pattern(file_path, encoding)
+        print(f"文件編碼：{encoding}")
+        
+        with open(file_path, 'r', encoding=encoding) as f:
+            if pattern is None:
+                print("未找到特定題目模式，按段落分割")
+                # 逐行判斷段落結束（空行接在換行之後，即 '\n\n'），段落結束時才串接，不重複掃描累積的內容
+                lines = []
+                paragraph_number = 0
+                for line in f:
+                    if line == '\n' and lines and lines[-1].endswith('\n'):
+                        paragraph_number += 1
+                        yield from self._paragraph_to_documents(''.join(lines)[:-1], paragraph_number)
+                        lines = []
+                    else:
+                        lines.append(line)
+                paragraph_number += 1
+                yield from self._paragraph_to_documents(''.join(lines), paragraph_number)
+                return
+            
+            print(f"使用模式逐題解析：{pattern}")
+            compiled = re.compile(pattern)
+            buffer = None  # 第一個題目開始前的內容不屬於任何題目
+            question_number = 0
+            for line in f:
+                position = 0
+                for match in compiled.finditer(line):
+                    if buffer is not None:
+                        buffer.append(line[position:match.start()])
+                        yield from self._question_to_documents(''.join(buffer).strip(), question_number)
+                    buffer = []
+                    question_number += 1
+                    position = match.start()
+                if buffer is not None:
+                    buffer.append(line[position:])
+            if buffer is not None:
+                yield from self._question_to_documents(''.join(buffer).strip(), question_number)
+    
+    def _extract_sections(self, question_text: str) -> Dict[str, str]:
+        """
+        提取題目的不同部分（題目、答題架構、爭點記憶等）
+        
+        Args:
+            question_text: 題目文本
+            
+        Returns:
+            各部分內容的字典
+        """
+        # 以 str.find 線性擷取，結果與原本的 re.DOTALL 搜尋相同，但不會大量回溯
+        return extract_sections(question_text)
+    
+    def iter_splits(self, file_path: str) -> Iterator[Document]:
+        """
+        串流解析文件並逐題分割文本
+        
+        Args:
+            file_path: 文件檔案路徑
+            
+        Yields:
+            分割後的文件片段
+        """
+        question_docs = []
+        current_number = None
+        for doc in self.parse_law_document_from_file(file_path):
+            number = doc.metadata.get("question_number")
+            if question_docs and number != current_number:
+                yield from self.text_splitter.split_documents(question_docs)
+                question_docs = []
+            current_number = number
+            question_docs.append(doc)
+        if question_docs:
+            yield from self.text_splitter.split_documents(question_docs)
+
+class HybridRetriever(BaseRetriever):
+    """
+    以 LawRAGPipeline.hybrid_search 檢索的 retriever（供 RetrievalQA 使用）
+    """
+    
+    pipeline: Any
+    k: int = 5
+    topic: Optional[str] = None
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.pipeline.hybrid_search(query, k=self.k, topic=self.topic)
+
+class LawRAGPipeline(LawDocumentParser):
+    def __init__(
+        self,
+        google_api_key: str = None,
+        persist_directory: str = None,
+        embed_batch_size: int = 64,
+        embed_workers: int = 4,
+        embed_max_retries: int = 3,
+        embedding_cache_path: str = "./rag_db/embedding_cache.sqlite",
+        embedding_cache_max_entries: int = 200_000,
+        query_cache_size: int = 1024,
+        query_cache_path: Optional[str] = None,
+        index_mode: str = "per_file",
+        topic_to_file_mapping: Dict[str, str] = None,
+        dedupe_threshold: Optional[float] = 0.97,
+        chunker: str = "recursive",
+        vector_backend: str = "chroma",
+        ann_params: Optional[Dict] = None,
+        quantization: Optional[str] = None,
+        projection_params: Optional[Dict] = None,
+        hybrid: bool = True,
+        retrieval_k: int = 5,
+    ):
         """
         初始化法律 RAG Pipeline (使用 Gemini)
         
         Args:
             google_api_key: Google API 金鑰
             persist_directory: 向量資料庫儲存目錄（如果不指定，會根據檔案名稱自動產生）
+            embed_batch_size: 建立索引時每個 embedding 批次的片段數量
+            embed_workers: 並行 embedding 的執行緒數量（同時也是進行中請求的上限）
+            embed_max_retries: 每個 embedding 批次失敗時的最大重試次數
+            embedding_cache_path: 共用 embedding 快取的 SQLite 路徑（None 表示停用快取）
+            embedding_cache_max_entries: embedding 快取的項目上限（超過時淘汰最久未使用者）
+            query_cache_size: 查詢 embedding 記憶體快取的查詢數上限（0 表示停用）；
+                查詢會先正規化（全形 / 半形、空白、台 / 臺）再嵌入，相同意思的查詢共用同一個向量
+            query_cache_path: 查詢 embedding 快取的磁碟層 SQLite 路徑（None 表示只保存在記憶體中；
+                啟用共用 embedding 快取時，查詢向量也會寫入該快取）
+            index_mode: "per_file"（每個檔案一個資料庫）或 "unified"（所有語料共用一個資料庫）
+            topic_to_file_mapping: 主題到資料檔案的映射，用於標記片段所屬主題
+            dedupe_threshold: 近似重複片段的 MinHash 相似度門檻（None 表示不去重）；引用法條不同的片段一律不合併
+            chunker: 文本分割方式，"recursive"（遞迴字元分割，預設）或 "structure"（依考題結構）
+            vector_backend: 向量資料庫後端，"chroma" 或 "numpy"（行程內矩陣，以 mmap 載入）
+            ann_params: 啟用 IVF-PQ 近似最近鄰索引的參數（nlist / m / nprobe / rerank / min_size），
+                只適用於 numpy 後端；None 表示暴力搜尋
+            quantization: 以 "float16" 或 "int8" 壓縮向量搜尋，再以磁碟上的原始向量重新計分候選，
+                只適用於 numpy 後端；None 表示直接搜尋原始向量
+            projection_params: 建立索引時擬合 PCA / 隨機投影降維的參數（method / dimension / recall_target / min_size），
+                只適用於 numpy 後端；None 表示不降維
+            hybrid: 是否在向量索引旁建立字元 n-gram 詞彙索引，檢索時以倒數排名融合兩種結果
+            retrieval_k: 每次問答檢索並交給模型的片段數（也就是顯示給使用者的來源片段）
         """
+        if index_mode not in INDEX_MODES:
+            raise ValueError(f"不支援的索引模式：{index_mode}（可用：{', '.join(INDEX_MODES)}）")
+        if vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(f"不支援的向量資料庫後端：{vector_backend}（可用：{', '.join(VECTOR_BACKENDS)}）")
+        if ann_params is not None and vector_backend != "numpy":
+            raise ValueError("ANN 索引只支援 numpy 後端（Chroma 已內建 HNSW 索引）")
+        if quantization is not None and vector_backend != "numpy":
+            raise ValueError("向量壓縮只支援 numpy 後端")
+        if projection_params is not None and vector_backend != "numpy":
+            raise ValueError("向量降維只支援 numpy 後端")
         
         # 如果沒有提供 API 金鑰，嘗試從環境變數載入
         if not google_api_key:
@@ -56,206 +417,420 @@ class LawRAGPipeline:
         print(f"🔑 使用 API 金鑰：{google_api_key[:10]}...{google_api_key[-5:]}")
         
         try:
-            # 使用 Gemini 的 embedding 模型
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001"  # Gemini 的 embedding 模型
+            # 使用 Gemini 的 embedding 模型，外層包裝批次並行與重試
+            self.embedding_batcher = BatchedEmbeddings(
+                GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL),
+                batch_size=embed_batch_size,
+                max_workers=embed_workers,
+                max_retries=embed_max_retries,
             )
+            
+            # 最外層為所有語料共用的持久化快取（建立索引與查詢時都會使用）
+            self.embedding_cache = None
+            self.embeddings = self.embedding_batcher
+            if embedding_cache_path:
+                self.embedding_cache = EmbeddingCache(
+                    embedding_cache_path,
+                    max_entries=embedding_cache_max_entries
+                )
+                self.embeddings = CachedEmbeddings(
+                    self.embedding_batcher,
+                    self.embedding_cache,
+                    model_name=EMBEDDING_MODEL
+                )
+            
+            # 查詢 embedding 的記憶體 LRU 快取，放在最外層，命中時不需任何 I/O
+            self.query_cache = None
+            if query_cache_size:
+                self.query_cache = QueryEmbeddingCache(query_cache_size, path=query_cache_path)
+                self.embeddings = QueryCachedEmbeddings(
+                    self.embeddings,
+                    self.query_cache,
+                    model_name=EMBEDDING_MODEL
+                )
             print("✅ Embedding 模型初始化成功")
         except Exception as e:
             print(f"❌ Embedding 模型初始化失敗：{e}")
             raise
         
+        self.index_mode = index_mode
+        self.vector_backend = vector_backend
+        self.ann_params = ann_params
+        self.quantization = quantization
+        self.projection_params = projection_params
+        self.hybrid = hybrid
+        self.retrieval_k = retrieval_k
+        self.topic_to_file_mapping = topic_to_file_mapping or TOPIC_TO_FILE_MAPPING
+        self.dedupe_threshold = dedupe_threshold
         self.persist_directory = persist_directory
         self.vectorstore = None
+        self.lexical_index = None
+        self.article_index = None
+        self.index_version = None
         self.qa_chain = None
         
-        # 法律專用的文本分割器設定
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1200,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", "。", "；", "，", " ", ""]
-        )
+        # 文件解析與文本分割器設定
+        super().__init__(chunker=chunker)
     
-    def parse_law_document(self, text: str) -> List[Document]:
+    def _get_persist_directory(self, file_path: str) -> str:
         """
-        解析法律考試文件，按題目分割
+        根據檔案路徑生成對應的資料庫目錄路徑
         
         Args:
-            text: 原始文本
+            file_path: 資料檔案路徑
             
         Returns:
-            Document 列表
+            資料庫目錄路徑
         """
-        documents = []
-        
-        # 更靈活的題目分割模式
-        patterns = [
-            r'\d+\.\s*\d+[年]?[^0-9]*?\d+',  # 原始模式
-            r'\d+\.\s*[^\n]*',  # 簡化模式：數字.開頭
-            r'【.*?】',  # 標題模式
-            r'第\d+題',  # 題目編號
-        ]
+        # 共用資料庫模式下，所有檔案都寫入同一個資料庫
+        if self.index_mode == "unified":
+            return UNIFIED_DB_PATH
         
-        # 先嘗試原始模式
-        matches = []
-        for pattern in patterns:
-            matches = list(re.finditer(pattern, text))
-            if matches:
-                print(f"使用模式找到 {len(matches)} 個匹配：{pattern}")
-                break
+        # 取得檔案名稱（不含副檔名）
+        file_name = Path(file_path).stem
         
-        if not matches:
-            # 如果沒有找到特定模式，按段落分割
-            print("未找到特定題目模式，按段落分割")
-            paragraphs = text.split('\n\n')
-            for i, para in enumerate(paragraphs):
-                if para.strip() and len(para.strip()) > 50:  # 過濾太短的段落
-                    doc = Document(
-                        page_content=para.strip(),
-                        metadata={
-                            "title": f"段落 {i+1}",
-                            "section": "文件內容",
-                            "question_number": i + 1,
-                            "type": "法律文件"
-                        }
-                    )
-                    documents.append(doc)
-        else:
-            # 按找到的模式分割
-            for i, match in enumerate(matches):
-                start = match.start()
-                end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-                
-                question_text = text[start:end].strip()
-                
-                if question_text:  # 確保內容不為空
-                    # 提取題目標題
-                    title_match = re.match(r'([^\n]*)', question_text)
-                    title = title_match.group(1) if title_match else f"題目 {i+1}"
-                    
-                    # 分析題目結構
-                    sections = self._extract_sections(question_text)
-                    
-                    # 為每個部分建立文件
-                    for section_name, section_content in sections.items():
-                        if section_content.strip():
-                            doc = Document(
-                                page_content=section_content,
-                                metadata={
-                                    "title": title,
-                                    "section": section_name,
-                                    "question_number": i + 1,
-                                    "type": "法律考古題"
-                                }
-                            )
-                            documents.append(doc)
+        # 建立對應的資料庫目錄路徑
+        db_path = f"./rag_db/{file_name}_db"
         
-        print(f"解析出 {len(documents)} 個文件片段")
-        return documents
+        print(f"自動生成資料庫路徑：{db_path}")
+        return db_path
     
-    def _extract_sections(self, question_text: str) -> Dict[str, str]:
+    def _open_vectorstore(self, persist_directory: str):
         """
-        提取題目的不同部分（題目、答題架構、爭點記憶等）
+        開啟（或建立）指定目錄的向量資料庫
         
         Args:
-            question_text: 題目文本
+            persist_directory: 向量資料庫目錄
             
         Returns:
-            各部分內容的字典
+            Chroma 或 NumpyVectorStore
         """
-        sections = {}
+        if self.vector_backend == "numpy":
+            return NumpyVectorStore(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings,
+                ann_params=self.ann_params,
+                quantization=self.quantization,
+                projection_params=self.projection_params
+            )
+        return Chroma(
+            persist_directory=persist_directory,
+            embedding_function=self.embeddings
+        )
+    
+    def _open_lexical_index(self, persist_directory: str) -> Optional[LexicalIndex]:
+        """
+        開啟向量資料庫目錄中的詞彙索引（未啟用混合檢索時為 None）
+        """
+        if not self.hybrid:
+            return None
+        return LexicalIndex.for_directory(persist_directory)
+    
+    @staticmethod
+    def _read_index_version(persist_directory: str) -> Optional[str]:
+        """
+        索引版本：資料庫目錄中最新的檔案修改時間（重新建立或增量更新索引後就會改變）
         
-        # 提取主要案例事實
-        fact_patterns = [
-            r'(甲.*?請問.*?罪責？)',
-            r'(甲.*?試問.*?如何\?)',
-            r'(甲.*?請.*?分析)',
-            r'(甲.*?)',  # 更寬鬆的匹配
-        ]
+        只看目錄第一層的檔案：Chroma 開啟後第一次查詢會改寫子目錄中的 HNSW 檔案，
+        但每次寫入片段都會更新第一層的 chroma.sqlite3（以及詞彙、法條引用等輔助索引）。
+        """
+        latest = 0
+        try:
+            entries = list(os.scandir(persist_directory))
+        except OSError:
+            entries = []
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    latest = max(latest, entry.stat().st_mtime_ns)
+            except OSError:
+                continue
+        return f"{os.path.abspath(persist_directory)}@{latest}" if latest else None
+    
+    def _index_exists(self, persist_directory: str) -> bool:
+        """
+        檢查目錄中是否已有目前後端的向量資料庫
+        """
+        if self.vector_backend == "numpy":
+            return NumpyVectorStore.exists(persist_directory)
+        return os.path.exists(persist_directory)
+    
+    def _corpus_metadata(self, file_path: str) -> Dict:
+        """
+        產生片段的來源檔案與主題標記
         
-        for pattern in fact_patterns:
-            fact_match = re.search(pattern, question_text, re.DOTALL)
-            if fact_match:
-                sections["案例事實"] = fact_match.group(1)
-                break
+        Chroma 的 metadata 只接受純量值，因此每個主題以一個布林欄位 `topic:<主題>` 標記，
+        另外以 `topics` 欄位保存以「|」分隔的主題名稱供顯示。
         
-        # 提取答題架構
-        structure_pattern = r'【答題架構】(.*?)(?:【爭點記憶】|$)'
-        structure_match = re.search(structure_pattern, question_text, re.DOTALL)
-        if structure_match:
-            sections["答題架構"] = structure_match.group(1)
+        Args:
+            file_path: 資料檔案路徑
+            
+        Returns:
+            要合併進片段 metadata 的字典
+        """
+        source_file = os.path.basename(file_path)
+        topics = [
+            topic for topic, mapped_file in self.topic_to_file_mapping.items()
+            if mapped_file == source_file
+        ]
+        metadata = {"source_file": source_file, "topics": "|".join(topics)}
+        for topic in topics:
+            metadata[f"topic:{topic}"] = True
+        return metadata
+    
+    def topic_filter(self, topic: str = None) -> Optional[Dict]:
+        """
+        取得主題的 metadata 篩選條件（只在共用資料庫模式下有作用）
+        
+        Args:
+            topic: 主題名稱；None 表示搜尋所有主題
+            
+        Returns:
+            Chroma 的 where 篩選條件，不需篩選時為 None
+        """
+        if self.index_mode != "unified" or not topic:
+            return None
+        return {f"topic:{topic}": True}
+    
+    def _compute_chunk_id(self, doc: Document) -> str:
+        """
+        計算片段的穩定內容雜湊（作為向量資料庫中的 id）
         
-        # 提取爭點記憶
-        points_pattern = r'【爭點記憶】(.*?)(?=\d+\.|$)'
-        points_match = re.search(points_pattern, question_text, re.DOTALL)
-        if points_match:
-            sections["爭點記憶"] = points_match.group(1)
+        只使用片段內容、題目標題、章節名稱與來源檔案，不包含題目編號，
+        因此在檔案中插入或刪除題目時，其他題目的雜湊不會改變。
         
-        # 如果沒有明確結構，就把整個內容當作一個部分
-        if not sections:
-            sections["完整內容"] = question_text
+        Args:
+            doc: 分割後的文件片段
             
-        return sections
+        Returns:
+            SHA-256 十六進位字串
+        """
+        payload = json.dumps(
+            {
+                "content": doc.page_content,
+                "title": doc.metadata.get("title"),
+                "section": doc.metadata.get("section"),
+                "source_file": doc.metadata.get("source_file"),
+            },
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
     
-    def _get_persist_directory(self, file_path: str) -> str:
+    def _tag_chunks(self, file_path: str, splits: Iterable[Document]) -> Iterator[Document]:
         """
-        根據檔案路徑生成對應的資料庫目錄路徑
+        為片段加上來源檔案、主題標記與內容雜湊
         
         Args:
             file_path: 資料檔案路徑
+            splits: 分割後的文件片段
+            
+        Yields:
+            metadata 中帶有 content_hash 的片段
+        """
+        corpus_metadata = self._corpus_metadata(file_path)
+        for doc in splits:
+            doc.metadata.update(corpus_metadata)
+            doc.metadata["content_hash"] = self._compute_chunk_id(doc)
+            yield doc
+    
+    def _sync_index(
+        self,
+        persist_directory: str,
+        file_path: str,
+        chunks: Iterable[Document],
+        aliases: Optional[Dict[str, List[Dict]]] = None,
+    ):
+        """
+        以內容雜湊比對現有索引，只嵌入新增或變更的片段，並刪除已不存在的片段
+        
+        片段以串流方式處理：新增的片段累積到一定數量就送出嵌入，
+        記憶體中只保留片段的雜湊與 metadata。
+        
+        Args:
+            persist_directory: 向量資料庫目錄
+            file_path: 資料檔案路徑（共用資料庫模式下只比對此檔案的片段）
+            chunks: 已標記內容雜湊的片段（可為 generator）
+            aliases: 去重的別名記錄（於 chunks 串流完畢時填滿），別名引用的法條併入代表片段的法條引用索引
             
         Returns:
-            資料庫目錄路徑
+            (向量資料庫, 包含 added / kept / removed 數量的字典)
         """
-        # 取得檔案名稱（不含副檔名）
-        file_name = Path(file_path).stem
+        vectorstore = self._open_vectorstore(persist_directory)
+        # 與向量索引同步更新的輔助索引（詞彙索引、法條引用索引）
+        article_index = ArticleIndex.for_directory(persist_directory)
+        side_indexes = [article_index]
+        lexical_index = self._open_lexical_index(persist_directory)
+        if lexical_index is not None:
+            side_indexes.append(lexical_index)
+        # 共用資料庫中只比對同一個來源檔案的片段
+        where = {"source_file": os.path.basename(file_path)} if self.index_mode == "unified" else None
+        existing = vectorstore._collection.get(where=where, include=["metadatas"])
+        existing_metadata = dict(zip(existing["ids"], existing["metadatas"]))
         
-        # 建立對應的資料庫目錄路徑
-        db_path = f"./rag_db/{file_name}_db"
+        # 每次送出的片段數量讓所有 embedding 執行緒都有批次可處理
+        flush_size = self.embedding_batcher.batch_size * self.embedding_batcher.max_workers
+        pending_docs, pending_ids = [], []
+        updated_ids, updated_metadata = [], []
+        seen = set()
+        added = kept = 0
         
-        print(f"自動生成資料庫路徑：{db_path}")
-        return db_path
+        def flush():
+            nonlocal added
+            if pending_docs:
+                vectorstore.add_documents(pending_docs, ids=pending_ids)
+                for side_index in side_indexes:
+                    side_index.add_many(zip(pending_ids, (doc.page_content for doc in pending_docs)))
+                added += len(pending_docs)
+                print(f"已嵌入 {added} 個新增或變更的片段...")
+                pending_docs.clear()
+                pending_ids.clear()
+            if updated_ids:
+                # 內容未變但題目編號等 metadata 變動的片段，只更新 metadata，不重新嵌入
+                vectorstore._collection.update(ids=list(updated_ids), metadatas=list(updated_metadata))
+                updated_ids.clear()
+                updated_metadata.clear()
+        
+        for doc in chunks:
+            chunk_id = doc.metadata["content_hash"]
+            if chunk_id in seen:  # 相同內容只保留第一次出現的片段
+                continue
+            seen.add(chunk_id)
+            
+            if chunk_id in existing_metadata:
+                kept += 1
+                # 在加入輔助索引前建立的向量索引，於此補上
+                for side_index in side_indexes:
+                    if chunk_id not in side_index:
+                        side_index.add(chunk_id, doc.page_content)
+                if existing_metadata[chunk_id] != doc.metadata:
+                    updated_ids.append(chunk_id)
+                    updated_metadata.append(doc.metadata)
+            else:
+                pending_docs.append(doc)
+                pending_ids.append(chunk_id)
+            
+            if len(pending_docs) >= flush_size or len(updated_ids) >= flush_size:
+                flush()
+        flush()
+        
+        # 去重時被合併的片段不會寫入任何索引，以法條查詢時改由代表片段回應
+        for canonical_id, canonical_aliases in (aliases or {}).items():
+            article_index.add_references(
+                canonical_id,
+                [ArticleRef(*ref) for alias in canonical_aliases for ref in alias.get("article_refs", [])]
+            )
+        
+        # 沒有解析出任何片段時不刪除既有索引，避免誤刪
+        removed_ids = []
+        if seen:
+            removed_ids = [chunk_id for chunk_id in existing_metadata if chunk_id not in seen]
+            if removed_ids:
+                print(f"刪除 {len(removed_ids)} 個已不存在的片段...")
+                vectorstore.delete(ids=removed_ids)
+                for side_index in side_indexes:
+                    side_index.remove(removed_ids)
+        
+        vectorstore.persist()
+        for side_index in side_indexes:
+            side_index.save()
+        
+        return vectorstore, {
+            "added": added,
+            "kept": kept,
+            "removed": len(removed_ids),
+        }
+    
+    def build_index(self, file_path: str, splits: Iterable[Document] = None):
+        """
+        建立或增量更新單一文件的向量索引，不修改 pipeline 目前載入的索引
+        
+        可在多個執行緒中同時為不同文件呼叫，embedding 請求共用同一個並行上限。
+        
+        Args:
+            file_path: 文件檔案路徑（用於決定資料庫目錄）
+            splits: 已分割好的片段；未提供時會串流解析 file_path
+            
+        Returns:
+            (向量資料庫, 包含 added / kept / removed 數量的字典；啟用去重時另含 dedupe 統計)
+        """
+        persist_directory = self._get_persist_directory(file_path)
+        if splits is None:
+            splits = self.iter_splits(file_path)
+        chunks = self._tag_chunks(file_path, splits)
+        
+        # 在分割與嵌入之間去除近似重複的片段，重複者記錄為代表片段的別名
+        aliases, dedupe_stats = {}, {}
+        if self.dedupe_threshold:
+            chunks = deduplicate_chunks(
+                chunks,
+                MinHashDeduplicator(threshold=self.dedupe_threshold),
+                aliases,
+                dedupe_stats
+            )
+        
+        vectorstore, stats = self._sync_index(persist_directory, file_path, chunks, aliases)
+        
+        if self.dedupe_threshold and stats["added"] + stats["kept"] > 0:
+            save_aliases(persist_directory, os.path.basename(file_path), aliases)
+            stats["dedupe"] = dedupe_stats
+        return vectorstore, stats
+    
+    def get_aliases(self, doc: Document) -> List[Dict]:
+        """
+        取得片段在去重時被合併的別名（其他題目中近似重複的段落）
+        
+        Args:
+            doc: 檢索到的片段
+            
+        Returns:
+            別名資訊列表（標題、章節、題目編號等）
+        """
+        if not self.persist_directory:
+            return []
+        aliases = load_aliases(self.persist_directory).get(doc.metadata.get("source_file"), {})
+        return aliases.get(doc.metadata.get("content_hash"), [])
     
-    def index_documents(self, file_path: str):
+    def index_documents(self, file_path: str) -> Dict[str, int]:
         """
-        為文件建立向量索引
+        為文件建立向量索引（增量更新：只嵌入新增或變更的片段）
+        
+        文件以串流方式逐題解析、分割與嵌入，適用於大型考古題文件。
         
         Args:
             file_path: 文件檔案路徑
+            
+        Returns:
+            包含 added / kept / removed 片段數量的字典
         """
         try:
             # 設定資料庫目錄
             self.persist_directory = self._get_persist_directory(file_path)
             
-            # 載入文件
-            print("載入文件...")
-            documents = self.parse_law_document_from_file(file_path)
+            # 串流載入、分割文件並增量更新向量索引（embedding 以批次並行方式進行）
+            print("載入文件並更新向量索引...")
+            print(f"（批次大小 {self.embedding_batcher.batch_size}，並行數 {self.embedding_batcher.max_workers}）")
+            self.vectorstore, stats = self.build_index(file_path)
+            self.lexical_index = self._open_lexical_index(self.persist_directory)
+            self.article_index = ArticleIndex.for_directory(self.persist_directory)
+            self.index_version = self._read_index_version(self.persist_directory)
             
-            if not documents:
+            if stats["added"] + stats["kept"] == 0:
                 print("⚠️ 未解析出任何文件片段")
-                return
-            
-            # 分割文本
-            print("分割文本...")
-            splits = self.text_splitter.split_documents(documents)
-            print(f"分割後共 {len(splits)} 個片段")
-            
-            # 建立向量索引
-            print("建立向量索引...")
-            self.vectorstore = Chroma.from_documents(
-                documents=splits,
-                embedding=self.embeddings,
-                persist_directory=self.persist_directory
-            )
-            
-            # 儲存索引
-            self.vectorstore.persist()
+                return stats
             
             # 設定問答鏈
             self._setup_qa_chain()
             
-            print(f"✅ 向量索引建立完成，共 {len(splits)} 個片段")
+            print(f"✅ 向量索引更新完成：新增 {stats['added']}、保留 {stats['kept']}、移除 {stats['removed']} 個片段")
             print(f"📁 索引儲存位置：{self.persist_directory}")
+            if "dedupe" in stats:
+                dedupe_stats = stats["dedupe"]
+                print(f"🧹 去重：保留 {dedupe_stats['canonical']} 個代表片段，合併近似重複 {dedupe_stats['near_duplicates']}、完全重複 {dedupe_stats['exact_duplicates']} 個片段")
+            if self.embedding_cache:
+                cache_stats = self.embedding_cache.stats()
+                print(f"🗃️ Embedding 快取：命中 {cache_stats['hits']}、未命中 {cache_stats['misses']}（命中率 {cache_stats['hit_rate']:.1%}）")
+            return stats
             
         except Exception as e:
             print(f"發生錯誤：{e}")
@@ -280,26 +855,44 @@ class LawRAGPipeline:
             print("錯誤：未指定資料庫路徑，請先呼叫 index_documents() 或在 load_existing_index() 中傳入檔案路徑")
             return
         
-        if os.path.exists(self.persist_directory):
+        if self._index_exists(self.persist_directory):
             try:
                 print(f"載入現有索引：{self.persist_directory}")
-                self.vectorstore = Chroma(
-                    persist_directory=self.persist_directory,
-                    embedding_function=self.embeddings
-                )
+                self.vectorstore = self._open_vectorstore(self.persist_directory)
+                self.lexical_index = self._open_lexical_index(self.persist_directory)
+                self.article_index = ArticleIndex.for_directory(self.persist_directory)
+                self.index_version = self._read_index_version(self.persist_directory)
                 self._setup_qa_chain()
                 print("✅ 現有索引載入成功")
             except Exception as e:
                 print(f"❌ 載入現有索引失敗：{e}")
                 self.vectorstore = None
+                self.lexical_index = None
+                self.article_index = None
+                self.index_version = None
         else:
             print(f"📝 未找到現有索引：{self.persist_directory}")
             self.vectorstore = None
+            self.lexical_index = None
+            self.article_index = None
+            self.index_version = None
     
     def _setup_qa_chain(self):
         """
         設定問答鏈 (使用 Gemini)
         """
+        self.qa_chain = self._create_qa_chain()
+    
+    def _create_qa_chain(self, topic: str = None):
+        """
+        建立問答鏈 (使用 Gemini)
+        
+        Args:
+            topic: 限定檢索的主題（只在共用資料庫模式下有作用）
+            
+        Returns:
+            RetrievalQA 問答鏈
+        """
         # 法律專用的提示模板
         template = """你是一位專業的法律學者，專精於台灣刑法。請根據以下相關的法律資料回答問題。
 
@@ -321,27 +914,76 @@ class LawRAGPipeline:
             input_variables=["context", "question"]
         )
         
+        k = self.retrieval_k
+        if self.hybrid:
+            retriever = HybridRetriever(pipeline=self, k=k, topic=topic)
+        else:
+            search_kwargs = {"k": k}
+            search_filter = self.topic_filter(topic)
+            if search_filter:
+                search_kwargs["filter"] = search_filter
+            retriever = self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+        
         # 使用 Gemini Pro 模型
-        self.qa_chain = RetrievalQA.from_chain_type(
+        return RetrievalQA.from_chain_type(
             llm=GoogleGenerativeAI(
                 model="gemini-pro",  # 使用 Gemini Pro 模型
                 temperature=0.1,
                 max_output_tokens=2048  # 設定最大輸出長度
             ),
             chain_type="stuff",
-            retriever=self.vectorstore.as_retriever(
-                search_kwargs={"k": 5}  # Gemini 上下文較大，可以檢索更多片段
-            ),
+            retriever=retriever,
             chain_type_kwargs={"prompt": prompt},
             return_source_documents=True
         )
     
-    def query(self, question: str) -> Dict:
+    def retrieve(self, question: str, k: int = None, topic: str = None) -> Tuple[List[Document], str]:
+        """
+        檢索問答要使用的片段（每個問題只嵌入、檢索一次）
+        
+        問題寫出法條時先以法條引用索引直接查詢，查無片段才做混合檢索（未啟用時為向量搜尋）。
+        
+        Args:
+            question: 法律問題
+            k: 片段數量（None 表示使用 retrieval_k）
+            topic: 限定檢索的主題（只在共用資料庫模式下有作用）
+            
+        Returns:
+            (依相關程度排序的片段, 檢索方式 "article" 或 "hybrid")
+        """
+        k = k or self.retrieval_k
+        documents = self.lookup_articles(question, k=k, topic=topic)
+        if documents:
+            return documents, "article"
+        return self.hybrid_search(question, k=k, topic=topic), "hybrid"
+    
+    def query(self, question: str, topic: str = None, k: int = None) -> Dict:
         """
         查詢問題
         
+        只檢索一次，回答所用的片段即為返回的來源文件。
+        
+        Args:
+            question: 法律問題
+            topic: 限定檢索的主題（只在共用資料庫模式下有作用）
+            k: 檢索的片段數量（None 表示使用 retrieval_k）
+            
+        Returns:
+            包含回答和來源文件的字典
+        """
+        if not self.qa_chain:
+            raise ValueError("請先執行 index_documents() 或 load_existing_index()")
+        
+        documents, _ = self.retrieve(question, k=k, topic=topic)
+        return self.answer_with_documents(question, documents)
+    
+    def answer_with_documents(self, question: str, documents: List[Document]) -> Dict:
+        """
+        以指定的片段作為上下文產生回答（使用問答鏈的提示模板與模型，不再檢索）
+        
         Args:
             question: 法律問題
+            documents: 作為上下文的片段
             
         Returns:
             包含回答和來源文件的字典
@@ -350,20 +992,64 @@ class LawRAGPipeline:
             raise ValueError("請先執行 index_documents() 或 load_existing_index()")
         
         print(f"處理問題：{question}")
-        result = self.qa_chain({"query": question})
+        result = self.qa_chain.combine_documents_chain({
+            "input_documents": documents,
+            "question": question
+        })
+        
+        return {
+            "answer": result["output_text"],
+            "source_documents": documents
+        }
+    
+    def stream_answer_with_documents(self, question: str, documents: List[Document]) -> Iterator[str]:
+        """
+        answer_with_documents 的串流版本：以相同的提示模板與模型產生回答，逐段返回模型產生的文字
+        
+        Args:
+            question: 法律問題
+            documents: 作為上下文的片段
+            
+        Returns:
+            回答文字片段的迭代器（串接後即為完整回答）
+        """
+        if not self.qa_chain:
+            raise ValueError("請先執行 index_documents() 或 load_existing_index()")
+        
+        # 與 stuff 問答鏈相同的方式組合上下文
+        chain = self.qa_chain.combine_documents_chain
+        context = chain.document_separator.join(format_document(doc, chain.document_prompt) for doc in documents)
+        generator = chain.llm_chain.prompt | chain.llm_chain.llm
+        for chunk in generator.stream({chain.document_variable_name: context, "question": question}):
+            text = getattr(chunk, "content", chunk)
+            if text:
+                yield text
+    
+    async def aanswer_with_documents(self, question: str, documents: List[Document]) -> Dict:
+        """
+        answer_with_documents 的非同步版本（以模型的非同步介面產生回答，不佔用執行緒）
+        """
+        if not self.qa_chain:
+            raise ValueError("請先執行 index_documents() 或 load_existing_index()")
+        
+        result = await self.qa_chain.combine_documents_chain.ainvoke({
+            "input_documents": documents,
+            "question": question
+        })
         
         return {
-            "answer": result["result"],
-            "source_documents": result["source_documents"]
+            "answer": result["output_text"],
+            "source_documents": documents
         }
     
-    def search_similar_cases(self, case_description: str, k: int = 3) -> List[Document]:
+    def search_similar_cases(self, case_description: str, k: int = 3, topic: str = None) -> List[Document]:
         """
         搜尋相似案例
         
         Args:
             case_description: 案例描述
             k: 返回的相似案例數量
+            topic: 限定搜尋的主題（只在共用資料庫模式下有作用，None 表示跨主題搜尋）
             
         Returns:
             相似案例文件列表
@@ -371,7 +1057,108 @@ class LawRAGPipeline:
         if not self.vectorstore:
             raise ValueError("請先執行 index_documents() 或 load_existing_index()")
         
-        return self.vectorstore.similarity_search(case_description, k=k)
+        return self.hybrid_search(case_description, k=k, topic=topic)
+    
+    def hybrid_search(self, query: str, k: int = 5, topic: str = None, fetch_k: int = 20) -> List[Document]:
+        """
+        混合檢索：向量搜尋與詞彙索引（BM25）各取 fetch_k 個結果，以倒數排名融合
+        
+        未啟用混合檢索或詞彙索引為空時，等同向量搜尋。
+        
+        Args:
+            query: 查詢文本
+            k: 返回的片段數量
+            topic: 限定檢索的主題（只在共用資料庫模式下有作用）
+            fetch_k: 每種檢索各自取得的候選數量
+            
+        Returns:
+            依融合分數排序的片段列表
+        """
+        if not self.vectorstore:
+            raise ValueError("請先執行 index_documents() 或 load_existing_index()")
+        
+        search_filter = self.topic_filter(topic)
+        if self.lexical_index is None or len(self.lexical_index) == 0:
+            return self.vectorstore.similarity_search(query, k=k, filter=search_filter)
+        
+        vector_docs = self.vectorstore.similarity_search(query, k=fetch_k, filter=search_filter)
+        docs_by_id = {doc.metadata.get("content_hash"): doc for doc in vector_docs}
+        
+        # 詞彙索引涵蓋整個資料庫，有主題篩選時多取一些候選，再以 metadata 篩選
+        lexical_k = fetch_k * 4 if search_filter else fetch_k
+        lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, k=lexical_k)]
+        missing_ids = [chunk_id for chunk_id in lexical_ids if chunk_id not in docs_by_id]
+        if missing_ids:
+            fetched = self.vectorstore._collection.get(
+                ids=missing_ids,
+                where=search_filter,
+                include=["documents", "metadatas"]
+            )
+            for chunk_id, content, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"]):
+                docs_by_id[chunk_id] = Document(page_content=content, metadata=metadata)
+        lexical_ids = [chunk_id for chunk_id in lexical_ids if chunk_id in docs_by_id][:fetch_k]
+        
+        fused = reciprocal_rank_fusion([
+            [doc.metadata.get("content_hash") for doc in vector_docs],
+            lexical_ids,
+        ])
+        return [docs_by_id[chunk_id] for chunk_id, _ in fused[:k]]
+    
+    def lookup_articles(self, query: str, k: int = 3, topic: str = None) -> List[Document]:
+        """
+        法條直接查詢：查詢寫出法條（例如「刑法第358條」、「第225條1項」）時，
+        以法條引用索引找出引用該法條的片段，不需 embedding 也不做向量搜尋
+        
+        Args:
+            query: 查詢文本
+            k: 返回的片段數量
+            topic: 限定檢索的主題（只在共用資料庫模式下有作用）
+            
+        Returns:
+            依引用相符程度排序的片段列表；查詢沒有法條引用或查無片段時為空列表
+        """
+        if not self.vectorstore:
+            raise ValueError("請先執行 index_documents() 或 load_existing_index()")
+        
+        refs = parse_article_references(query)
+        if not refs or not self.article_index:
+            return []
+        
+        search_filter = self.topic_filter(topic)
+        # 法條引用索引涵蓋整個資料庫，有主題篩選時多取一些候選
+        chunk_ids = self.article_index.lookup(refs, k=k * 4 if search_filter else k)
+        if not chunk_ids:
+            return []
+        
+        fetched = self.vectorstore._collection.get(
+            ids=chunk_ids,
+            where=search_filter,
+            include=["documents", "metadatas"]
+        )
+        docs_by_id = {
+            chunk_id: Document(page_content=content, metadata=metadata)
+            for chunk_id, content, metadata in zip(fetched["ids"], fetched["documents"], fetched["metadatas"])
+        }
+        return [docs_by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in docs_by_id][:k]
+    
+    def is_source_indexed(self, file_path: str) -> bool:
+        """
+        檢查資料檔案是否已寫入目前載入的資料庫（共用資料庫模式使用）
+        
+        Args:
+            file_path: 資料檔案路徑
+            
+        Returns:
+            是否已有該檔案的片段
+        """
+        if not self.vectorstore:
+            return False
+        existing = self.vectorstore._collection.get(
+            where={"source_file": os.path.basename(file_path)},
+            limit=1,
+            include=[]
+        )
+        return bool(existing["ids"])
 
 # 使用範例
 def main():
@@ -0,0 +1,165 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# 題目分割模式（依優先順序，整份文件中第一個有匹配的模式會被採用）
+QUESTION_PATTERNS = [
+    r'\d+\.\s*\d+[年]?[^0-9]*?\d+',  # 原始模式
+    r'\d+\.\s*[^\n]*',  # 簡化模式：數字.開頭
+    r'【.*?】',  # 標題模式
+    r'第\d+題',  # 題目編號
+]
+
+# 所有模式合併成一個預先編譯的掃描器，同一位置依優先順序嘗試；
+# 開頭的前瞻只允許可能的起始字元，讓不可能匹配的位置快速略過
+_COMBINED_PATTERN = re.compile(
+    r"(?=[\d【第])(?:"
+    + "|".join(f"({pattern})" for pattern in QUESTION_PATTERNS)
+    + ")"
+)
+
+# 各模式可能的起始片段（保守估計），用來確認低優先模式的匹配範圍內沒有藏住高優先模式的起點
+_PATTERN_HEADS = [r'\d+\.', r'\d+\.', r'【', r'第\d']
+_HEAD_PATTERNS = [
+    re.compile("|".join(_PATTERN_HEADS[:index + 1]))
+    for index in range(len(_PATTERN_HEADS))
+]
+
+_NUMBERED_ITEM = re.compile(r'\d+\.')
+
+# 案例事實的擷取規則：(關鍵字, 結尾字串)，依序嘗試
+_FACT_RULES = [
+    ('請問', '罪責？'),
+    ('試問', '如何?'),
+    ('請', '分析'),
+]
+
+STRUCTURE_MARKER = '【答題架構】'
+POINTS_MARKER = '【爭點記憶】'
+
+
+def find_question_starts(text: str) -> Tuple[Optional[str], List[int]]:
+    """
+    以單次線性掃描找出題目起點
+
+    結果與「依序對每個模式執行 re.finditer，採用第一個有匹配的模式」完全相同。
+    合併掃描時，若低優先模式的匹配範圍內可能藏有高優先模式的起點（極少見），
+    會退回逐一模式掃描以確保結果一致。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        (採用的模式, 題目起點位置列表)；找不到任何模式時為 (None, [])
+    """
+    starts_by_pattern = [[] for _ in QUESTION_PATTERNS]
+    regions = []  # 原始模式以外的匹配範圍
+
+    for match in _COMBINED_PATTERN.finditer(text):
+        index = match.lastindex - 1  # 各模式本身沒有捕獲群組，群組編號即優先順序
+        start, end = match.span()
+        starts_by_pattern[index].append(start)
+        if index:
+            regions.append((index, start, end))
+
+    best = next(
+        (index for index, starts in enumerate(starts_by_pattern) if starts),
+        len(QUESTION_PATTERNS)
+    )
+
+    if best == len(QUESTION_PATTERNS):
+        return None, []
+
+    # 同一模式的匹配互不重疊，與單獨掃描相同；但任何匹配範圍內都不能藏有更高優先模式的起點，
+    # 比採用模式優先順序低的匹配範圍內也不能藏有採用模式的起點
+    for index, start, end in regions:
+        head_count = best if index == best else best + 1
+        if head_count and _HEAD_PATTERNS[head_count - 1].search(text, start + 1, end):
+            return _find_question_starts_by_cascade(text)
+
+    return QUESTION_PATTERNS[best], starts_by_pattern[best]
+
+
+def _find_question_starts_by_cascade(text: str) -> Tuple[Optional[str], List[int]]:
+    """
+    逐一模式掃描（原本的做法），只在合併掃描無法保證結果一致時使用
+    """
+    for pattern in QUESTION_PATTERNS:
+        starts = [match.start() for match in re.finditer(pattern, text)]
+        if starts:
+            return pattern, starts
+    return None, []
+
+
+def _end_anchor(text: str, start: int) -> int:
+    """
+    模擬非 MULTILINE 模式下 `$` 在 start 之後最早可匹配的位置
+    """
+    if text.endswith('\n') and len(text) - 1 >= start:
+        return len(text) - 1
+    return len(text)
+
+
+def _extract_fact(question_text: str) -> Optional[str]:
+    """
+    擷取案例事實：從第一個「甲」開始，到關鍵字之後的第一個結尾字串為止
+
+    等同依序以 `甲.*?關鍵字.*?結尾` (re.DOTALL) 搜尋；若第一個「甲」無法匹配，
+    之後的「甲」可選的範圍更小，也不可能匹配，因此只需從第一個「甲」找起。
+    """
+    start = question_text.find('甲')
+    if start == -1:
+        return None
+
+    for keyword, terminator in _FACT_RULES:
+        keyword_at = question_text.find(keyword, start + 1)
+        if keyword_at == -1:
+            continue
+        end_at = question_text.find(terminator, keyword_at + len(keyword))
+        if end_at != -1:
+            return question_text[start:end_at + len(terminator)]
+
+    return question_text[start:start + 1]  # 寬鬆匹配 `甲.*?` 只會取到「甲」
+
+
+def extract_sections(question_text: str) -> Dict[str, str]:
+    """
+    提取題目的不同部分（案例事實、答題架構、爭點記憶）
+
+    只使用 str.find 與一次有界的搜尋，執行時間與題目長度成線性，
+    結果與原本的 re.DOTALL 正規表示式相同。
+
+    Args:
+        question_text: 題目文本
+
+    Returns:
+        各部分內容的字典
+    """
+    sections = {}
+
+    fact = _extract_fact(question_text)
+    if fact is not None:
+        sections["案例事實"] = fact
+
+    structure_at = question_text.find(STRUCTURE_MARKER)
+    if structure_at != -1:
+        content_start = structure_at + len(STRUCTURE_MARKER)
+        end = _end_anchor(question_text, content_start)
+        points_at = question_text.find(POINTS_MARKER, content_start)
+        if points_at != -1:
+            end = min(end, points_at)
+        sections["答題架構"] = question_text[content_start:end]
+
+    points_at = question_text.find(POINTS_MARKER)
+    if points_at != -1:
+        content_start = points_at + len(POINTS_MARKER)
+        end = _end_anchor(question_text, content_start)
+        numbered = _NUMBERED_ITEM.search(question_text, content_start)
+        if numbered:
+            end = min(end, numbered.start())
+        sections["爭點記憶"] = question_text[content_start:end]
+
+    # 如果沒有明確結構，就把整個內容當作一個部分
+    if not sections:
+        sections["完整內容"] = question_text
+
+    return sections
@@ -0,0 +1,340 @@
+import os
+import json
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LEXICAL_FILE = "lexical_index.npz"
+
+# 中文沒有空白斷詞，以連續字元的 2-gram 與 3-gram 作為索引詞
+NGRAM_SIZES = (2, 3)
+
+# 倒數排名融合（reciprocal-rank fusion）的平滑常數
+RRF_K = 60
+
+
+def _is_boundary(char: str) -> bool:
+    # 標點、空白與控制字元都視為詞的邊界
+    return unicodedata.category(char).startswith(("P", "Z", "C", "S"))
+
+
+def tokenize(text: str) -> Counter:
+    """
+    將文本切成字元 n-gram（不跨越標點與空白）
+
+    先以 NFKC 統一全形/半形，並將「臺」統一為「台」，英文字母轉小寫。
+
+    Returns:
+        n-gram -> 出現次數
+    """
+    text = unicodedata.normalize("NFKC", text).replace("臺", "台").lower()
+    counts = Counter()
+    run = []
+    for char in text + " ":
+        if not _is_boundary(char):
+            run.append(char)
+            continue
+        if run:
+            segment = "".join(run)
+            for size in NGRAM_SIZES:
+                for start in range(len(segment) - size + 1):
+                    counts[segment[start:start + size]] += 1
+            if len(segment) == 1:
+                counts[segment] += 1
+            run = []
+    return counts
+
+
+class LexicalIndex:
+    """
+    字元 n-gram 倒排索引，以 BM25 計分
+
+    專有名詞（準強盜罪、刑法第329條）在向量搜尋中常被相近但不同的詞蓋過，
+    以字面比對最便宜也最準確。
+
+    索引分成兩部分：
+    - 基礎部分：載入自磁碟的壓縮陣列（依詞排序的片段編號與詞頻），查詢時直接切片
+    - 增量部分：載入後新增的片段，以字典保存
+    刪除的片段只標記為失效，save() 時才重新壓縮，因此新增與刪除都只需處理該片段本身。
+
+    基礎部分的 BM25 詞頻權重在載入時預先算好（以當時的平均長度），查詢時每個詞只需一次切片與累加；
+    增量更新後平均長度的微小變化要到下次 save() 才反映在基礎部分的權重上。
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            path: 索引檔路徑（None 表示只保存在記憶體中）
+            k1: BM25 的詞頻飽和參數
+            b: BM25 的文件長度正規化參數
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        self._ids: List[str] = []
+        self._slot_by_id: Dict[str, int] = {}
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._total_length = 0.0
+        self._alive_count = 0
+
+        # 基礎部分：詞 -> 詞編號；依詞排序的 (片段編號, 詞頻)；每個詞的起點
+        self._term_ids: Dict[str, int] = {}
+        self._post_slots = np.zeros(0, dtype=np.int32)
+        self._post_tfs = np.zeros(0, dtype=np.float32)
+        self._post_weights = np.zeros(0, dtype=np.float32)
+        self._term_offsets = np.zeros(1, dtype=np.int64)
+        self._removed_count = 0
+
+        # 增量部分：詞 -> [(片段編號, 詞頻)]；片段編號 -> 詞頻（save() 時寫回基礎部分）
+        self._delta_postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._delta_arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._delta_docs: Dict[int, Counter] = {}
+
+        if path and os.path.exists(path):
+            self._load(path)
+
+    @classmethod
+    def for_directory(cls, persist_directory: str) -> "LexicalIndex":
+        """
+        開啟向量資料庫目錄中的詞彙索引
+        """
+        return cls(os.path.join(persist_directory, LEXICAL_FILE))
+
+    def __len__(self) -> int:
+        return self._alive_count
+
+    def __contains__(self, chunk_id: str) -> bool:
+        slot = self._slot_by_id.get(chunk_id)
+        return slot is not None and bool(self._alive[slot])
+
+    def _new_slot(self, chunk_id: str, length: int) -> int:
+        slot = len(self._ids)
+        if slot >= self._lengths.shape[0]:
+            # 以倍增方式擴充，新增片段的攤銷成本為常數
+            capacity = max(64, 2 * self._lengths.shape[0])
+            self._lengths = np.concatenate([self._lengths, np.zeros(capacity - self._lengths.shape[0], dtype=np.float32)])
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - self._alive.shape[0], dtype=bool)])
+        self._ids.append(chunk_id)
+        self._slot_by_id[chunk_id] = slot
+        self._lengths[slot] = length
+        self._alive[slot] = True
+        self._total_length += length
+        self._alive_count += 1
+        return slot
+
+    def add(self, chunk_id: str, text: str):
+        """
+        加入或更新片段
+        """
+        counts = tokenize(text)
+        with self._lock:
+            if chunk_id in self:
+                self.remove([chunk_id])
+            slot = self._new_slot(chunk_id, sum(counts.values()))
+            self._delta_docs[slot] = counts
+            for term, tf in counts.items():
+                self._delta_postings.setdefault(term, []).append((slot, tf))
+                self._delta_arrays.pop(term, None)
+
+    def add_many(self, items: Iterable[Tuple[str, str]]):
+        """
+        批次加入 (片段 id, 文本)
+        """
+        for chunk_id, text in items:
+            self.add(chunk_id, text)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """
+        刪除片段（標記為失效，save() 時才自索引中移除）
+        """
+        with self._lock:
+            for chunk_id in chunk_ids:
+                slot = self._slot_by_id.pop(chunk_id, None)
+                if slot is None or not self._alive[slot]:
+                    continue
+                self._alive[slot] = False
+                self._total_length -= float(self._lengths[slot])
+                self._alive_count -= 1
+                self._removed_count += 1
+                self._delta_docs.pop(slot, None)
+
+    def _term_weights(self, term: str, length_norm: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        取得詞的 postings 與 BM25 詞頻權重（不含 idf）
+
+        Returns:
+            (有效片段編號, 權重)
+        """
+        slots, weights = [], []
+        term_id = self._term_ids.get(term)
+        if term_id is not None:
+            start, end = self._term_offsets[term_id], self._term_offsets[term_id + 1]
+            slots.append(self._post_slots[start:end])
+            weights.append(self._post_weights[start:end])
+        if term in self._delta_postings:
+            delta = self._delta_arrays.get(term)
+            if delta is None:
+                delta_array = np.asarray(self._delta_postings[term], dtype=np.int64)
+                delta = (delta_array[:, 0].astype(np.int32), delta_array[:, 1].astype(np.float32))
+                self._delta_arrays[term] = delta
+            delta_slots, delta_tfs = delta
+            slots.append(delta_slots)
+            weights.append(delta_tfs * (self.k1 + 1) / (delta_tfs + length_norm[delta_slots]))
+        if not slots:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        if len(slots) == 1:
+            slots, weights = slots[0], weights[0]
+        else:
+            slots, weights = np.concatenate(slots), np.concatenate(weights)
+        if self._removed_count:
+            alive = self._alive[slots]
+            slots, weights = slots[alive], weights[alive]
+        return slots, weights
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """
+        以 BM25 搜尋最相關的片段
+
+        Returns:
+            (片段 id, BM25 分數) 列表，依分數由高到低排序
+        """
+        terms = tokenize(query)
+        with self._lock:
+            if not terms or self._alive_count == 0 or k <= 0:
+                return []
+            size = len(self._ids)
+            scores = np.zeros(size, dtype=np.float32)
+            length_norm = None
+            if self._delta_postings:
+                average_length = self._total_length / self._alive_count
+                length_norm = self.k1 * (1 - self.b + self.b * self._lengths[:size] / average_length)
+            touched = False
+            for term in terms:
+                slots, weights = self._term_weights(term, length_norm)
+                if slots.size == 0:
+                    continue
+                idf = np.log1p((self._alive_count - slots.size + 0.5) / (slots.size + 0.5))
+                # 同一個詞的 postings 中片段編號不重複，可直接以索引累加
+                scores[slots] += np.float32(idf) * weights
+                touched = True
+            if not touched:
+                return []
+
+            matched = np.flatnonzero(scores)
+            k = min(k, matched.size)
+            if k < matched.size:
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind="stable")]
+            return [(self._ids[slot], float(scores[slot])) for slot in matched]
+
+    def _load(self, path: str):
+        with np.load(path) as data:
+            vocabulary = json.loads(str(data["vocabulary"]))
+            self._ids = json.loads(str(data["ids"]))
+            self._lengths = data["lengths"].astype(np.float32)
+            doc_offsets = data["doc_offsets"]
+            doc_terms = data["doc_terms"]
+            doc_tfs = data["doc_tfs"]
+
+        self._slot_by_id = {chunk_id: slot for slot, chunk_id in enumerate(self._ids)}
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._total_length = float(self._lengths.sum())
+        self._alive_count = len(self._ids)
+        self._term_ids = {term: term_id for term_id, term in enumerate(vocabulary)}
+
+        # 磁碟上依片段保存（方便壓縮與刪除），載入時轉成依詞排序的倒排陣列
+        entry_slots = np.repeat(np.arange(len(self._ids), dtype=np.int32), np.diff(doc_offsets))
+        order = np.argsort(doc_terms, kind="stable")
+        self._post_slots = entry_slots[order]
+        self._post_tfs = doc_tfs[order].astype(np.float32)
+        self._term_offsets = np.searchsorted(doc_terms[order], np.arange(len(vocabulary) + 1)).astype(np.int64)
+        self._removed_count = 0
+
+        average_length = self._total_length / max(self._alive_count, 1)
+        length_norm = self.k1 * (1 - self.b + self.b * self._lengths / average_length)
+        self._post_weights = (
+            self._post_tfs * (self.k1 + 1) / (self._post_tfs + length_norm[self._post_slots])
+        ).astype(np.float32)
+
+    def save(self, path: Optional[str] = None):
+        """
+        壓縮並寫入磁碟（移除失效片段、合併增量部分），之後重新載入為基礎部分
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            size = len(self._ids)
+            alive = self._alive[:size]
+
+            # 基礎部分直接以陣列篩選；增量部分只有載入後新增的片段
+            term_of_entry = np.repeat(np.arange(len(self._term_offsets) - 1), np.diff(self._term_offsets))
+            keep = alive[self._post_slots] if self._post_slots.size else np.zeros(0, dtype=bool)
+            slots = [self._post_slots[keep].astype(np.int64)]
+            terms = [term_of_entry[keep].astype(np.int64)]
+            tfs = [self._post_tfs[keep].astype(np.int64)]
+            for slot, counts in self._delta_docs.items():
+                slots.append(np.full(len(counts), slot, dtype=np.int64))
+                terms.append(np.fromiter(
+                    (self._term_ids.setdefault(term, len(self._term_ids)) for term in counts),
+                    dtype=np.int64, count=len(counts)
+                ))
+                tfs.append(np.fromiter(counts.values(), dtype=np.int64, count=len(counts)))
+            slots, terms, tfs = np.concatenate(slots), np.concatenate(terms), np.concatenate(tfs)
+
+            # 依片段排序並重新編號（移除失效片段）
+            order = np.argsort(slots, kind="stable")
+            slots, terms, tfs = slots[order], terms[order], tfs[order]
+            new_slot = np.cumsum(alive) - 1
+            slots = new_slot[slots]
+            doc_offsets = np.concatenate([[0], np.cumsum(np.bincount(slots, minlength=int(alive.sum())))])
+
+            # 只保留仍被使用的詞
+            vocabulary = sorted(self._term_ids, key=self._term_ids.get)
+            used = np.zeros(len(vocabulary), dtype=bool)
+            used[terms] = True
+            remap = np.cumsum(used) - 1
+            vocabulary = [term for term, is_used in zip(vocabulary, used) if is_used]
+            ids = [chunk_id for chunk_id, is_alive in zip(self._ids, alive) if is_alive]
+
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                np.savez(
+                    f,
+                    vocabulary=np.array(json.dumps(vocabulary, ensure_ascii=False)),
+                    ids=np.array(json.dumps(ids)),
+                    lengths=self._lengths[:size][alive].astype(np.float32),
+                    doc_offsets=doc_offsets.astype(np.int64),
+                    doc_terms=remap[terms].astype(np.int32),
+                    doc_tfs=np.minimum(tfs, np.iinfo(np.uint16).max).astype(np.uint16),
+                )
+            os.replace(f"{path}.tmp", path)
+
+            self._delta_postings = {}
+            self._delta_arrays = {}
+            self._delta_docs = {}
+            self._load(path)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    以倒數排名融合多個排序結果：分數 = Σ 1 / (k + 排名)
+
+    Args:
+        rankings: 多個依相關度排序的 id 列表
+        k: 平滑常數（越大，排名前後的差距越小）
+
+    Returns:
+        (id, 融合分數) 列表，依分數由高到低排序
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
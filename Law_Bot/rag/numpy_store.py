@@ -0,0 +1,687 @@
+import os
+import json
+import uuid
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ann_index import ANN_FILE, IVFPQIndex
+from projection import PROJECTION_FILE, Projection
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl"
+
+# 片段數少於此值時暴力搜尋已經夠快，不建立 ANN 索引
+ANN_MIN_SIZE = 10000
+
+# 壓縮向量的格式：float16，或 int8 搭配每個向量各自的縮放係數
+QUANTIZATION_MODES = ("float16", "int8")
+QUANTIZED_FILE = "vectors_{mode}.npy"
+SCALES_FILE = "vector_scales.npy"
+
+# 以壓縮向量搜尋後，以原始向量重新計分的候選數
+DEFAULT_RESCORE = 64
+
+# 片段數少於此值時不擬合降維（樣本太少，估計的召回率不可靠）
+PROJECTION_MIN_SIZE = 1000
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _append_rows(buffer: Optional[np.ndarray], current: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    將 rows 附加在 current（目前使用中的列）之後
+
+    current 是 buffer 的前段時直接寫入預留的空間；容量不足（或 current 不屬於 buffer，例如以 mmap 開啟）時
+    配置兩倍容量的新緩衝區，分批加入 n 列的總成本為 O(n)。
+
+    Returns:
+        新的緩衝區；前 len(current) + len(rows) 列為有效資料
+    """
+    used = current.shape[0]
+    needed = used + rows.shape[0]
+    if buffer is None or current.base is not buffer or buffer.shape[0] < needed or buffer.shape[1:] != rows.shape[1:]:
+        grown = np.empty((max(needed, 2 * used),) + rows.shape[1:], dtype=rows.dtype)
+        grown[:used] = current
+        buffer = grown
+    buffer[used:needed] = rows
+    return buffer
+
+
+def quantize_vectors(vectors: np.ndarray, mode: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    壓縮正規化的向量
+
+    Args:
+        vectors: float32 向量 (n, d)
+        mode: "float16" 或 "int8"（每個向量以最大絕對值 / 127 為縮放係數）
+
+    Returns:
+        (壓縮後的向量, 縮放係數)；float16 沒有縮放係數
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if mode == "float16":
+        return vectors.astype(np.float16), None
+    if mode == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if vectors.size else np.zeros(vectors.shape[0], dtype=np.float32)
+        scales = scales.astype(np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"不支援的向量壓縮格式：{mode}（可用：{', '.join(QUANTIZATION_MODES)}）")
+
+
+def _quantized_scores(codes: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray, block_size: int = 256) -> np.ndarray:
+    """
+    以壓縮向量計算近似內積
+
+    分段轉回 float32 再做矩陣-向量乘法：小區段留在 CPU 快取中，int8 因此比直接掃描 float32 還快；
+    NumPy 的 float16 轉換沒有硬體加速，float16 只省記憶體、查詢較慢。
+    """
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], block_size):
+        scores[start:start + block_size] = codes[start:start + block_size].astype(np.float32) @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def _matches(metadata: Dict, where: Optional[Dict]) -> bool:
+    """
+    判斷 metadata 是否符合 Chroma 風格的 where 條件
+
+    支援 {"欄位": 值}、{"欄位": {"$eq"/"$ne"/"$in"/"$nin": ...}} 以及 "$and" / "$or" 組合。
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, expected in condition.items():
+            if operator == "$eq" and value != expected:
+                return False
+            if operator == "$ne" and value == expected:
+                return False
+            if operator == "$in" and value not in expected:
+                return False
+            if operator == "$nin" and value in expected:
+                return False
+            if operator not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"不支援的篩選運算子：{operator}")
+    return True
+
+
+class _NumpyCollection:
+    """
+    模擬 Chroma collection 的 get / count / update / delete 介面
+
+    讓既有程式碼透過 vectorstore._collection 取得片段內容與 metadata 時不需修改。
+    """
+
+    def __init__(self, store: "NumpyVectorStore"):
+        self._store = store
+
+    def count(self) -> int:
+        return len(self._store._ids)
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Iterable[str] = ("metadatas", "documents"),
+        **kwargs,
+    ) -> Dict[str, Any]:
+        store = self._store
+        with store._lock:
+            if ids is not None:
+                rows = [store._row_by_id[chunk_id] for chunk_id in ids if chunk_id in store._row_by_id]
+            else:
+                rows = range(len(store._ids))
+            rows = [row for row in rows if _matches(store._metadatas[row], where)]
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+
+            include = set(include)
+            return {
+                "ids": [store._ids[row] for row in rows],
+                "documents": [store._documents[row] for row in rows] if "documents" in include else None,
+                "metadatas": [store._metadatas[row] for row in rows] if "metadatas" in include else None,
+                "embeddings": [store._vectors[row].tolist() for row in rows] if "embeddings" in include else None,
+            }
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict]] = None, documents: Optional[List[str]] = None, **kwargs):
+        self._store._update(ids, metadatas=metadatas, documents=documents)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, **kwargs):
+        if ids is None and where is not None:
+            ids = self.get(where=where, include=[])["ids"]
+        self._store.delete(ids=ids)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    以單一 NumPy 矩陣保存向量的行程內向量資料庫
+
+    每個語料只有數千個片段，暴力搜尋本身只需一次矩陣-向量乘法；
+    相較於 Chroma，省去了用戶端啟動、SQLite 與每次查詢的額外開銷。
+
+    向量正規化後以連續的 float32 矩陣存成 vectors.npy（載入時以 mmap 開啟），
+    片段內容與 metadata 存成 records.jsonl。修改後需呼叫 persist() 寫回磁碟。
+    相似度分數與 Chroma 預設的 l2 距離相同（正規化向量的平方歐氏距離，越小越相似）。
+
+    合併多個語料後片段數變多時，可啟用 IVF-PQ 近似最近鄰索引（ann_params），
+    索引在 persist() 時訓練並存成同目錄下的 ann_ivfpq.npz，新增的片段直接編碼加入。
+
+    啟用向量壓縮（quantization）時，另存一份 float16 或 int8 的壓縮向量並常駐記憶體，
+    暴力搜尋只掃描壓縮向量，再從 mmap 的原始向量讀取前 rescore 個候選重新計分；
+    原始向量留在磁碟上，只有被讀到的列會載入記憶體。
+
+    啟用降維（projection_params）時，在第一次 persist() 以 PCA 或隨機投影擬合一次並存成 projection.npz，
+    之後保存與搜尋的都是降維後的向量，新增的片段與查詢向量也會先投影。
+    """
+
+    def __init__(
+        self,
+        persist_directory: str = None,
+        embedding_function: Embeddings = None,
+        ann_params: Optional[Dict] = None,
+        quantization: Optional[str] = None,
+        rescore: int = DEFAULT_RESCORE,
+        projection_params: Optional[Dict] = None,
+    ):
+        """
+        Args:
+            persist_directory: 儲存目錄（None 表示只保存在記憶體中）
+            embedding_function: embedding 模型
+            ann_params: IVF-PQ 索引參數（IVFPQIndex 的 nlist / m / nprobe / rerank 等，
+                另可設定 min_size：片段數達到此值才建立索引）；None 表示一律暴力搜尋
+            quantization: 搜尋用的壓縮向量格式，"float16" 或 "int8"（None 表示直接搜尋原始向量）
+            rescore: 以原始向量重新計分的候選數（0 表示直接使用壓縮向量的分數）
+            projection_params: 降維參數（Projection.fit 的 method / dimension / recall_target 等，
+                另可設定 min_size：片段數達到此值才擬合）；None 表示不降維。
+                已擬合的投影會隨資料庫保存，之後開啟時不論此參數都會沿用
+        """
+        if quantization is not None and quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"不支援的向量壓縮格式：{quantization}（可用：{', '.join(QUANTIZATION_MODES)}）")
+        self.persist_directory = persist_directory
+        self._embedding_function = embedding_function
+        self.ann_params = dict(ann_params) if ann_params is not None else None
+        self.quantization = quantization
+        self.rescore = rescore
+        self.projection_params = dict(projection_params) if projection_params is not None else None
+        self._projection: Optional[Projection] = None
+        self._ann: Optional[IVFPQIndex] = None
+        self._lock = threading.RLock()
+        self._collection = _NumpyCollection(self)
+
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        # 分批加入時預留容量的緩衝區；_vectors / _codes / _scales 為其前段的 view
+        self._buffers: Dict[str, np.ndarray] = {}
+        self._mask_cache: Dict[str, np.ndarray] = {}
+
+        if persist_directory and self.exists(persist_directory):
+            self._load()
+
+    @staticmethod
+    def exists(persist_directory: str) -> bool:
+        """
+        檢查目錄中是否已有 NumPy 向量資料庫
+        """
+        return os.path.exists(os.path.join(persist_directory, VECTORS_FILE))
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+
+    def _load(self):
+        vectors = np.load(os.path.join(self.persist_directory, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(self.persist_directory, RECORDS_FILE), "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if len(records) != vectors.shape[0]:
+            raise ValueError(f"向量資料庫損毀：{len(records)} 筆記錄與 {vectors.shape[0]} 個向量數量不符")
+
+        self._vectors = vectors
+        self._ids = [record["id"] for record in records]
+        self._documents = [record["document"] for record in records]
+        self._metadatas = [record["metadata"] for record in records]
+        self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+
+        # 保存的向量已經降維，查詢也必須以同一個投影處理
+        projection_path = os.path.join(self.persist_directory, PROJECTION_FILE)
+        if os.path.exists(projection_path):
+            self._projection = Projection.load(projection_path)
+
+        if self.quantization is not None:
+            codes_path = os.path.join(self.persist_directory, QUANTIZED_FILE.format(mode=self.quantization))
+            scales_path = os.path.join(self.persist_directory, SCALES_FILE)
+            codes, scales = None, None
+            if os.path.exists(codes_path):
+                codes = np.load(codes_path)
+                if self.quantization == "int8":
+                    scales = np.load(scales_path) if os.path.exists(scales_path) else None
+            # 壓縮向量不存在或與原始向量數量不一致時重新壓縮（於下次 persist() 寫入）
+            if codes is None or codes.shape[0] != vectors.shape[0] or (self.quantization == "int8" and scales is None):
+                codes, scales = quantize_vectors(vectors, self.quantization)
+            self._codes, self._scales = codes, scales
+
+        ann_path = os.path.join(self.persist_directory, ANN_FILE)
+        if self.ann_params is not None and os.path.exists(ann_path):
+            ann = IVFPQIndex.load(ann_path)
+            # 索引與向量數量不一致（例如在未啟用 ANN 時修改過資料庫）時，於下次 persist() 重新訓練
+            if ann.ntotal == len(self._ids):
+                # 查詢時的參數以目前設定為準，不需重新建立索引
+                for key in ("nprobe", "rerank"):
+                    if key in self.ann_params:
+                        setattr(ann, key, self.ann_params[key])
+                self._ann = ann
+
+    def _new_ann_index(self) -> IVFPQIndex:
+        params = {key: value for key, value in self.ann_params.items() if key != "min_size"}
+        return IVFPQIndex(**params)
+
+    def _refresh_ann(self):
+        """
+        片段數達到門檻時訓練 ANN 索引；資料量成長到訓練時的兩倍以上則重新訓練，讓分群維持平衡
+        """
+        count = len(self._ids)
+        if count < self.ann_params.get("min_size", ANN_MIN_SIZE):
+            self._ann = None
+            return
+        if self._ann is None or self._ann.ntotal != count or count > 2 * self._ann.trained_size:
+            print(f"建立 ANN 索引（{count} 個向量）...")
+            self._ann = self._new_ann_index()
+            self._ann.train(self._vectors)
+
+    def _fit_projection(self):
+        """
+        片段數達到門檻且尚未降維時擬合投影，並將既有向量（與壓縮向量、ANN 索引）換成降維後的版本
+        """
+        params = {key: value for key, value in self.projection_params.items() if key != "min_size"}
+        count = len(self._ids)
+        if self._projection is not None or count < self.projection_params.get("min_size", PROJECTION_MIN_SIZE):
+            return
+        projection = Projection.fit(self._vectors, **params)
+        if not projection.is_fitted:
+            print(f"⚠️ 沒有任何候選維度達到召回率目標，維持 {self._vectors.shape[1]} 維")
+            return
+
+        print(f"降維：{projection.input_dimension} -> {projection.dimension} 維（估計 recall {projection.recall or 0:.3f}）")
+        self._projection = projection
+        self._vectors = np.concatenate([
+            projection.transform(self._vectors[start:start + 16384])
+            for start in range(0, count, 16384)
+        ])
+        if self.quantization is not None:
+            self._codes, self._scales = quantize_vectors(self._vectors, self.quantization)
+        # ANN 索引以原始維度訓練，需重新建立
+        self._ann = None
+
+    def persist(self):
+        """
+        將向量與記錄寫回磁碟（先寫入暫存檔再替換，避免寫到一半的檔案被讀取）
+
+        啟用降維與 ANN 時也在此擬合投影、訓練或更新索引（只保存在記憶體中的資料庫同樣適用）
+        """
+        with self._lock:
+            if self.projection_params is not None and len(self._ids):
+                self._fit_projection()
+            if self.ann_params is not None:
+                self._refresh_ann()
+            if not self.persist_directory:
+                return
+
+            os.makedirs(self.persist_directory, exist_ok=True)
+            records_path = os.path.join(self.persist_directory, RECORDS_FILE)
+            vectors_path = os.path.join(self.persist_directory, VECTORS_FILE)
+
+            with open(f"{records_path}.tmp", "w", encoding="utf-8") as f:
+                for chunk_id, document, metadata in zip(self._ids, self._documents, self._metadatas):
+                    f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False))
+                    f.write("\n")
+            with open(f"{vectors_path}.tmp", "wb") as f:
+                np.save(f, np.ascontiguousarray(self._vectors, dtype=np.float32))
+
+            os.replace(f"{records_path}.tmp", records_path)
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+
+            for mode in QUANTIZATION_MODES:
+                codes_path = os.path.join(self.persist_directory, QUANTIZED_FILE.format(mode=mode))
+                if mode == self.quantization:
+                    with open(f"{codes_path}.tmp", "wb") as f:
+                        np.save(f, self._codes)
+                    os.replace(f"{codes_path}.tmp", codes_path)
+                elif os.path.exists(codes_path):
+                    os.remove(codes_path)
+            scales_path = os.path.join(self.persist_directory, SCALES_FILE)
+            if self._scales is not None:
+                with open(f"{scales_path}.tmp", "wb") as f:
+                    np.save(f, self._scales)
+                os.replace(f"{scales_path}.tmp", scales_path)
+            elif os.path.exists(scales_path):
+                os.remove(scales_path)
+
+            projection_path = os.path.join(self.persist_directory, PROJECTION_FILE)
+            if self._projection is not None:
+                self._projection.save(f"{projection_path}.tmp")
+                os.replace(f"{projection_path}.tmp", projection_path)
+            elif os.path.exists(projection_path):
+                os.remove(projection_path)
+
+            ann_path = os.path.join(self.persist_directory, ANN_FILE)
+            if self._ann is not None:
+                self._ann.save(f"{ann_path}.tmp")
+                os.replace(f"{ann_path}.tmp", ann_path)
+            elif os.path.exists(ann_path):
+                os.remove(ann_path)
+
+    def _append(self, name: str, current: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        # mmap 開啟的矩陣為唯讀，第一次加入時才複製到記憶體的緩衝區
+        buffer = _append_rows(self._buffers.get(name), current, rows)
+        self._buffers[name] = buffer
+        return buffer[:current.shape[0] + rows.shape[0]]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs,
+    ) -> List[str]:
+        """
+        嵌入並加入文本；id 已存在時取代原本的片段
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self._embedding_function is None:
+            raise ValueError("未設定 embedding_function，無法嵌入文本")
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+
+        vectors = np.asarray(self._embedding_function.embed_documents(texts), dtype=np.float32)
+        self.add_vectors(ids, vectors, texts, metadatas)
+        return list(ids)
+
+    def add_vectors(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict]):
+        """
+        加入已嵌入的向量（不呼叫 embedding 模型）
+        """
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+        with self._lock:
+            vectors = self._project(vectors)
+            # 先移除重複的 id，使加入的行為等同 upsert
+            existing = [chunk_id for chunk_id in ids if chunk_id in self._row_by_id]
+            if existing:
+                self.delete(ids=existing)
+
+            current = self._vectors
+            if current.shape[0] == 0:
+                current = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+            elif current.shape[1] != vectors.shape[1]:
+                raise ValueError(f"向量維度不符：資料庫為 {current.shape[1]}，新增為 {vectors.shape[1]}")
+
+            self._vectors = self._append("vectors", current, vectors)
+            if self.quantization is not None:
+                codes, scales = quantize_vectors(vectors, self.quantization)
+                current_codes = self._codes if self._codes is not None else codes[:0]
+                self._codes = self._append("codes", current_codes, codes)
+                if scales is not None:
+                    current_scales = self._scales if self._scales is not None else scales[:0]
+                    self._scales = self._append("scales", current_scales, scales)
+            if self._ann is not None:
+                self._ann.add(vectors)
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._row_by_id[chunk_id] = len(self._ids)
+                self._ids.append(chunk_id)
+                self._documents.append(text)
+                self._metadatas.append(dict(metadata or {}))
+            self._mask_cache.clear()
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> Optional[bool]:
+        """
+        刪除指定 id 的片段
+        """
+        if not ids:
+            return False
+        with self._lock:
+            removed = {self._row_by_id[chunk_id] for chunk_id in ids if chunk_id in self._row_by_id}
+            if not removed:
+                return False
+            keep = [row for row in range(len(self._ids)) if row not in removed]
+            self._vectors = np.ascontiguousarray(self._vectors[keep], dtype=np.float32)
+            if self._codes is not None:
+                self._codes = self._codes[keep]
+                if self._scales is not None:
+                    self._scales = self._scales[keep]
+            self._buffers.clear()
+            self._ids = [self._ids[row] for row in keep]
+            self._documents = [self._documents[row] for row in keep]
+            self._metadatas = [self._metadatas[row] for row in keep]
+            self._row_by_id = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            if self._ann is not None:
+                self._ann.keep_rows(np.asarray(keep, dtype=np.int64))
+            self._mask_cache.clear()
+        return True
+
+    def _update(self, ids: List[str], metadatas: Optional[List[Dict]] = None, documents: Optional[List[str]] = None):
+        with self._lock:
+            for index, chunk_id in enumerate(ids):
+                row = self._row_by_id.get(chunk_id)
+                if row is None:
+                    continue
+                if metadatas is not None:
+                    self._metadatas[row] = dict(metadatas[index])
+                if documents is not None:
+                    self._documents[row] = documents[index]
+            self._mask_cache.clear()
+
+    def _filter_mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        """
+        取得符合篩選條件的列遮罩（同一條件會快取到下次修改資料庫為止）
+        """
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (_matches(metadata, where) for metadata in self._metadatas),
+                dtype=bool,
+                count=len(self._metadatas)
+            )
+            self._mask_cache[key] = mask
+        return mask
+
+    def _top_k(
+        self,
+        query_vector: np.ndarray,
+        k: int,
+        where: Optional[Dict],
+        nprobe: Optional[int] = None,
+        rerank: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        以一次矩陣-向量乘法加上 argpartition 取得前 k 個最相似的列
+
+        已建立 ANN 索引時改為近似搜尋；篩選後的候選不足 k 個時退回暴力搜尋。
+        啟用向量壓縮時，暴力搜尋以壓縮向量計分，再以原始向量重新計分前 rescore 個候選。
+
+        Args:
+            nprobe / rerank: 覆寫 ANN 索引這次查詢的掃描群數與重新計分候選數
+
+        Returns:
+            (列索引, 餘弦相似度) 列表，依相似度由高到低排序
+        """
+        with self._lock:
+            vectors = self._vectors
+            if vectors.shape[0] == 0 or k <= 0:
+                return []
+            mask = self._filter_mask(where)
+            if self._ann is not None:
+                rows, scores = self._ann.search(vectors, query_vector, k, nprobe=nprobe, rerank=rerank, mask=mask)
+                if rows.shape[0] >= k:
+                    return [(int(row), float(score)) for row, score in zip(rows, scores)]
+            if self._codes is not None:
+                return self._quantized_top_k(vectors, query_vector, k, mask)
+            scores = vectors @ query_vector
+
+        if mask is not None:
+            available = int(mask.sum())
+            scores = np.where(mask, scores, -np.inf)
+        else:
+            available = scores.shape[0]
+        k = min(k, available)
+        if k == 0:
+            return []
+
+        if k < scores.shape[0]:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(row), float(scores[row])) for row in candidates]
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        # 已降維的資料庫中，原始維度的片段或查詢向量需先投影
+        if self._projection is not None and vectors.shape[-1] == self._projection.input_dimension:
+            return self._projection.transform(vectors)
+        return vectors
+
+    def _quantized_top_k(
+        self, vectors: np.ndarray, query_vector: np.ndarray, k: int, mask: Optional[np.ndarray]
+    ) -> List[Tuple[int, float]]:
+        scores = _quantized_scores(self._codes, self._scales, query_vector)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            available = int(mask.sum())
+        else:
+            available = scores.shape[0]
+        keep = min(max(self.rescore, k), available)
+        if keep == 0:
+            return []
+
+        candidates = np.argpartition(-scores, keep - 1)[:keep] if keep < scores.shape[0] else np.flatnonzero(scores > -np.inf)
+        if self.rescore:
+            # mmap 以遞增順序讀取較快
+            candidates = np.sort(candidates)
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ query_vector
+        else:
+            scores = scores[candidates]
+
+        k = min(k, candidates.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k] if k < candidates.shape[0] else np.arange(candidates.shape[0])
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(candidates[index]), float(scores[index])) for index in top]
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        搜尋時常駐記憶體的向量位元組數
+
+        Returns:
+            {"vectors": 原始向量（以 mmap 開啟且已壓縮時不計入，只有重新計分的列會被讀取）,
+             "quantized": 壓縮向量與縮放係數}
+        """
+        quantized = 0
+        if self._codes is not None:
+            quantized = self._allocated("codes", self._codes)
+            quantized += self._allocated("scales", self._scales) if self._scales is not None else 0
+        on_disk = isinstance(self._vectors, np.memmap) and self._codes is not None
+        return {"vectors": 0 if on_disk else self._allocated("vectors", self._vectors), "quantized": int(quantized)}
+
+    def _allocated(self, name: str, array: np.ndarray) -> int:
+        # 分批加入時包含緩衝區預留的容量
+        buffer = self._buffers.get(name)
+        return int(buffer.nbytes if buffer is not None and array.base is buffer else array.nbytes)
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        if self._embedding_function is None:
+            raise ValueError("未設定 embedding_function，無法嵌入查詢")
+        vector = np.asarray(self._embedding_function.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _to_document(self, row: int) -> Document:
+        return Document(page_content=self._documents[row], metadata=dict(self._metadatas[row]))
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        vector = self._project(vector)
+        top_k = self._top_k(vector, k, filter, nprobe=kwargs.get("nprobe"), rerank=kwargs.get("rerank"))
+        return [(self._to_document(row), 2.0 - 2.0 * similarity) for row, similarity in top_k]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        """
+        搜尋最相似的片段
+
+        Returns:
+            (片段, l2 距離) 列表，距離越小越相似（與 Chroma 相同）
+        """
+        return self.similarity_search_by_vector_with_score(self._embed_query(query), k=k, filter=filter, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self._euclidean_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        persist_directory: str = None,
+        **kwargs,
+    ) -> "NumpyVectorStore":
+        store = cls(
+            persist_directory=persist_directory,
+            embedding_function=embedding,
+            ann_params=kwargs.get("ann_params"),
+            quantization=kwargs.get("quantization"),
+            rescore=kwargs.get("rescore", DEFAULT_RESCORE),
+            projection_params=kwargs.get("projection_params"),
+        )
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
@@ -0,0 +1,158 @@
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+PROJECTION_FILE = "projection.npz"
+PROJECTION_METHODS = ("pca", "random")
+
+# 自動選擇維度時嘗試的候選（皆可被 32 整除，方便搭配 IVF-PQ 的子空間數）
+CANDIDATE_DIMENSIONS = (64, 96, 128, 192, 256, 384, 512)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k_sets(base: np.ndarray, queries: np.ndarray, query_rows: np.ndarray, k: int) -> List[set]:
+    # 以語料中的向量當作查詢，排除查詢本身
+    scores = queries @ base.T
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top]
+
+
+class Projection:
+    """
+    向量降維：PCA（不置中，保留內積最主要的方向）或隨機正交投影
+
+    每個語料建立索引時擬合一次並與索引一起保存；片段向量與查詢向量都投影到同一個子空間後重新正規化。
+    維度可直接指定，或依召回率目標自動選擇：以語料中的片段向量當作查詢，
+    比較降維前後的前 k 名，取達到目標的最小候選維度。
+    """
+
+    def __init__(self, method: str = "pca", components: Optional[np.ndarray] = None, recall: Optional[float] = None):
+        """
+        Args:
+            method: "pca" 或 "random"
+            components: 投影矩陣 (原始維度, 目標維度)
+            recall: 擬合時估計的 recall@k（僅供記錄）
+        """
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"不支援的降維方式：{method}（可用：{', '.join(PROJECTION_METHODS)}）")
+        self.method = method
+        self.components = components
+        self.recall = recall
+
+    @property
+    def input_dimension(self) -> int:
+        return int(self.components.shape[0])
+
+    @property
+    def dimension(self) -> int:
+        return int(self.components.shape[1])
+
+    @staticmethod
+    def _basis(vectors: np.ndarray, method: str, max_dimension: int, seed: int) -> np.ndarray:
+        """
+        依重要性排序的正交基底 (d, max_dimension)；取前 r 行即為 r 維投影
+        """
+        dimension = vectors.shape[1]
+        if method == "pca":
+            # d x d 的二次動差矩陣，樣本數很多時也只需分段累加
+            moment = np.zeros((dimension, dimension), dtype=np.float64)
+            for start in range(0, vectors.shape[0], 16384):
+                block = np.asarray(vectors[start:start + 16384], dtype=np.float64)
+                moment += block.T @ block
+            eigenvalues, eigenvectors = np.linalg.eigh(moment)
+            order = np.argsort(eigenvalues)[::-1][:max_dimension]
+            return eigenvectors[:, order].astype(np.float32)
+        rng = np.random.default_rng(seed)
+        basis, _ = np.linalg.qr(rng.standard_normal((dimension, max_dimension)))
+        return basis.astype(np.float32)
+
+    @classmethod
+    def fit(
+        cls,
+        vectors: np.ndarray,
+        method: str = "pca",
+        dimension: Optional[int] = None,
+        recall_target: float = 0.95,
+        k: int = 10,
+        candidates: Sequence[int] = CANDIDATE_DIMENSIONS,
+        sample_queries: int = 200,
+        sample_size: int = 20000,
+        seed: int = 0,
+    ) -> "Projection":
+        """
+        擬合投影
+
+        Args:
+            vectors: 正規化的 float32 片段向量 (n, d)
+            method: "pca" 或 "random"
+            dimension: 目標維度（None 表示依 recall_target 自動選擇）
+            recall_target: 自動選擇維度時要達到的 recall@k；都達不到時不降維
+            k: 評估召回率的前 k 名
+            candidates: 自動選擇時嘗試的維度（由小到大）
+            sample_queries: 評估召回率的查詢數
+            sample_size: 評估召回率時取樣的片段數
+            seed: 亂數種子
+
+        Returns:
+            Projection；自動選擇時若沒有任何候選維度達到目標（或都不小於原始維度），components 為 None
+        """
+        if method not in PROJECTION_METHODS:
+            raise ValueError(f"不支援的降維方式：{method}（可用：{', '.join(PROJECTION_METHODS)}）")
+        count, input_dimension = vectors.shape
+        if dimension is not None:
+            if not 0 < dimension < input_dimension:
+                raise ValueError(f"目標維度必須介於 1 與 {input_dimension - 1} 之間：{dimension}")
+            return cls(method, cls._basis(vectors, method, dimension, seed))
+
+        candidates = sorted(d for d in candidates if d < input_dimension)
+        if not candidates or count <= k:
+            return cls(method)
+        basis = cls._basis(vectors, method, candidates[-1], seed)
+
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(count, size=min(count, sample_size), replace=False))
+        sample = np.asarray(vectors[rows], dtype=np.float32)
+        query_rows = rng.choice(sample.shape[0], size=min(sample_queries, sample.shape[0]), replace=False)
+        truth = _top_k_sets(sample, sample[query_rows], query_rows, k)
+
+        for candidate in candidates:
+            projected = _normalize_rows(sample @ basis[:, :candidate])
+            found = _top_k_sets(projected, projected[query_rows], query_rows, k)
+            recall = float(np.mean([len(a & b) / k for a, b in zip(found, truth)]))
+            if recall >= recall_target:
+                return cls(method, np.ascontiguousarray(basis[:, :candidate]), recall)
+        return cls(method)
+
+    @property
+    def is_fitted(self) -> bool:
+        return self.components is not None
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        投影並重新正規化（可傳入單一向量或矩陣）
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            return self.transform(vectors[None, :])[0]
+        if vectors.shape[1] != self.input_dimension:
+            raise ValueError(f"向量維度不符：投影需要 {self.input_dimension} 維，輸入為 {vectors.shape[1]} 維")
+        return _normalize_rows(vectors @ self.components)
+
+    def params(self) -> Dict:
+        return {"method": self.method, "recall": self.recall}
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, components=self.components, params=np.array(json.dumps(self.params())))
+
+    @classmethod
+    def load(cls, path: str) -> "Projection":
+        with np.load(path) as data:
+            return cls(components=data["components"], **json.loads(str(data["params"])))
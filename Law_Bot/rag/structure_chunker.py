@@ -0,0 +1,117 @@
+import re
+from typing import Iterable, List
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# 編號子項目的開頭：1. / 1、 / (一) / （一） / 一、
+SUBPOINT_PATTERN = re.compile(
+    r'^[ \t]*(?:\d+[\.、](?!\d)|[（(][一二三四五六七八九十]+[)）]|[一二三四五六七八九十]+、)',
+    re.MULTILINE
+)
+
+_CJK_PATTERN = re.compile(r'[㐀-鿿豈-﫿　-〿＀-￯]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗估文本的 token 數：中日韓字元與全形標點各算 1 個，其餘字元約 4 個算 1 個
+    """
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+class StructureAwareChunker:
+    """
+    依考題結構分割文件的分割器
+
+    _extract_sections 已將每題拆成案例事實、答題架構、爭點記憶等章節；
+    章節在 token 預算內就保持完整，超過時只在編號子項目（1. 2.、(一)(二)、一、）處切開，
+    並將相鄰子項目合併到接近預算。每個片段開頭都會加上「題目標題｜章節名稱」，
+    讓 embedding 與檢索結果都保有上下文。
+
+    單一子項目仍超過預算時，才退回以句讀分割（不重疊）。
+    """
+
+    def __init__(self, max_tokens: int = 1000, include_header: bool = True):
+        """
+        Args:
+            max_tokens: 每個片段的 token 預算（不含標題列）
+            include_header: 是否在每個片段開頭加上題目標題與章節名稱
+        """
+        self.max_tokens = max_tokens
+        self.include_header = include_header
+        # 單一子項目超過預算時使用，以同樣的 token 估計作為長度
+        self._fallback_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=max_tokens,
+            chunk_overlap=0,
+            length_function=estimate_tokens,
+            separators=["\n\n", "\n", "。", "；", "，", " ", ""]
+        )
+
+    def _split_subpoints(self, text: str) -> List[str]:
+        """
+        在編號子項目的開頭切開文本
+        """
+        starts = [match.start() for match in SUBPOINT_PATTERN.finditer(text)]
+        if not starts or starts[0] != 0:
+            starts = [0] + starts
+        return [
+            text[start:end]
+            for start, end in zip(starts, starts[1:] + [len(text)])
+            if text[start:end].strip()
+        ]
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        分割單一章節的文本
+
+        Returns:
+            不超過 token 預算的片段列表
+        """
+        text = text.strip()
+        if not text:
+            return []
+        if estimate_tokens(text) <= self.max_tokens:
+            return [text]
+
+        pieces = []
+        current = ""
+        for subpoint in self._split_subpoints(text):
+            if estimate_tokens(subpoint) > self.max_tokens:
+                if current.strip():
+                    pieces.append(current.strip())
+                current = ""
+                pieces.extend(self._fallback_splitter.split_text(subpoint))
+                continue
+            if current and estimate_tokens(current + subpoint) > self.max_tokens:
+                pieces.append(current.strip())
+                current = ""
+            current += subpoint
+        if current.strip():
+            pieces.append(current.strip())
+        return pieces
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """
+        分割文件（與 RecursiveCharacterTextSplitter.split_documents 相同的介面）
+
+        Returns:
+            分割後的片段；metadata 另含 chunk_index / chunk_count，
+            以及標題列的長度 content_offset（去重時只比對本文）
+        """
+        chunks = []
+        for doc in documents:
+            pieces = self.split_text(doc.page_content)
+            header = ""
+            if self.include_header:
+                header = f"{doc.metadata.get('title', '')}｜{doc.metadata.get('section', '')}\n"
+            for index, piece in enumerate(pieces):
+                metadata = dict(doc.metadata)
+                metadata.update(
+                    chunk_index=index,
+                    chunk_count=len(pieces),
+                    content_offset=len(header),
+                )
+                chunks.append(Document(page_content=header + piece, metadata=metadata))
+        return chunks
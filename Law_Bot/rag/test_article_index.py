@@ -0,0 +1,19 @@
+from article_index import ArticleIndex, ArticleRef, parse_article_references
+
+
+def test_chinese_and_arabic_numerals():
+    assert parse_article_references("刑法第三百二十條第1項及第185條之3") == [
+        ArticleRef("刑法", "320", 1, 0),
+        ArticleRef("", "185-3", 0, 0),
+    ]
+
+
+def test_mixed_numerals_are_skipped():
+    # 阿拉伯數字與中文數字混用時無法判斷數值，略過該引用而不是拋出例外
+    assert parse_article_references("第1十條") == []
+    assert parse_article_references("第1十條與第320條第一項") == [ArticleRef("", "320", 1, 0)]
+    assert parse_article_references("第320條第1十項") == []
+
+    index = ArticleIndex()
+    index.add("a", "依刑法第1十條及第320條論處")
+    assert index.lookup(parse_article_references("第320條")) == ["a"]
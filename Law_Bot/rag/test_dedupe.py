@@ -0,0 +1,57 @@
+from langchain.schema import Document
+
+from article_index import ArticleIndex, ArticleRef, parse_article_references
+from dedupe import MinHashDeduplicator, deduplicate_chunks
+
+PASSAGE = (
+    "甲趁乙不備，以強暴脅迫之方式壓制乙之意思自由，使乙不能抗拒而交付其所有之財物，"
+    "甲取得財物後隨即逃離現場。題示情形中，甲之行為是否該當強盜罪之構成要件，應先檢討其手段是否達到使人不能抗拒之程度，"
+    "再檢討其是否具有不法所有意圖，最後檢討是否另成立其他犯罪以及罪數關係。"
+    "依實務見解，強暴脅迫之程度應依一般人之客觀標準判斷，並兼顧被害人之主觀狀態，"
+    "本題乙為年邁之人，甲持刀抵住其頸部，客觀上足以壓制其抗拒，故甲應論以刑法{article}之罪。"
+)
+
+
+def _chunk(chunk_id: str, text: str) -> Document:
+    return Document(page_content=text, metadata={"content_hash": chunk_id, "title": chunk_id})
+
+
+def test_passages_citing_different_articles_are_not_merged():
+    first, second = PASSAGE.format(article="第328條"), PASSAGE.format(article="第330條")
+
+    # 只差在引用的法條，MinHash 估計的相似度仍高於 0.9
+    deduplicator = MinHashDeduplicator(threshold=0.9)
+    assert deduplicator.add("a", first) is None
+    assert deduplicator.find_duplicate(second) == "a"
+
+    aliases, stats = {}, {}
+    chunks = list(deduplicate_chunks(
+        [_chunk("a", first), _chunk("b", second)],
+        MinHashDeduplicator(threshold=0.9),
+        aliases,
+        stats,
+    ))
+    assert [doc.metadata["content_hash"] for doc in chunks] == ["a", "b"]
+    assert aliases == {}
+    assert stats["near_duplicates"] == 0
+
+
+def test_alias_article_references_point_to_canonical_chunk():
+    body = PASSAGE.format(article="第328條")
+    # 結構化分割器的標題列不參與比對；別名的標題引用了代表片段沒有的法條
+    title = "參照刑法第330條\n"
+    alias = _chunk("b", title + body)
+    alias.metadata["content_offset"] = len(title)
+
+    aliases, stats = {}, {}
+    chunks = list(deduplicate_chunks([_chunk("a", body), alias], MinHashDeduplicator(), aliases, stats))
+    assert [doc.metadata["content_hash"] for doc in chunks] == ["a"]
+    assert [entry["content_hash"] for entry in aliases["a"]] == ["b"]
+
+    index = ArticleIndex()
+    index.add("a", body)
+    assert index.lookup(parse_article_references("刑法第330條")) == []
+    for entry in aliases["a"]:
+        index.add_references("a", [ArticleRef(*ref) for ref in entry["article_refs"]])
+    assert index.lookup(parse_article_references("刑法第330條")) == ["a"]
+    assert index.lookup(parse_article_references("刑法第328條")) == ["a"]
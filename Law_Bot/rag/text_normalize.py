@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+# 兩側任一邊是非 ASCII 字元（中文、全形符號）的空白
+_CJK_SPACE = re.compile(r"(?<=[^\x00-\x7f]) | (?=[^\x00-\x7f])")
+
+
+def normalize_for_embedding(text: str) -> str:
+    """
+    正規化要嵌入的文本（用於 embedding 快取的鍵值）
+
+    只做不影響語意的處理：Unicode NFC 正規化、統一換行符號、去除首尾空白。
+    """
+    text = unicodedata.normalize("NFC", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text.strip()
+
+
+def normalize_query(text: str) -> str:
+    """
+    正規化使用者查詢（用於查詢 embedding 快取的鍵值，也是實際送去嵌入的文本）
+
+    比 normalize_for_embedding 更積極：全形轉半形（NFKC）、「臺」統一為「台」、
+    連續空白合併為一個、去除中文字旁的空白，以及句尾的問號、句號等標點。
+    """
+    text = unicodedata.normalize("NFKC", text).replace("臺", "台")
+    text = " ".join(text.split())
+    return _CJK_SPACE.sub("", text).rstrip("?!.。 ")
@@ -0,0 +1,393 @@
+"""
+法律機器人 HTTP 服務
+
+同一個程序內共用一組已開啟的索引、embedding 快取與 LLM 用戶端，以有上限的執行緒池處理請求：
+工作執行緒都在忙時請求會排隊，佇列也滿了就立即返回 429；收到 SIGINT / SIGTERM 後不再接受新請求，
+等排隊中與執行中的請求完成後才結束。Streamlit 頁面可改用 LawBotClient 當作輕量用戶端。
+
+端點（POST 的內容皆為 JSON）：
+- GET  /health：服務狀態與快取統計
+- POST /route：{"query"} 主題分類
+- POST /search：{"query", "topic"?, "k"?} 只檢索相關片段
+- POST /query：{"query", "use_cache"?} 完整問答
+- POST /correct：{"student_answer", "example"?} 申論題批改（未提供擬答時使用預設題目）
+
+執行方式：
+    cd Law_Bot
+    python service.py --port 8000 --workers 4 --queue-size 16
+"""
+import os
+import sys
+import json
+import signal
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+import dspy
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "exam_corrector"))
+
+import corrector
+from agent import LawBotAgent
+from test_topic_module import TOPIC_LM, route_topic
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceBusy(Exception):
+    """工作執行緒與等待佇列都已滿"""
+
+
+class ServiceClosed(Exception):
+    """服務正在關閉，不再接受新請求"""
+
+
+class InvalidRequest(Exception):
+    """請求內容不正確（返回 400）"""
+
+
+def _document_to_dict(doc) -> Dict:
+    return {"page_content": doc.page_content, "metadata": doc.metadata}
+
+
+def _result_to_dict(result: Dict) -> Dict:
+    """
+    將 process_query / search 的結果轉成可序列化的 JSON
+    """
+    payload = dict(result)
+    for key in ("retrieved_docs", "source_documents"):
+        payload[key] = [_document_to_dict(doc) for doc in result.get(key) or []]
+    return payload
+
+
+class LawBotService:
+    """
+    共用同一個 LawBotAgent 的請求處理器：最多 workers 個請求同時執行，另外最多 queue_size 個請求排隊
+    """
+
+    def __init__(self, agent: LawBotAgent, workers: int = 4, queue_size: int = 16):
+        """
+        Args:
+            agent: 共用的 LawBotAgent
+            workers: 同時處理的請求數
+            queue_size: 等待中的請求數上限（超過時返回 429）
+        """
+        if workers < 1:
+            raise ValueError("workers 必須大於 0")
+        if queue_size < 0:
+            raise ValueError("queue_size 不可小於 0")
+        self.agent = agent
+        self.workers = workers
+        self.queue_size = queue_size
+        self.rejected = 0
+        self.completed = 0
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lawbot-service")
+        self._in_flight = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, function: Callable, *args, lm=None):
+        """
+        將請求交給執行緒池並等待結果
+
+        Args:
+            function: 要執行的函式
+            lm: 執行期間使用的 dspy 模型（None 表示使用全域設定）
+
+        Raises:
+            ServiceBusy: 執行中與排隊中的請求已達上限
+            ServiceClosed: 服務正在關閉
+        """
+        if self._closed:
+            raise ServiceClosed()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ServiceBusy()
+
+        def run():
+            if lm is None:
+                return function(*args)
+            with dspy.context(lm=lm):
+                return function(*args)
+
+        def release(_):
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+            self._slots.release()
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(run)
+        except RuntimeError:
+            # 執行緒池已關閉
+            release(None)
+            raise ServiceClosed()
+        future.add_done_callback(release)
+        return future.result()
+
+    def route(self, body: Dict) -> Dict:
+        return self.submit(route_topic, _required(body, "query"), lm=TOPIC_LM)
+
+    def search(self, body: Dict) -> Dict:
+        result = self.submit(
+            self.agent.search,
+            _required(body, "query"),
+            _optional_string(body, "topic"),
+            _optional_positive_int(body, "k"),
+            lm=TOPIC_LM
+        )
+        return _result_to_dict(result)
+
+    def query(self, body: Dict) -> Dict:
+        result = self.submit(
+            lambda query, use_cache: self.agent.process_query(query, verbose=False, use_cache=use_cache),
+            _required(body, "query"),
+            bool(body.get("use_cache", True)),
+            lm=TOPIC_LM
+        )
+        return _result_to_dict(result)
+
+    def correct(self, body: Dict) -> Dict:
+        correction, reasoning = self.submit(
+            corrector.correct_question,
+            _required(body, "student_answer"),
+            _optional_string(body, "example") or corrector.example,
+            lm=corrector.CORRECTOR_LM
+        )
+        return {"correction": correction, "reasoning": reasoning}
+
+    def health(self) -> Dict:
+        stats = {
+            "status": "closing" if self._closed else "ok",
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "corpus_registry": self.agent.corpus_registry.stats(),
+        }
+        if self.agent.answer_cache:
+            stats["answer_cache"] = self.agent.answer_cache.stats()
+        if self.agent.rag_pipeline.query_cache:
+            stats["query_cache"] = self.agent.rag_pipeline.query_cache.stats()
+        return stats
+
+    def close(self):
+        """
+        不再接受新請求，等待排隊中與執行中的請求完成
+        """
+        self._closed = True
+        self._executor.shutdown(wait=True)
+
+
+def _parse_body(raw: bytes) -> Dict:
+    try:
+        body = json.loads(raw or b"{}")
+    except ValueError:
+        raise InvalidRequest("請求內容不是有效的 JSON")
+    if not isinstance(body, dict):
+        raise InvalidRequest("請求內容必須是 JSON 物件")
+    return body
+
+
+def _required(body: Dict, field: str) -> str:
+    value = body.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise InvalidRequest(f"缺少欄位：{field}")
+    return value.strip()
+
+
+def _optional_string(body: Dict, field: str) -> Optional[str]:
+    value = body.get(field)
+    if value is not None and not isinstance(value, str):
+        raise InvalidRequest(f"欄位 {field} 必須是字串")
+    return value or None
+
+
+def _optional_positive_int(body: Dict, field: str) -> Optional[int]:
+    value = body.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise InvalidRequest(f"欄位 {field} 必須是正整數")
+    return value
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> LawBotService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # 無法得知請求內容的長度，回應後關閉連線
+            self.close_connection = True
+            raise InvalidRequest("Content-Length 必須是非負整數")
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": f"找不到路徑：{self.path}"})
+
+    def do_POST(self):
+        endpoints = {
+            "/route": self.service.route,
+            "/search": self.service.search,
+            "/query": self.service.query,
+            "/correct": self.service.correct,
+        }
+        endpoint = endpoints.get(self.path)
+        try:
+            raw = self._read_body()
+            if endpoint is None:
+                self._send_json(404, {"error": f"找不到路徑：{self.path}"})
+                return
+            self._send_json(200, endpoint(_parse_body(raw)))
+        except ServiceBusy:
+            self._send_json(429, {"error": "服務忙碌中，請稍後再試"}, {"Retry-After": "1"})
+        except ServiceClosed:
+            self._send_json(503, {"error": "服務正在關閉"})
+        except InvalidRequest as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"處理請求時發生錯誤: {e}")
+            self._send_json(500, {"error": str(e)})
+
+
+class _Server(ThreadingHTTPServer):
+    # 關閉時等待所有連線送出回應
+    daemon_threads = False
+
+    def __init__(self, address, service: LawBotService):
+        super().__init__(address, _RequestHandler)
+        self.service = service
+
+
+class LawBotServer:
+    """
+    HTTP 伺服器與 LawBotService 的組合，負責優雅關閉
+    """
+
+    def __init__(self, service: LawBotService, host: str = "127.0.0.1", port: int = 8000):
+        self.service = service
+        self.httpd = _Server((host, port), service)
+
+    @property
+    def address(self):
+        return self.httpd.server_address
+
+    def serve_forever(self, handle_signals: bool = True):
+        """
+        開始服務直到 shutdown() 或收到 SIGINT / SIGTERM
+        """
+        if handle_signals:
+            # httpd.shutdown() 會等待 serve_forever 結束，不能在同一個執行緒中呼叫
+            def request_shutdown(signum, frame):
+                threading.Thread(target=self.shutdown, daemon=True).start()
+            signal.signal(signal.SIGINT, request_shutdown)
+            signal.signal(signal.SIGTERM, request_shutdown)
+        try:
+            self.httpd.serve_forever()
+        finally:
+            # 等待處理中的連線送出回應
+            self.httpd.server_close()
+
+    def shutdown(self):
+        """
+        停止接受新連線與新請求，等待排隊中與執行中的請求完成
+        """
+        print("🛑 正在關閉服務，等待處理中的請求完成...")
+        self.httpd.shutdown()
+        self.service.close()
+
+
+class LawBotClient:
+    """
+    LawBotServer 的輕量用戶端（只使用標準函式庫）
+    """
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8000", timeout: float = 300):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path: str, body: Optional[Dict] = None) -> Dict:
+        data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            headers={"Content-Type": "application/json; charset=utf-8"},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"HTTP {e.code}: {detail}") from e
+
+    def health(self) -> Dict:
+        return self._request("/health")
+
+    def route(self, query: str) -> Dict:
+        return self._request("/route", {"query": query})
+
+    def search(self, query: str, topic: Optional[str] = None, k: Optional[int] = None) -> Dict:
+        return self._request("/search", {"query": query, "topic": topic, "k": k})
+
+    def query(self, query: str, use_cache: bool = True) -> Dict:
+        return self._request("/query", {"query": query, "use_cache": use_cache})
+
+    def correct(self, student_answer: str, example: Optional[str] = None) -> Dict:
+        return self._request("/correct", {"student_answer": student_answer, "example": example})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="法律機器人 HTTP 服務")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="同時處理的請求數")
+    parser.add_argument("--queue-size", type=int, default=16, help="等待中的請求數上限（超過時返回 429）")
+    parser.add_argument("--index-mode", choices=["per_file", "unified"], default="per_file")
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="chroma")
+    args = parser.parse_args()
+
+    agent = LawBotAgent(index_mode=args.index_mode, vector_backend=args.vector_backend)
+    server = LawBotServer(LawBotService(agent, workers=args.workers, queue_size=args.queue_size), args.host, args.port)
+    host, port = server.address[:2]
+    print(f"⚖️ 法律機器人服務已啟動：http://{host}:{port}（{args.workers} 個工作執行緒，佇列上限 {args.queue_size}）")
+    server.serve_forever()
+    print("👋 服務已關閉")
+
+
+if __name__ == "__main__":
+    main()
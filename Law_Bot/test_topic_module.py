@@ -2,7 +2,12 @@ import dspy
 from dotenv import find_dotenv, load_dotenv
 from rich import print
 
+from topic_router import RoutingCache, TopicRouter, log_routed_query, routing_config_hash
+from rag.text_normalize import normalize_query
+
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 logger = logging.getLogger(__name__)
 
 load_dotenv(find_dotenv())
@@ -44,6 +49,9 @@ def configure_dspy():
             
 configure_dspy()
 
+# 主題分類使用的模型（與其他模組共用同一程序時，以 dspy.context(lm=TOPIC_LM) 指定）
+TOPIC_LM = dspy.settings.lm
+
 
 topic_metadata = {
     '侵害生命法益之犯罪': '包含殺人罪章（普通殺人罪、殺直系血親尊親屬罪、義憤殺人罪、生母殺嬰罪、加工自殺罪）、遺棄罪章（單純遺棄罪、違背義務之遺棄罪）、墮胎罪章（自行或聽從墮胎罪、加工墮胎罪、圖利加工墮胎罪、未受囑託或未得承諾之墮胎罪、公然介紹墮胎罪）',
@@ -150,41 +158,190 @@ def get_topic_demos():
     ]
     return demos
 
-def choose_topic(user_query):
+# 本地路由的信心達到此門檻時直接採用，否則呼叫 LLM
+ROUTER_CONFIDENCE_THRESHOLD = 0.7
+
+# 分類結果快取的容量與存活時間
+ROUTING_CACHE_SIZE = 1024
+ROUTING_CACHE_TTL = 24 * 3600
+
+# choose_topics() 預設的並行數
+DEFAULT_TOPIC_WORKERS = 4
+
+_topic_router = None
+_topic_predictor = None
+_routing_cache = RoutingCache(ROUTING_CACHE_SIZE, ROUTING_CACHE_TTL)
+_init_lock = threading.Lock()
+
+
+def get_topic_router():
+    """
+    取得本地主題路由器（第一次呼叫時以 topic_metadata、示範範例與查詢記錄建立）
+    """
+    global _topic_router
+    with _init_lock:
+        if _topic_router is None:
+            _topic_router = TopicRouter.from_metadata(topic_metadata, get_topic_demos())
+    return _topic_router
+
+
+def get_topic_predictor():
+    """
+    取得主題分類的 ChainOfThought（每個程序只建立一次，示範範例也只產生一次）
+    """
+    global _topic_predictor
+    with _init_lock:
+        if _topic_predictor is None:
+            _topic_predictor = dspy.ChainOfThought(ChooseTopic, demos=get_topic_demos())
+    return _topic_predictor
+
+
+def get_routing_cache():
+    return _routing_cache
+
+
+def _routing_config_hash():
+    return routing_config_hash(globals().get('DSPY_MODEL', ''), topic_metadata)
+
+
+def route_topic(user_query, use_router=True, use_cache=True):
+    """
+    先查詢分類結果快取，再以本地路由器分類，信心不足時才呼叫 LLM；LLM 的結果會記錄下來並加入路由器
+    
+    Args:
+        user_query (str): 使用者的刑法問題或案例描述
+        use_router (bool): 是否先嘗試本地路由（False 表示一律呼叫 LLM）
+        use_cache (bool): 是否使用分類結果快取
+        
+    Returns:
+        dict: topic（主題）、confidence（本地路由的信心，LLM 分類時為 None）、
+              reasoning（推理過程）、source（'router' 或 'llm'）、cached（是否來自快取）
+    """
+    config_hash = _routing_config_hash()
+    if use_cache:
+        cached = _routing_cache.get(config_hash, user_query)
+        if cached is not None:
+            cached['cached'] = True
+            return cached
+    
+    routed = None
+    router = get_topic_router() if use_router else None
+    if router is not None:
+        topic, confidence, reasoning = router.route(user_query)
+        if topic is not None and confidence >= ROUTER_CONFIDENCE_THRESHOLD:
+            routed = {'topic': topic, 'confidence': confidence, 'reasoning': reasoning, 'source': 'router'}
+    
+    if routed is None:
+        output = get_topic_predictor()(user_query=user_query, rag_topic_metadata=topic_metadata)
+        result = output.chosen_topic
+        reasoning = output.reasoning if hasattr(output, 'reasoning') else "無法提供推理過程"
+        
+        # 只記錄可由本地路由回答的主題，避免格式不符的輸出污染範例；路由器不接受（重複或已達上限）的查詢不再記錄
+        if router is not None and result in router.allowed_topics and router.add_example(result, user_query):
+            try:
+                log_routed_query(user_query, result)
+            except OSError as e:
+                logger.warning(f"無法寫入主題分類記錄: {e}")
+        routed = {'topic': result, 'confidence': None, 'reasoning': reasoning, 'source': 'llm'}
+    
+    if use_cache:
+        _routing_cache.put(config_hash, user_query, routed)
+    routed['cached'] = False
+    return routed
+
+
+def choose_topic(user_query, use_router=True):
     """
     選擇適當的台灣刑法分則犯罪類型，後續會用來選擇對應的 RAG database。
     
     Args:
         user_query (str): 使用者的刑法問題或案例描述
+        use_router (bool): 是否先嘗試本地路由（信心不足時仍會呼叫 LLM）
+        
+    Returns:
+        tuple: (選擇的犯罪類型主題名稱, 推理過程)
+    """
+    routed = route_topic(user_query, use_router=use_router)
+    return routed['topic'], routed['reasoning']
+
+
+def choose_topics(queries, workers=DEFAULT_TOPIC_WORKERS, use_router=True):
+    """
+    批次分類多個問題（並行呼叫 LLM；正規化後相同的問題只分類一次）
+    
+    Args:
+        queries (list): 使用者問題列表
+        workers (int): 並行數
+        use_router (bool): 是否先嘗試本地路由
         
     Returns:
-        str: 選擇的犯罪類型主題名稱
+        list: 與 queries 順序相同的 (主題名稱, 推理過程)
     """
-    choose_topic_agent = dspy.ChainOfThought(ChooseTopic, demos=get_topic_demos())
-    output = choose_topic_agent(user_query=user_query, rag_topic_metadata=topic_metadata)
-    result = output.chosen_topic
-    reasoning = output.reasoning if hasattr(output, 'reasoning') else "無法提供推理過程"
+    if workers < 1:
+        raise ValueError("workers 必須大於 0")
     
-    return result, reasoning
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query(query), query)
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = dict(zip(unique, executor.map(lambda query: choose_topic(query, use_router), unique.values())))
+    return [results[normalize_query(query)] for query in queries]
 
 
-if __name__ == "__main__":
-    # 測試選擇主題功能
-    # test_query = "某人故意殺害他人，應該如何論處？"
-    # test_query = "某人故意殺害三個月的胚胎，應該如何論處？"
-    test_queries = [
-        "某人故意殺害他人，應該如何論處？",
-        "某人故意殺害三個月的胚胎，應該如何論處？",
-        "某人甩別人一巴掌，造成對方臉部受傷，應該如何論處？",
-        "甲男偷摸乙女的屁股",
-        "把辦公室的衛生紙拿回家使用",
+def evaluate_topics(labelled, workers=DEFAULT_TOPIC_WORKERS, use_router=True):
+    """
+    批次評估主題分類的準確率
+    
+    Args:
+        labelled (list): [{'query': 問題, 'topic': 正確主題}, ...]
+        workers (int): 並行數
+        use_router (bool): 是否先嘗試本地路由
+        
+    Returns:
+        dict: accuracy（準確率）與 errors（分類錯誤的問題、正確與預測主題）
+    """
+    predictions = choose_topics([item['query'] for item in labelled], workers=workers, use_router=use_router)
+    errors = [
+        {'query': item['query'], 'expected': item['topic'], 'predicted': predicted}
+        for item, (predicted, _) in zip(labelled, predictions)
+        if predicted != item['topic']
     ]
+    return {
+        'accuracy': 1 - len(errors) / len(labelled) if labelled else 0.0,
+        'errors': errors,
+    }
+
 
-    result = {}
-    # print the result in json format
-    for test_query in test_queries:
-        chosen_topic = choose_topic(test_query)
-        result[test_query] = chosen_topic
+if __name__ == "__main__":
+    import json
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="測試主題分類")
+    parser.add_argument("--workers", type=int, default=DEFAULT_TOPIC_WORKERS, help="並行數")
+    parser.add_argument("--eval", help="評估用的 JSONL 檔案（每行 {\"query\": ..., \"topic\": ...}）")
+    parser.add_argument("--no-router", action="store_true", help="不使用本地路由，一律呼叫 LLM")
+    args = parser.parse_args()
     
-    print(result)
+    if args.eval:
+        with open(args.eval, encoding="utf-8") as f:
+            labelled = [json.loads(line) for line in f if line.strip()]
+        report = evaluate_topics(labelled, workers=args.workers, use_router=not args.no_router)
+        print(f"準確率: {report['accuracy']:.1%}（{len(labelled)} 題）")
+        for error in report['errors']:
+            print(error)
+    else:
+        # 測試選擇主題功能
+        test_queries = [
+            "某人故意殺害他人，應該如何論處？",
+            "某人故意殺害三個月的胚胎，應該如何論處？",
+            "某人甩別人一巴掌，造成對方臉部受傷，應該如何論處？",
+            "甲男偷摸乙女的屁股",
+            "把辦公室的衛生紙拿回家使用",
+        ]
         
+        # print the result in json format
+        result = dict(zip(test_queries, choose_topics(test_queries, workers=args.workers, use_router=not args.no_router)))
+        print(result)
+    
+    print(f"分類結果快取: {get_routing_cache().stats()}")
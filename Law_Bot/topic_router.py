@@ -0,0 +1,350 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from rag.lexical_index import tokenize
+from rag.text_normalize import normalize_query
+
+# 記錄 LLM 分類結果的檔案（每行一個 {"query", "topic"}），重新啟動後作為路由器的範例
+DEFAULT_LOG_PATH = "./rag_db/topic_queries.jsonl"
+
+# 拆分主題描述中的罪名（例如「普通殺人罪、殺直系血親尊親屬罪」）
+_DESCRIPTION_SEPARATORS = re.compile(r"[、，,；;（）()和與等]+")
+
+
+class TopicRouter:
+    """
+    本地主題路由器：以字元 n-gram 的 TF-IDF 為每個主題建立中心向量，查詢只需計算與各中心的餘弦相似度
+
+    範例來源：主題名稱與描述（拆成個別罪名）、示範範例，以及先前由 LLM 分類並記錄下來的查詢。
+    信心為第一名與第二名相似度的相對差距（0~1），第一名相似度低於 full_similarity 時再依比例打折，
+    避免只靠一兩個常見詞（例如「某人」）就判定；信心不足或最相近的主題不在可直接回答的主題中時，
+    呼叫端應改用 LLM 分類，並可將結果以 add_example() 加回路由器。
+
+    加入的查詢以正規化後的文字去重，每個主題最多保留 max_examples_per_topic 個；
+    加入時只重新計算該主題的中心向量（IDF 以累計的文件頻率更新），每 refit_every 個再全部重新計算一次。
+    """
+
+    def __init__(
+        self,
+        allowed_topics: Iterable[str],
+        full_similarity: float = 0.2,
+        max_examples_per_topic: int = 200,
+        refit_every: int = 32,
+    ):
+        """
+        Args:
+            allowed_topics: 可以直接由本地路由回答的主題；其他主題的範例只用來分辨相似的問題
+            full_similarity: 第一名的餘弦相似度達到此值時信心不打折
+            max_examples_per_topic: 每個主題最多保留的已分類查詢數（不含主題描述與示範範例）
+            refit_every: 加入幾個查詢後重新計算所有主題的中心向量
+        """
+        if full_similarity <= 0:
+            raise ValueError("full_similarity 必須大於 0")
+        if max_examples_per_topic < 1:
+            raise ValueError("max_examples_per_topic 必須大於 0")
+        if refit_every < 1:
+            raise ValueError("refit_every 必須大於 0")
+        self.allowed_topics = set(allowed_topics)
+        self.full_similarity = full_similarity
+        self.max_examples_per_topic = max_examples_per_topic
+        self.refit_every = refit_every
+        self._examples: Dict[str, List[Counter]] = {}
+        self._document_frequency: Counter = Counter()
+        self._document_count = 0
+        # 主題 -> 已加入查詢的正規化文字（去重與數量上限）
+        self._queries: Dict[str, set] = {}
+        self._pending = 0
+        # (主題列表, n-gram -> 各主題中心的權重, n-gram -> IDF)，重新計算時整組替換
+        self._model: Tuple[List[str], Dict[str, np.ndarray], Dict[str, float]] = ([], {}, {})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_metadata(
+        cls,
+        topic_metadata: Dict[str, str],
+        demos: Iterable[Dict] = (),
+        log_path: Optional[str] = DEFAULT_LOG_PATH,
+        extra_topics: Iterable[str] = ("rag", "others"),
+        **kwargs,
+    ) -> "TopicRouter":
+        """
+        以主題描述、示範範例與查詢記錄建立路由器
+
+        Args:
+            topic_metadata: 主題 -> 描述（提供給 LLM 的主題清單）
+            demos: get_topic_demos() 的示範範例（其中的 rag_topic_metadata 描述也會加入）
+            log_path: LLM 分類記錄檔（None 或不存在時略過）；有重複或超過數量上限的記錄時改寫為去重後的內容
+            extra_topics: topic_metadata 以外也可直接回答的主題（需有記錄的範例才會出現）
+
+        Returns:
+            TopicRouter
+        """
+        router = cls(list(topic_metadata) + list(extra_topics), **kwargs)
+        descriptions = dict(topic_metadata)
+        for demo in demos:
+            for topic, description in demo.get("rag_topic_metadata", {}).items():
+                descriptions.setdefault(topic, description)
+        for topic, description in descriptions.items():
+            router._add_text(topic, topic)
+            for phrase in _DESCRIPTION_SEPARATORS.split(description):
+                phrase = phrase.removeprefix("包含").strip()
+                if len(phrase) > 1:
+                    router._add_text(topic, phrase)
+        for demo in demos:
+            router._add_text(demo["chosen_topic"], demo["user_query"])
+        if log_path and os.path.exists(log_path):
+            kept, dropped = [], 0
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        topic, query = record["topic"], record["query"]
+                    except (ValueError, KeyError, TypeError):
+                        dropped += 1
+                        continue
+                    if router._add_query(topic, query):
+                        kept.append(line if line.endswith("\n") else line + "\n")
+                    else:
+                        dropped += 1
+            if dropped:
+                _rewrite_log(log_path, kept)
+        router._fit()
+        return router
+
+    def _add_text(self, topic: str, text: str) -> bool:
+        terms = tokenize(text)
+        if not terms:
+            return False
+        self._examples.setdefault(topic, []).append(terms)
+        self._document_frequency.update(terms.keys())
+        self._document_count += 1
+        return True
+
+    def _add_query(self, topic: str, query: str) -> bool:
+        # 已分類的查詢：重複或該主題已達上限時不加入
+        queries = self._queries.setdefault(topic, set())
+        key = normalize_query(query)
+        if key in queries or len(queries) >= self.max_examples_per_topic:
+            return False
+        if not self._add_text(topic, query):
+            return False
+        queries.add(key)
+        return True
+
+    def add_example(self, topic: str, query: str) -> bool:
+        """
+        加入一個已分類的查詢並更新該主題的中心向量
+
+        Returns:
+            是否加入（重複的查詢或該主題已達 max_examples_per_topic 時為 False，呼叫端不需再記錄）
+        """
+        with self._lock:
+            if not self._add_query(topic, query):
+                return False
+            self._pending += 1
+            if self._pending >= self.refit_every or topic not in self._model[0]:
+                self._fit()
+            else:
+                self._fit_topic(topic)
+            return True
+
+    def _idf(self, term: str) -> float:
+        return math.log((self._document_count + 1) / (self._document_frequency[term] + 1)) + 1
+
+    def _centroid(self, topic: str, idf: Dict[str, float]) -> Dict[str, float]:
+        # 中心向量為各範例正規化 TF-IDF 向量的平均，再正規化
+        centroid = Counter()
+        for terms in self._examples[topic]:
+            vector = {term: (1 + math.log(tf)) * idf[term] for term, tf in terms.items()}
+            norm = math.sqrt(sum(value * value for value in vector.values()))
+            for term, value in vector.items():
+                centroid[term] += value / norm
+        norm = math.sqrt(sum(value * value for value in centroid.values()))
+        return {term: value / norm for term, value in centroid.items()}
+
+    def _fit(self):
+        # 每個範例是一份文件，以目前累計的文件頻率重新計算所有主題
+        idf = {term: self._idf(term) for term in self._document_frequency}
+        topics = list(self._examples)
+        weights: Dict[str, np.ndarray] = {}
+        for column, topic in enumerate(topics):
+            for term, value in self._centroid(topic, idf).items():
+                weights.setdefault(term, np.zeros(len(topics), dtype=np.float32))[column] = value
+
+        self._model = (topics, weights, idf)
+        self._pending = 0
+
+    def _fit_topic(self, topic: str):
+        # 只重新計算一個主題：更新新範例詞彙的 IDF，其他詞彙與主題沿用到下次 _fit()。
+        # 查詢不持有鎖，因此複製要修改的部分後整組替換
+        topics, weights, idf = self._model
+        idf = dict(idf)
+        for term in self._examples[topic][-1]:
+            idf[term] = self._idf(term)
+        column = topics.index(topic)
+        weights = dict(weights)
+        for term, value in self._centroid(topic, idf).items():
+            row = weights[term].copy() if term in weights else np.zeros(len(topics), dtype=np.float32)
+            row[column] = value
+            weights[term] = row
+        self._model = (topics, weights, idf)
+
+    @property
+    def topics(self) -> List[str]:
+        return self._model[0]
+
+    def scores(self, query: str, model=None) -> Tuple[List[str], np.ndarray, Dict[str, float]]:
+        """
+        查詢與各主題中心的餘弦相似度
+
+        Returns:
+            (主題列表, 相似度陣列, 查詢的 TF-IDF 向量)
+        """
+        topics, weights, idf = model or self._model
+        vector = {term: (1 + math.log(tf)) * idf[term] for term, tf in tokenize(query).items() if term in idf}
+        similarities = np.zeros(len(topics), dtype=np.float32)
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if not norm:
+            return topics, similarities, vector
+        for term, value in vector.items():
+            similarities += weights[term] * (value / norm)
+        return topics, similarities, vector
+
+    def route(self, query: str) -> Tuple[Optional[str], float, str]:
+        """
+        本地分類
+
+        Returns:
+            (最相近的主題, 信心 0~1, 推理說明)；沒有任何相符的 n-gram 時主題為 None。
+            最相近的主題不在 allowed_topics 時信心為 0
+        """
+        model = self._model
+        weights = model[1]
+        topics, similarities, vector = self.scores(query, model)
+        if not topics or not similarities.any():
+            return None, 0.0, "本地路由：問題與任何主題都沒有共同的關鍵詞"
+
+        order = np.argsort(similarities)[::-1]
+        best = int(order[0])
+        first = float(similarities[best])
+        second = float(similarities[order[1]]) if len(order) > 1 else 0.0
+        topic = topics[best]
+        confidence = (first - second) / first * min(1.0, first / self.full_similarity)
+        if topic not in self.allowed_topics:
+            confidence = 0.0
+
+        # 對最相近主題貢獻最大的關鍵詞
+        contributions = sorted(vector, key=lambda term: vector[term] * weights[term][best], reverse=True)
+        keywords = "、".join(term for term in contributions[:3] if weights[term][best] > 0)
+        reasoning = (
+            f"本地路由：問題中的關鍵詞（{keywords}）與「{topic}」的罪名與範例最相近，"
+            f"相似度 {first:.2f}（次高 {second:.2f}），信心 {confidence:.2f}"
+        )
+        return topic, confidence, reasoning
+
+
+def routing_config_hash(model: str, topic_metadata: Dict[str, str]) -> str:
+    """
+    分類設定（模型與主題清單）的雜湊，任一項改變後舊的快取結果不再命中
+    """
+    payload = json.dumps({"model": model, "topic_metadata": topic_metadata}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RoutingCache:
+    """
+    主題分類結果的 LRU 快取，鍵值為（分類設定雜湊, normalize_query 正規化後的查詢）
+
+    超過存活時間（TTL）的結果視為失效；超過容量上限時淘汰最久未使用的結果。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = 24 * 3600):
+        """
+        Args:
+            max_entries: 快取的查詢數上限
+            ttl_seconds: 結果的存活秒數（None 表示不過期）
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries 必須大於 0")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(config_hash: str, query: str) -> Tuple[str, str]:
+        return config_hash, normalize_query(query)
+
+    def get(self, config_hash: str, query: str) -> Optional[Dict]:
+        """
+        查詢快取（query 為原始查詢）
+        """
+        key = self.key(config_hash, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.time() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, config_hash: str, query: str, result: Dict):
+        """
+        寫入快取
+        """
+        key = self.key(config_hash, query)
+        with self._lock:
+            self._entries[key] = (time.time(), dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得快取統計資訊
+        """
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _rewrite_log(log_path: str, lines: List[str]):
+    # 先寫入暫存檔再取代，避免中途失敗留下不完整的記錄檔
+    temporary_path = log_path + ".tmp"
+    with open(temporary_path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(temporary_path, log_path)
+
+
+def log_routed_query(query: str, topic: str, log_path: Optional[str] = DEFAULT_LOG_PATH):
+    """
+    將 LLM 的分類結果附加到記錄檔，下次建立路由器時作為範例
+
+    只應記錄 TopicRouter.add_example() 接受的查詢，避免重複與超過上限的記錄
+    """
+    if not log_path:
+        return
+    directory = os.path.dirname(log_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"query": query, "topic": topic}, ensure_ascii=False) + "\n")